@@ -1,31 +1,251 @@
+import asyncio
 import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.util import await_only
+
+from .services.metrics import install_query_metrics
+from .services.pool_metrics import InstrumentedQueuePool, PoolMetrics
 
 # Get database URL from environment
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///:memory:")
 
-# Configure engine with appropriate settings
-if DATABASE_URL.startswith("sqlite"):
-    # SQLite-specific configuration
-    engine = create_engine(
-        DATABASE_URL,
+# Serve the grievance and status write endpoints from an async engine
+# (asyncpg for PostgreSQL, aiosqlite for SQLite). Background workers keep the sync engine.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() == "true"
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+# Server databases (PostgreSQL): pool sizing per process. Each uvicorn worker has its
+# own pool, so the server needs workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+# true: test each connection on checkout (one extra round trip). false: rely on
+# DB_POOL_RECYCLE staying below the server/proxy idle timeout and on SQLAlchemy
+# invalidating the pool when a disconnect error is seen.
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# LIFO reuse keeps the hot connections busy and lets idle ones hit DB_POOL_RECYCLE
+DB_POOL_USE_LIFO = os.getenv("DB_POOL_USE_LIFO", "false").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0: no server-side limit
+
+# SQLite file databases: bounded pool, tuned pragmas and a single-writer gate
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "5"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # Negative: KiB, so 64 MiB per connection
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "true").lower() == "true"
+
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def is_sqlite_memory(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and (
+        parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory"
+    )
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None) -> None:
+    """Per-connection pragmas: WAL lets readers run alongside the writer, NORMAL sync is safe under WAL."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS:d}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE:d}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE:d}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+class SQLiteWriteGate:
+    """
+    Queue write transactions on one SQLite database behind a single lock.
+
+    SQLite allows one writer at a time; concurrent writers otherwise spin on
+    busy_timeout and fail with "database is locked". A connection takes the
+    gate before its first INSERT/UPDATE/DELETE and releases it when the
+    transaction commits or rolls back (or, failing that, when the connection
+    is returned to the pool). Reads never wait. If the gate can't be taken
+    within the busy timeout the write proceeds and SQLite arbitrates as before.
+
+    One gate is shared by the sync engine and, with DATABASE_ASYNC, the
+    aiosqlite engine on the same file. Async connections wait for it by
+    polling from the event loop rather than blocking it, so async writers
+    queue behind each other and behind the sync ones.
+    """
+
+    INFO_KEY = "sqlite_write_gate"
+    POLL_SECONDS = 0.005  # How often an async writer retries the gate
+
+    def __init__(self, timeout: float = SQLITE_BUSY_TIMEOUT_MS / 1000):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def install(self, engine: Engine) -> None:
+        """Gate a sync engine, or the sync_engine of an AsyncEngine."""
+        before = self._before_cursor_execute_async if engine.dialect.is_async else self._before_cursor_execute
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "commit", self._release)
+        event.listen(engine, "rollback", self._release)
+        event.listen(engine.pool, "checkin", self._checkin)
+
+    def _needs_gate(self, conn, statement: str) -> bool:
+        return not conn.info.get(self.INFO_KEY) and statement.lstrip()[:7].upper().startswith(_WRITE_PREFIXES)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if self._needs_gate(conn, statement):
+            conn.info[self.INFO_KEY] = self._lock.acquire(timeout=self.timeout)
+
+    def _before_cursor_execute_async(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        # Runs on the event loop inside SQLAlchemy's greenlet, so await_only can yield to other tasks
+        if not self._needs_gate(conn, statement):
+            return
+        deadline = time.monotonic() + self.timeout
+        acquired = self._lock.acquire(blocking=False)
+        while not acquired and time.monotonic() < deadline:
+            await_only(asyncio.sleep(self.POLL_SECONDS))
+            acquired = self._lock.acquire(blocking=False)
+        conn.info[self.INFO_KEY] = acquired
+
+    def _release(self, conn) -> None:
+        if conn.info.pop(self.INFO_KEY, False):
+            self._lock.release()
+
+    def _checkin(self, dbapi_connection, connection_record) -> None:
+        if connection_record is not None and connection_record.info.pop(self.INFO_KEY, False):
+            self._lock.release()
+
+
+def create_sqlite_engine(
+    url: str,
+    pool_size: int = SQLITE_POOL_SIZE,
+    write_gate: Optional[SQLiteWriteGate] = None,
+) -> Engine:
+    """Engine for a SQLite database; file databases get a bounded pool, pragmas and the write gate."""
+    if is_sqlite_memory(url):
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=NullPool,  # Use NullPool for SQLite to avoid threading issues
+        )
+    sqlite_engine = create_engine(
+        url,
         connect_args={"check_same_thread": False},
-        poolclass=NullPool,  # Use NullPool for SQLite to avoid threading issues
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,  # Bounded: callers wait for a connection rather than opening more
     )
+    event.listen(sqlite_engine, "connect", apply_sqlite_pragmas)
+    if write_gate is None and SQLITE_SINGLE_WRITER:
+        write_gate = SQLiteWriteGate()
+    if write_gate is not None:
+        write_gate.install(sqlite_engine)
+    return sqlite_engine
+
+
+def server_pool_options() -> Dict[str, Any]:
+    """Pool keyword arguments for PostgreSQL (and other server) engines, from the DB_POOL_* settings."""
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_use_lifo": DB_POOL_USE_LIFO,
+    }
+
+
+def statement_timeout_connect_args(url: str, timeout_ms: int = DB_STATEMENT_TIMEOUT_MS) -> Dict[str, Any]:
+    """Driver connect_args that set PostgreSQL's statement_timeout for every pooled connection."""
+    parsed = make_url(url)
+    if not timeout_ms or parsed.get_backend_name() != "postgresql":
+        return {}
+    if parsed.get_driver_name() == "asyncpg":
+        return {"server_settings": {"statement_timeout": str(timeout_ms)}}
+    return {"options": f"-c statement_timeout={timeout_ms:d}"}
+
+
+def create_server_engine(url: str, **overrides: Any) -> Engine:
+    """Engine for a server database with the configured, instrumented pool."""
+    options = {**server_pool_options(), **overrides}
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        connect_args=statement_timeout_connect_args(url),
+        **options,
+    )
+
+
+# Configure engine with appropriate settings
+sqlite_write_gate: Optional[SQLiteWriteGate] = None
+if DATABASE_URL.startswith("sqlite"):
+    if SQLITE_SINGLE_WRITER and not is_sqlite_memory(DATABASE_URL):
+        sqlite_write_gate = SQLiteWriteGate()
+    engine = create_sqlite_engine(DATABASE_URL, write_gate=sqlite_write_gate)
 else:
     # PostgreSQL or other databases
-    engine = create_engine(
-        DATABASE_URL,
-        pool_pre_ping=True,  # Verify connections before using them
-        pool_size=5,  # Maintain 5 connections in the pool
-        max_overflow=10,  # Allow up to 10 additional connections
-        pool_recycle=3600,  # Recycle connections after 1 hour
-    )
+    engine = create_server_engine(DATABASE_URL)
+
+# Checkout latency, timeouts and usage of the app engine's pool, in /metrics and /health/db-pool
+pool_metrics = PoolMetrics()
+pool_metrics.install(engine)
+install_query_metrics(engine)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+
+def async_database_url(url: str) -> str:
+    """The async-driver form of a database URL, e.g. postgresql:// -> postgresql+asyncpg://"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} databases")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str, write_gate: Optional[SQLiteWriteGate] = None) -> AsyncEngine:
+    """
+    Async engine with the same pool settings as the sync engine for the same URL.
+
+    A SQLite file database gets the pragmas and ``write_gate``, which must be
+    the sync engine's gate so both engines' writers queue on one lock.
+    """
+    url = async_database_url(url)
+    if url.startswith("sqlite"):
+        if is_sqlite_memory(url):
+            return create_async_engine(url, poolclass=NullPool)
+        async_sqlite = create_async_engine(
+            url, poolclass=AsyncAdaptedQueuePool, pool_size=SQLITE_POOL_SIZE, max_overflow=0
+        )
+        event.listen(async_sqlite.sync_engine, "connect", apply_sqlite_pragmas)
+        if write_gate is not None:
+            write_gate.install(async_sqlite.sync_engine)
+        return async_sqlite
+    return create_async_engine(url, connect_args=statement_timeout_connect_args(url), **server_pool_options())
+
+
+async_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+if DATABASE_ASYNC:
+    # ASYNC_DATABASE_URL overrides the derived URL, e.g. to pass driver-specific options
+    async_engine = create_async_db_engine(os.getenv("ASYNC_DATABASE_URL") or DATABASE_URL, sqlite_write_gate)
+    install_query_metrics(async_engine.sync_engine)
+    # Rows are serialized after commit; expiring them would need an implicit (sync) reload
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 class Base(DeclarativeBase):
     pass
 
@@ -40,7 +260,23 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database access is disabled; set DATABASE_ASYNC=true")
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
 from . import models  # noqa: E402
+from .migrations import upgrade_schema  # noqa: E402
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    # create_all never alters existing tables; the upgrade adds and backfills new columns too
+    upgrade_schema(engine)
+
+async def dispose_async_engine() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
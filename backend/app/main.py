@@ -1,21 +1,45 @@
 from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from .routers import grievances, status, categorization
-from .database import init_db
+from .database import dispose_async_engine, engine, init_db, pool_metrics
+from .middleware.cors import CORSMiddleware
+from .middleware.metrics import MetricsMiddleware
+from .middleware.request_logging import RequestLoggingMiddleware, start_log_listener, stop_log_listener
+from .schemas import DatabasePoolStats, ReceiptRendererStats
+from .services.categorization_queue import categorization_queue
+from .services.email_outbox import email_outbox_sender
+from .services.llm_categorizer import aclose_openai_clients, close_openai_clients
+from .services.receipt_renderer import receipt_renderer
+from .services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
+from .services.local_classifier import local_classifier
+from .utils.minio import minio_client
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager for startup and shutdown events."""
-    # Startup: Initialize database
+    # Startup: Initialize database, train the local classifier from categorized
+    # grievances (in the background) and start categorization workers and the email sender
+    start_log_listener()
     init_db()
+    local_classifier.train_in_background()
+    categorization_queue.start()
+    email_outbox_sender.start()
+    receipt_renderer.start()
     yield
-    # Shutdown: cleanup if needed
-    pass
+    # Shutdown: let in-flight categorization jobs finish, then drop pooled connections
+    categorization_queue.stop()
+    email_outbox_sender.stop()
+    receipt_renderer.stop()
+    await aclose_openai_clients()
+    close_openai_clients()
+    await minio_client.aclose()
+    minio_client.close()
+    await dispose_async_engine()
+    stop_log_listener()
 
 
 app = FastAPI(
@@ -25,66 +49,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Custom CORS middleware to handle null origins from file:// protocol
-@app.middleware("http")
-async def custom_cors_middleware(request: Request, call_next):
-    origin = request.headers.get("origin", "*")
-    
-    # Log the request for debugging
-    print(f"Request: {request.method} {request.url.path} from origin: {origin}")
-    
-    # DEBUG: Capture and log request body for POST requests to grievances endpoint
-    if request.method == "POST" and request.url.path == "/api/grievances/":
-        import sys
-        
-        # Read the body
-        body_bytes = await request.body()
-        
-        # Log it
-        print("=" * 60, file=sys.stderr, flush=True)
-        print("WEBHOOK REQUEST BODY:", file=sys.stderr, flush=True)
-        print(body_bytes.decode("utf-8"), file=sys.stderr, flush=True)
-        print("=" * 60, file=sys.stderr, flush=True)
-        
-        # Create a new receive callable that replays the body
-        # This needs to track state to send body then EOF
-        body_sent = False
-        
-        async def receive():
-            nonlocal body_sent
-            if not body_sent:
-                body_sent = True
-                return {"type": "http.request", "body": body_bytes, "more_body": False}
-            # Should not be called again, but return empty if it is
-            return {"type": "http.request", "body": b"", "more_body": False}
-        
-        # IMPORTANT: Replace the request with a new one that has the body available
-        request = Request(scope=request.scope, receive=receive)
-    
-    # Handle preflight OPTIONS requests
-    if request.method == "OPTIONS":
-        return Response(
-            status_code=200,
-            headers={
-                "Access-Control-Allow-Origin": origin if origin else "*",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS, PATCH",
-                "Access-Control-Allow-Headers": "*",
-                "Access-Control-Max-Age": "3600",
-                "Vary": "Origin",
-            }
-        )
-    
-    # Process the actual request
-    response = await call_next(request)
-    
-    # Add CORS headers to response
-    response.headers["Access-Control-Allow-Origin"] = origin if origin else "*"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-    response.headers["Access-Control-Allow-Headers"] = "*"
-    response.headers["Access-Control-Expose-Headers"] = "X-Grievance-ID"
-    response.headers["Vary"] = "Origin"
-    
-    return response
+# CORS (allowlist in CORS_ALLOWED_ORIGINS; "null" covers forms opened from file://)
+app.add_middleware(CORSMiddleware)
+
+# Per-route latency histograms, in-flight gauge and DB usage per request (METRICS_ENABLED)
+app.add_middleware(MetricsMiddleware)
+
+# Sampled structured request logging; outermost so durations include the whole stack
+app.add_middleware(RequestLoggingMiddleware)
 
 # Register routers
 app.include_router(grievances.router, prefix="/api", tags=["grievances"])
@@ -104,4 +76,28 @@ def health_check():
         "ok": True,
         "service": "Grievance Management API",
         "version": "0.1.0"
-    }
\ No newline at end of file
+    }
+
+@app.get("/health/db-pool", response_model=DatabasePoolStats, tags=["health"])
+def database_pool_stats():
+    """
+    Report database connection pool usage for this worker process.
+
+    Checked-out/overflow figures are live; checkout counts, timeouts, wait
+    time and the checkout latency histogram accumulate since startup. The
+    same series are exported as db_pool_* by /metrics.
+    """
+    return pool_metrics.stats(engine.pool)
+
+
+@app.get("/health/receipt-renderer", response_model=ReceiptRendererStats, tags=["health"])
+def receipt_renderer_stats():
+    """Report receipt render pool usage: pending renders against the queue limit, and rejections."""
+    return receipt_renderer.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["health"])
+def metrics():
+    """Prometheus text exposition of request, DB, DB pool, LLM, SMTP and MinIO metrics for this worker."""
+    pool_metrics.collect(engine.pool)
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,128 @@
+"""
+CORS as pure ASGI middleware with precomputed headers.
+
+Origins come from CORS_ALLOWED_ORIGINS (comma separated). "*" allows any
+origin; "null" allows the opaque origin browsers send for pages opened from
+file:// (the Typebot/HTML forms used in the field). All header values are
+encoded once at startup, so a request only costs a dict lookup on its Origin.
+
+Preflights (OPTIONS with Origin and Access-Control-Request-Method) are
+answered here with Access-Control-Max-Age so browsers cache them; every other
+request goes to the app and gets the CORS headers added to its response.
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+Header = Tuple[bytes, bytes]
+
+DEFAULT_METHODS = ("GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH")
+DEFAULT_EXPOSE_HEADERS = ("X-Grievance-ID",)
+
+DISALLOWED_BODY = b"Disallowed CORS origin"
+
+
+def _env_list(name: str, default: str) -> List[str]:
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+class CORSMiddleware:
+    """Allowlist-based CORS with header tuples built once per allowed origin."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        allow_origins: Optional[Sequence[str]] = None,
+        allow_methods: Sequence[str] = DEFAULT_METHODS,
+        allow_headers: Sequence[str] = ("*",),
+        expose_headers: Sequence[str] = DEFAULT_EXPOSE_HEADERS,
+        max_age: Optional[int] = None,
+    ):
+        self.app = app
+        origins = list(allow_origins) if allow_origins is not None else _env_list("CORS_ALLOWED_ORIGINS", "*")
+        max_age = max_age if max_age is not None else int(os.getenv("CORS_MAX_AGE", "86400"))
+        self.allow_all = "*" in origins
+
+        preflight_common: List[Header] = [
+            (b"access-control-allow-methods", ", ".join(allow_methods).encode("latin-1")),
+            (b"access-control-allow-headers", ", ".join(allow_headers).encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"content-length", b"0"),
+        ]
+        simple_common: List[Header] = []
+        if expose_headers:
+            simple_common.append((b"access-control-expose-headers", ", ".join(expose_headers).encode("latin-1")))
+
+        self._vary_only: List[Header] = []
+        if self.allow_all:
+            # A literal "*" doesn't depend on the request, so caches need no Vary
+            allow = [(b"access-control-allow-origin", b"*")]
+            self._simple_any = allow + simple_common
+            self._preflight_any = allow + preflight_common
+            self._simple: Dict[bytes, List[Header]] = {}
+            self._preflight: Dict[bytes, List[Header]] = {}
+        else:
+            vary = [(b"vary", b"Origin")]
+            self._simple_any = []
+            self._preflight_any = []
+            self._simple = {}
+            self._preflight = {}
+            for origin in origins:
+                key = origin.encode("latin-1")
+                allow = [(b"access-control-allow-origin", key)]
+                self._simple[key] = allow + simple_common + vary
+                self._preflight[key] = allow + preflight_common + vary
+            self._vary_only = vary
+        self._disallowed = self._vary_only + [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(DISALLOWED_BODY)).encode("latin-1")),
+        ]
+
+    def _lookup(self, origin: bytes, preflight: bool) -> Optional[List[Header]]:
+        if self.allow_all:
+            return self._preflight_any if preflight else self._simple_any
+        return (self._preflight if preflight else self._simple).get(origin)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        request_method = False
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = True
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and request_method:
+            headers = self._lookup(origin, preflight=True)
+            if headers is None:
+                await send({"type": "http.response.start", "status": 400, "headers": self._disallowed})
+                await send({"type": "http.response.body", "body": DISALLOWED_BODY})
+                return
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        extra = self._lookup(origin, preflight=False)
+        if extra is None:
+            # Not allowed: the browser will block the response; Vary keeps caches honest
+            extra = self._vary_only
+        if not extra:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + extra
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
@@ -0,0 +1,67 @@
+"""
+Per-route request metrics as pure ASGI middleware.
+
+Records the in-flight gauge, a latency histogram labelled with the matched
+route template (``/api/grievances/{gid}``, never the raw path, so ids don't
+create new series) and the number of DB queries and DB time each request
+spent. Unmatched paths share one label.
+"""
+
+import os
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..services.metrics import (
+    RequestDBStats,
+    current_request_db,
+    http_request_db_queries,
+    http_request_db_seconds,
+    http_request_duration,
+    http_requests_in_flight,
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope: Scope) -> str:
+    """The path template of the route that handled the request (set on the scope by FastAPI's router)."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Record latency, in-flight requests and DB usage per route template."""
+
+    def __init__(self, app: ASGIApp, enabled: Optional[bool] = None):
+        self.app = app
+        self.enabled = enabled if enabled is not None else os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        db_stats = RequestDBStats()
+        token = current_request_db.set(db_stats)
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            current_request_db.reset(token)
+            route = route_template(scope)
+            http_request_duration.observe(duration, scope["method"], route, str(status))
+            http_request_db_queries.observe(db_stats.queries, route)
+            http_request_db_seconds.observe(db_stats.seconds, route)
@@ -0,0 +1,169 @@
+"""
+Sampled, structured request logging as pure ASGI middleware.
+
+Each logged request produces one JSON line on the ``app.requests`` logger with
+method, path, status and duration. Requests are sampled at
+REQUEST_LOG_SAMPLE_RATE; server errors and requests slower than
+REQUEST_LOG_SLOW_MS are always logged.
+
+Request bodies are not logged unless REQUEST_LOG_BODIES=true. When enabled,
+body chunks are observed as the application reads them (nothing is buffered
+ahead of the app or replayed), truncated to REQUEST_LOG_BODY_MAX_BYTES, and
+personal data is redacted before logging.
+
+start_log_listener() moves handler I/O onto a background thread so the event
+loop never blocks on stderr.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+request_logger = logging.getLogger("app.requests")
+
+REDACTED = "[REDACTED]"
+
+# Payload fields that identify a complainant or household
+PII_FIELDS = frozenset({
+    "complainant_name", "complainant_email", "complainant_phone",
+    "name", "email", "phone", "hh_id", "hh_address", "address",
+    "details", "grievance_details", "description",
+})
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE_RE = re.compile(r"\+?\d[\d\s().-]{6,}\d")
+
+_listener: Optional[QueueListener] = None
+
+
+def redact(value: Any) -> Any:
+    """Replace PII fields in a decoded JSON payload, recursively."""
+    if isinstance(value, dict):
+        return {k: (REDACTED if k.lower() in PII_FIELDS and v not in (None, "") else redact(v))
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return _PHONE_RE.sub(REDACTED, _EMAIL_RE.sub(REDACTED, value))
+    return value
+
+
+def redact_body(body: bytes, truncated: bool) -> Any:
+    """Decoded, redacted body for logging; non-JSON bodies are scrubbed of emails and phone numbers."""
+    if not truncated:
+        try:
+            return redact(json.loads(body))
+        except ValueError:
+            pass
+    text = body.decode("utf-8", errors="replace")
+    return redact(text) + ("..." if truncated else "")
+
+
+class RequestLoggingMiddleware:
+    """Log a sample of HTTP requests without buffering or copying request bodies."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: Optional[float] = None,
+        slow_ms: Optional[float] = None,
+        log_bodies: Optional[bool] = None,
+        max_body_bytes: Optional[int] = None,
+        logger: logging.Logger = request_logger,
+    ):
+        self.app = app
+        self.sample_rate = (
+            sample_rate if sample_rate is not None else float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.1"))
+        )
+        self.slow_ms = slow_ms if slow_ms is not None else float(os.getenv("REQUEST_LOG_SLOW_MS", "1000"))
+        self.log_bodies = (
+            log_bodies if log_bodies is not None else os.getenv("REQUEST_LOG_BODIES", "false").lower() == "true"
+        )
+        self.max_body_bytes = (
+            max_body_bytes if max_body_bytes is not None else int(os.getenv("REQUEST_LOG_BODY_MAX_BYTES", "2048"))
+        )
+        self.logger = logger
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = self.sample_rate >= 1 or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        start = time.perf_counter()
+        status = 500
+        chunks: List[bytes] = []
+        seen = 0
+
+        if sampled and self.log_bodies:
+            async def logged_receive() -> Message:
+                nonlocal seen
+                message = await receive()
+                if message["type"] == "http.request":
+                    body = message.get("body", b"")
+                    if body and seen < self.max_body_bytes:
+                        chunks.append(body)  # A reference to the chunk the app receives, not a copy
+                    seen += len(body)
+                return message
+        else:
+            logged_receive = receive
+
+        async def logged_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, logged_receive, logged_send)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if sampled or status >= 500 or duration_ms >= self.slow_ms:
+                record: Dict[str, Any] = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(duration_ms, 2),
+                }
+                if sampled and self.log_bodies and seen:
+                    record["body_bytes"] = seen
+                    record["body"] = redact_body(b"".join(chunks)[:self.max_body_bytes], seen > self.max_body_bytes)
+                level = logging.ERROR if status >= 500 else logging.INFO
+                self.logger.log(level, json.dumps(record, default=str))
+
+
+def start_log_listener() -> None:
+    """Write request log records from a background thread instead of the event loop."""
+    global _listener
+    if _listener is not None or request_logger.handlers:
+        return
+    records: queue.Queue = queue.Queue(-1)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    _listener = QueueListener(records, handler)
+    request_logger.addHandler(QueueHandler(records))
+    request_logger.setLevel(logging.INFO)
+    request_logger.propagate = False
+    _listener.start()
+
+
+def stop_log_listener() -> None:
+    """Flush pending records and restore direct logging."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in list(request_logger.handlers):
+        if isinstance(handler, QueueHandler):
+            request_logger.removeHandler(handler)
+    request_logger.propagate = True
+    _listener = None
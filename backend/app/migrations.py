@@ -0,0 +1,123 @@
+"""
+In-place schema upgrade for existing databases.
+
+``Base.metadata.create_all`` creates missing tables, indexes and sequences
+but never alters a table that already exists. This module adds the columns
+introduced since a table was created, then backfills them. It is idempotent
+and runs from ``init_db()`` at startup; run it once by hand before rolling
+out a new version to several workers:
+
+    python -m app.migrations
+
+On PostgreSQL the DDL runs under an advisory lock, so workers starting
+together don't race each other.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+from .database import Base, engine as app_engine
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock, held while the DDL runs
+SCHEMA_LOCK_KEY = 734_211_005
+
+BACKFILL_BATCH_SIZE = 1000
+
+# (table, column) added after the table's first release. Existing rows keep NULL
+# unless a backfill below fills them: category_status and category_version stay
+# NULL, which marks a row as legacy for recategorize --include-legacy, and a NULL
+# category_source lets the local classifier train on legacy labels.
+ADDED_COLUMNS: List[Tuple[str, str]] = [
+    ("grievance", "change_seq"),
+    ("grievance", "category_status"),
+    ("grievance", "category_version"),
+    ("grievance", "category_source"),
+    ("grievance", "category_claimed_until"),
+]
+
+
+def _add_missing_columns(conn: Connection) -> List[str]:
+    inspector = inspect(conn)
+    added = []
+    for table_name, column_name in ADDED_COLUMNS:
+        if column_name in {column["name"] for column in inspector.get_columns(table_name)}:
+            continue
+        column = Base.metadata.tables[table_name].c[column_name]
+        column_type = column.type.compile(dialect=conn.dialect)
+        if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {if_not_exists}{column_name} {column_type}"))
+        added.append(f"{table_name}.{column_name}")
+
+    # Indexes on the new columns; create_all skipped them along with the columns
+    for table_name in {table_name for table_name, _ in ADDED_COLUMNS}:
+        new_columns = {column for table, column in ADDED_COLUMNS if table == table_name}
+        existing = {index["name"] for index in inspector.get_indexes(table_name)}
+        for index in Base.metadata.tables[table_name].indexes:
+            if index.name not in existing and new_columns & {column.name for column in index.columns}:
+                index.create(conn)
+    return added
+
+
+def backfill_change_seq(conn: Connection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Number grievances without a change_seq in id order, committing per batch.
+
+    Rows take values from the same source as live writes (the PostgreSQL
+    sequence, or max + 1 on SQLite), so the feed sees them after everything
+    already numbered. updated_at is left as it was.
+    """
+    g = models.Grievance.__table__
+    statement = (
+        update(g)
+        .where(g.c.id == bindparam("gid"), g.c.change_seq.is_(None))
+        .values(change_seq=models.next_change_seq(), updated_at=g.c.updated_at)
+    )
+    total = 0
+    while True:
+        ids = conn.execute(
+            select(g.c.id).where(g.c.change_seq.is_(None)).order_by(g.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return total
+        # One statement per row so each takes the next value in id order
+        conn.execute(statement, [{"gid": gid} for gid in ids])
+        conn.commit()
+        total += len(ids)
+        logger.info(f"Backfilled change_seq for {total} grievances")
+
+
+def upgrade_schema(bind: Engine = app_engine) -> Dict[str, Any]:
+    """
+    Create missing tables, add missing columns and backfill them.
+
+    Returns:
+        The columns added and the number of rows backfilled.
+    """
+    # One connection throughout, so an in-memory SQLite database sees its own tables
+    with bind.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        Base.metadata.create_all(bind=conn)
+        added = _add_missing_columns(conn)
+        conn.commit()
+        for column in added:
+            logger.info(f"Added column {column}")
+
+        backfilled = backfill_change_seq(conn)
+    return {"added_columns": added, "backfilled_change_seq": backfilled}
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    print(json.dumps(upgrade_schema()))
+
+
+if __name__ == "__main__":
+    main()
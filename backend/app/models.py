@@ -1,5 +1,8 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, JSON, Index
+from datetime import datetime, timezone
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Boolean, Text, JSON, Index, Sequence
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql import func
+from sqlalchemy.sql.expression import FunctionElement
 from .database import Base
 
 # Use JSON type which works with both PostgreSQL and SQLite
@@ -7,14 +10,53 @@ from .database import Base
 JSONType = JSON
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Monotonic change counter for the Odoo change feed; created on PostgreSQL by create_all
+# (new databases) or app.migrations (existing ones)
+GRIEVANCE_CHANGE_SEQUENCE = Sequence("grievance_change_seq", metadata=Base.metadata)
+
+
+# Where Grievance.category_type came from. The local classifier trains on staff
+# and LLM labels only, never on its own answers or on fallbacks.
+CATEGORY_SOURCE_SUBMITTER = "submitter"
+CATEGORY_SOURCE_STAFF = "staff"
+CATEGORY_SOURCE_LLM = "llm"
+CATEGORY_SOURCE_LOCAL = "local"  # Local classifier, confident answer or fallback guess
+CATEGORY_SOURCE_FALLBACK = "fallback"  # "Others" after an unusable LLM answer
+
+
+class next_change_seq(FunctionElement):
+    """SQL expression yielding the next grievance change sequence number."""
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(next_change_seq)
+def _next_change_seq(element, compiler, **kw):
+    # SQLite has no sequences, but it serializes writers, so max() + 1 is monotonic
+    return "(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM grievance)"
+
+
+@compiles(next_change_seq, "postgresql")
+def _next_change_seq_postgresql(element, compiler, **kw):
+    return "nextval('grievance_change_seq')"
+
+
 class Grievance(Base):
     """Grievance model representing user complaints and feedback."""
     __tablename__ = "grievance"
 
     # Primary key and timestamps
     id = Column(String, primary_key=True, index=True)  # ULID with prefix
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Timestamps are set application-side (server defaults cover raw SQL inserts) so they carry
+    # full precision on every backend; export and sync cursors compare them for equality
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), onupdate=_utcnow, nullable=False)
+    # Bumped on every insert and update; orders the change feed
+    change_seq = Column(BigInteger, default=next_change_seq(), onupdate=next_change_seq(), nullable=True)
 
     # Core grievance information
     is_anonymous = Column(Boolean, nullable=False, default=True, index=True)
@@ -37,6 +79,10 @@ class Grievance(Base):
 
     # Classification
     category_type = Column(String, nullable=True, index=True)
+    category_status = Column(String, nullable=True, index=True)  # pending/done/failed for auto-categorization
+    category_version = Column(String, nullable=True)  # CATEGORIES version used for auto-categorization
+    category_source = Column(String, nullable=True)  # CATEGORY_SOURCE_*; NULL on rows stored before it was recorded
+    category_claimed_until = Column(DateTime(timezone=True), nullable=True)  # Lease held by the worker process categorizing it
 
     # Complaint details
     details = Column(Text, nullable=True)
@@ -53,4 +99,31 @@ class Grievance(Base):
     __table_args__ = (
         Index('ix_grievance_created_status', 'created_at', 'external_status'),
         Index('ix_grievance_hh_island', 'hh_id', 'island'),
-    )
\ No newline at end of file
+        Index('ix_grievance_change_seq', 'change_seq', 'id'),
+    )
+
+
+class EmailOutbox(Base):
+    """Outgoing email, written in the same transaction as the grievance that triggered it."""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    grievance_id = Column(String, nullable=True, index=True)
+
+    # Rendered message
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    text_body = Column(Text, nullable=False)
+    html_body = Column(Text, nullable=True)
+
+    # Delivery state: pending -> sent | failed
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('ix_email_outbox_status_next', 'status', 'next_attempt_at'),
+    )
@@ -5,11 +5,26 @@ This module provides an API endpoint to categorize grievances using an LLM
 before they are submitted to the backend.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from openai import OpenAIError
+from sqlalchemy.orm import Session
 
-from ..schemas import CategorizationRequest, CategorizationResponse
+from ..database import get_db
+from ..schemas import (
+    CategorizationRequest,
+    CategorizationResponse,
+    CategorizationQueueStats,
+    CategorizationCacheStats,
+    CategorizationBatchRequest,
+    CategorizationBatchResponse,
+    CategorizationBatchResult,
+    LocalClassifierStats,
+)
 from ..services.llm_categorizer import categorize_grievance, get_category_display
+from ..services.categorization_queue import categorization_queue
+from ..services.categorization_cache import categorization_cache
+from ..services.recategorize import categorize_many
+from ..services.local_classifier import local_classifier, load_labeled_examples
 
 router = APIRouter(prefix="/categorize", tags=["categorization"])
 
@@ -60,3 +75,79 @@ def categorize_grievance_endpoint(request: CategorizationRequest):
             status_code=500,
             detail=f"Unexpected error during categorization: {str(e)}"
         )
+
+
+def _to_response(result: dict) -> CategorizationResponse:
+    return CategorizationResponse(
+        category=result["category"],
+        subcategory=result["subcategory"],
+        category_name=result["category_name"],
+        subcategory_name=result["subcategory_name"],
+        confidence=result["confidence"],
+        reasoning=result["reasoning"],
+        display=get_category_display(result["category"], result["subcategory"])
+    )
+
+
+@router.post("/batch", response_model=CategorizationBatchResponse)
+async def categorize_grievances_batch(request: CategorizationBatchRequest):
+    """
+    Categorize several grievances in one call.
+    
+    Items are sent to the LLM concurrently (capped by
+    CATEGORIZATION_BATCH_CONCURRENCY); repeated texts are served from the
+    result cache. Each item reports its own success or error, so one failure
+    does not fail the whole batch.
+    """
+    results = []
+    outcomes = await categorize_many(request.details)
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, ValueError):
+            results.append(CategorizationBatchResult(index=index, ok=False, error=str(outcome)))
+        elif isinstance(outcome, OpenAIError):
+            results.append(CategorizationBatchResult(index=index, ok=False, error=f"LLM service error: {str(outcome)}"))
+        elif isinstance(outcome, Exception):
+            results.append(CategorizationBatchResult(
+                index=index, ok=False, error=f"Unexpected error during categorization: {str(outcome)}"
+            ))
+        else:
+            results.append(CategorizationBatchResult(index=index, ok=True, result=_to_response(outcome)))
+    
+    return CategorizationBatchResponse(results=results)
+
+
+@router.get("/queue", response_model=CategorizationQueueStats)
+def categorization_queue_stats():
+    """
+    Report the state of the background categorization queue.
+    
+    Exposes queue depth, in-flight jobs, retry/failure counters and the
+    number of grievances categorized per minute over the last minute.
+    """
+    return categorization_queue.stats()
+
+
+@router.get("/cache", response_model=CategorizationCacheStats)
+def categorization_cache_stats():
+    """
+    Report hit/miss counters for the categorization result cache.
+    """
+    return categorization_cache.stats()
+
+
+@router.get("/local-model", response_model=LocalClassifierStats)
+def local_classifier_stats():
+    """
+    Report the state of the local first-pass classifier and how often it
+    answered locally versus escalating to the LLM.
+    """
+    return local_classifier.stats()
+
+
+@router.post("/local-model/train", response_model=LocalClassifierStats)
+def retrain_local_classifier(db: Session = Depends(get_db)):
+    """
+    Retrain the local classifier from the grievances categorized so far.
+    """
+    local_classifier.train(load_labeled_examples(db))
+    return local_classifier.stats()
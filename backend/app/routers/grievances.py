@@ -1,22 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Query, Request, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Response, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Any, Dict, Union
+from typing import List, Optional, Any, AsyncIterator, Dict, Iterator, Tuple, Union
+import base64
+import csv
+import io
 import json
 import re
 import uuid
+import zipfile
 import os
+from email.utils import format_datetime, parsedate_to_datetime
 from pathlib import Path
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
-from ..database import get_db
+from ..database import DATABASE_ASYNC, DB_STATEMENT_TIMEOUT_MS, get_async_db, get_db
 from .. import models, schemas
 from ..schemas import GrievanceCreate, GrievancePublic, AttachmentIn
 from ..utils.id import new_grievance_id
-from ..utils.pdf import build_receipt_pdf
-from ..utils.email import send_grievance_confirmation_email
-from ..utils.minio import minio_client
-from ..services.llm_categorizer import categorize_grievance
+from ..utils.minio import PresignNotConfigured, UploadTooLarge, minio_client
+from ..utils.upload import MissingFileField, MultipartError, MultipartFileStream, UploadInterrupted, stream_to_thread
+from ..services.categorization_queue import categorization_queue, CATEGORY_PENDING
+from ..services.receipt_cache import receipt_cache, receipt_cache_requests, receipt_etag, receipt_version
+from ..services.receipt_renderer import RendererBusy, RendererUnavailable, receipt_renderer
+from ..services.direct_upload import (
+    UploadRejected,
+    complete_upload_async as complete_direct_upload,
+    create_upload as create_direct_upload,
+)
+from ..services.email_outbox import (
+    confirmation_email_values,
+    email_outbox_sender,
+    queue_grievance_confirmation_email,
+)
 
 router = APIRouter(prefix="/grievances", tags=["grievances"])
 
@@ -28,6 +49,38 @@ GRIEVANCE_ID_PATTERN = re.compile(r"^GRV-[A-Z0-9]{26}$")
 MAX_DETAILS_LENGTH = 10000
 DEFAULT_EXPORT_HOURS = 24
 MAX_EXPORT_HOURS = 7 * 24
+MAX_EXPORT_PAGE_SIZE = 5000
+EXPORT_BATCH_SIZE = 500  # Rows fetched per round trip while streaming an export
+BULK_INGEST_BATCH_SIZE = 500  # Rows per executemany INSERT and commit during bulk ingest
+MAX_BULK_LINE_BYTES = 1024 * 1024
+BATCH_UPDATE_CHUNK_SIZE = 5000  # Ids per IN query; keeps large batches under driver bind-parameter limits
+CHANGE_FEED_DEFAULT_LIMIT = 100
+CHANGE_FEED_MAX_LIMIT = 1000
+# Changes younger than the settle window are held back so transactions that took their
+# sequence number earlier but committed later are not skipped by a cursor that moved past
+# them. That holds only for transactions that commit within the window of their write;
+# see _change_feed_settle_seconds().
+CHANGE_FEED_MIN_SETTLE_SECONDS = 2.0
+CHANGE_FEED_SETTLE_STATEMENT_TIMEOUTS = 3
+RECEIPT_RETRY_AFTER_SECONDS = 5  # Suggested to clients turned away by a full render queue
+
+
+def _change_feed_settle_seconds(configured: Optional[str], statement_timeout_ms: int) -> float:
+    """
+    Settle window for the change feed.
+
+    A change is skipped only if its transaction commits more than the window
+    after the statement that numbered it. Every write path here commits right
+    after a few statements, each capped by DB_STATEMENT_TIMEOUT_MS, so the
+    window is never shorter than CHANGE_FEED_SETTLE_STATEMENT_TIMEOUTS of them.
+    Without a statement timeout the bound is CHANGE_FEED_SETTLE_SECONDS alone.
+    """
+    floor = CHANGE_FEED_SETTLE_STATEMENT_TIMEOUTS * statement_timeout_ms / 1000
+    seconds = float(configured) if configured else CHANGE_FEED_MIN_SETTLE_SECONDS
+    return max(seconds, floor)
+
+
+CHANGE_FEED_SETTLE_SECONDS = _change_feed_settle_seconds(os.getenv("CHANGE_FEED_SETTLE_SECONDS"), DB_STATEMENT_TIMEOUT_MS)
 
 # Constants
 MAX_DETAILS_LENGTH = 10000
@@ -35,42 +88,95 @@ DEFAULT_EXPORT_HOURS = 24
 MAX_EXPORT_HOURS = 7 * 24
 
 
-@router.post("/upload-file", status_code=201)
-async def upload_file(file: UploadFile = File(...)):
-    """Upload a file and return its URL."""
-    try:
-        # Read file content
-        content = await file.read()
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+# Allowance for multipart boundaries and part headers when checking Content-Length up front
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+ALLOWED_UPLOAD_TYPES = [
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+    'application/pdf',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+]
+_UPLOAD_TOO_LARGE = "File too large. Maximum size is 10MB."
+
 
-        # Validate file size (10MB limit)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if len(content) > max_size:
-            raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB.")
+@router.post(
+    "/upload-file",
+    status_code=201,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"file": {"type": "string", "format": "binary"}},
+        "required": ["file"],
+    }}}}},
+)
+async def upload_file(request: Request):
+    """
+    Upload a file and return its URL.
 
-        # Validate file type
-        allowed_types = [
-            'image/jpeg', 'image/png', 'image/gif', 'image/webp',
-            'application/pdf',
-            'application/msword',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'application/vnd.ms-excel',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        ]
+    The multipart body is parsed as it arrives and the file is streamed to
+    MinIO from a worker thread, so memory per upload stays around one
+    multipart part and the size limit is enforced while bytes arrive.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=_UPLOAD_TOO_LARGE)
 
-        if file.content_type not in allowed_types:
-            raise HTTPException(status_code=400, detail=f"File type {file.content_type} not allowed.")
+    try:
+        upload = MultipartFileStream(request.headers, request.stream())
+        filename, content_type = await upload.open()
+    except MissingFileField as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except MultipartError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Upload to MinIO
-        result = minio_client.upload_file(content, file.filename, file.content_type)
+    # Validate file type before any bytes go to storage
+    if content_type not in ALLOWED_UPLOAD_TYPES:
+        raise HTTPException(status_code=400, detail=f"File type {content_type} not allowed.")
 
-        return result
+    def store(chunks):
+        return minio_client.upload_stream(chunks, filename, content_type, max_size=MAX_UPLOAD_SIZE)
 
+    try:
+        return await stream_to_thread(upload.chunks(), store)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=_UPLOAD_TOO_LARGE)
+    except (MultipartError, UploadInterrupted) as e:
+        raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+@router.post("/upload-url", response_model=schemas.DirectUploadTicket, status_code=201)
+def create_upload_url(payload: schemas.DirectUploadRequest):
+    """
+    Issue a short-lived pre-signed URL so the client can PUT the file straight
+    to storage, then register it with /upload-complete.
+    """
+    if payload.content_type not in ALLOWED_UPLOAD_TYPES:
+        raise HTTPException(status_code=400, detail=f"File type {payload.content_type} not allowed.")
+    if payload.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=_UPLOAD_TOO_LARGE)
+    try:
+        return create_direct_upload(payload.filename, payload.content_type, payload.size)
+    except PresignNotConfigured:
+        raise HTTPException(status_code=503, detail="Direct uploads are not configured")
+
+
+@router.post("/upload-complete", status_code=201)
+async def complete_upload_url(payload: schemas.DirectUploadComplete):
+    """Verify a direct upload's size and type and return its attachment info."""
+    try:
+        return await complete_direct_upload(payload.ticket, MAX_UPLOAD_SIZE, ALLOWED_UPLOAD_TYPES)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except PresignNotConfigured:
+        raise HTTPException(status_code=503, detail="Direct uploads are not configured")
+
+
 def _now_utc() -> datetime:
     """Get current UTC time with timezone info."""
     return datetime.now(timezone.utc)
@@ -173,6 +279,7 @@ def _row_to_dict(row: models.Grievance) -> Dict[str, Any]:
         "district": row.district,
         "village": row.village,
         "category_type": row.category_type,
+        "category_status": row.category_status,
         "details": row.details,
         "attachments": row.attachments,
     }
@@ -182,151 +289,292 @@ def _row_to_public(row: models.Grievance) -> GrievancePublic:
     """Convert database row to public schema."""
     return GrievancePublic(**_row_to_dict(row))
 
-def _auto_categorize(details: str) -> Optional[str]:
+def _new_grievance_values(payload: GrievanceCreate) -> Dict[str, Any]:
     """
-    Automatically categorize grievance using LLM.
-    
-    Args:
-        details: Grievance details text
-        
-    Returns:
-        Formatted category string (e.g., "2.3 HH member not registered") or None if categorization fails
+    Column values for a new grievance, with a server-generated ID.
+
+    Auto-categorization is only requested when the client did not send
+    category_type at all; an explicit empty string is respected. The LLM call
+    happens in the background queue, the row is stored as pending.
     """
-    if not details or not details.strip():
-        return None
-    
-    try:
-        result = categorize_grievance(details)
-        
-        # Format as "subcategory subcategory_name" or "category. category_name"
-        if result.get('subcategory') and result.get('subcategory_name'):
-            return f"{result['subcategory']} {result['subcategory_name']}"
-        elif result.get('category') and result.get('category_name'):
-            return f"{result['category']}. {result['category_name']}"
-        
-        return None
-    except Exception as e:
-        # Log the error but don't fail the grievance creation
-        import sys
-        print(f"Warning: Auto-categorization failed: {e}", file=sys.stderr, flush=True)
-        return None
+    details = _normalize_details(payload.details)
+    category_status = None
+    if "category_type" not in payload.model_fields_set and not payload.category_type and details:
+        category_status = CATEGORY_PENDING
+    return {
+        "id": new_grievance_id(),
+        "is_anonymous": payload.is_anonymous,
+        "complainant_name": payload.complainant_name,
+        "complainant_email": payload.complainant_email,
+        "complainant_phone": payload.complainant_phone,
+        "complainant_gender": payload.complainant_gender,
+        "is_hh_registered": payload.is_hh_registered,
+        "hh_id": payload.hh_id,
+        "hh_address": payload.hh_address,
+        "island": payload.island,
+        "district": payload.district,
+        "village": payload.village,
+        "category_type": payload.category_type,
+        "category_status": category_status,
+        "category_source": models.CATEGORY_SOURCE_SUBMITTER if payload.category_type else None,
+        # Claimed for this process's queue, so other workers' sweeps leave it alone
+        "category_claimed_until": categorization_queue.claim_until() if category_status else None,
+        "details": details,
+        "attachments": _normalize_attachments(payload.attachments),
+    }
 
-@router.post("/", status_code=201)
-async def create_grievance(
-    request: Request,
-    payload: GrievanceCreate,
-    db: Session = Depends(get_db)
-):
-    """Create a new grievance entry."""
 
-    # Always generate ID server-side for security and consistency
-    gid = new_grievance_id()
-    details = _normalize_details(payload.details)
-    attachments = _normalize_attachments(payload.attachments)
-    
-    # Get raw request body to check if category_type was explicitly provided
-    raw_body = await request.body()
-    raw_data = {}
-    try:
-        import json
-        raw_data = json.loads(raw_body.decode('utf-8'))
-    except:
-        pass
-    
-    # Auto-categorize ONLY if category_type field was NOT provided in request
-    # If empty string was sent, respect that and don't auto-categorize
-    category_type = payload.category_type
-    if 'category_type' not in raw_data and not category_type and details:
-        category_type = _auto_categorize(details)
-
-    # Create grievance object with direct attribute access
-    obj = models.Grievance(
-        id=gid,
-        is_anonymous=payload.is_anonymous,
+def _queue_confirmation(db: Union[Session, AsyncSession], payload: GrievanceCreate, values: Dict[str, Any]) -> bool:
+    """
+    Queue the confirmation email in the grievance's transaction; the outbox
+    sender delivers it in the background so SMTP latency never reaches the caller.
+    """
+    if payload.is_anonymous or not payload.complainant_email:
+        return False
+    queue_grievance_confirmation_email(
+        db,
+        to_email=payload.complainant_email,
+        grievance_id=values["id"],
         complainant_name=payload.complainant_name,
-        complainant_email=payload.complainant_email,
-        complainant_phone=payload.complainant_phone,
-        complainant_gender=payload.complainant_gender,
-        is_hh_registered=payload.is_hh_registered,
-        hh_id=payload.hh_id,
-        hh_address=payload.hh_address,
-        island=payload.island,
-        district=payload.district,
-        village=payload.village,
-        category_type=category_type,
-        details=details,
-        attachments=attachments,
+        details=values["details"],
     )
-    
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
-    
-    # Verify it was saved by querying it back
-    import sys
-    verify = db.get(models.Grievance, gid)
-    if verify:
-        print(f"✅ Verified: Grievance {gid} saved to DB", file=sys.stderr, flush=True)
-    else:
-        print(f"❌ ERROR: Grievance {gid} NOT found after commit!", file=sys.stderr, flush=True)
-
-    # Send confirmation email if not anonymous and email is provided
-    if not payload.is_anonymous and payload.complainant_email:
-        send_grievance_confirmation_email(
-            to_email=payload.complainant_email,
-            grievance_id=gid,
-            complainant_name=payload.complainant_name,
-            details=details,
-        )
+    return True
+
+
+def _created(values: Dict[str, Any], public_data: Dict[str, Any], send_email: bool) -> JSONResponse:
+    """Post-commit hand-offs and the 201 response for a new grievance."""
+    gid = values["id"]
+
+    # Hand off to the categorization workers only once the row is committed
+    if values["category_status"] == CATEGORY_PENDING:
+        categorization_queue.enqueue(gid, values["details"])
+
+    if send_email:
+        email_outbox_sender.notify()
 
-    # Return JSONResponse with custom header
-    public_data = _row_to_dict(obj)
-    print(f"=== RETURNING ID: {gid} ===", file=sys.stderr, flush=True)
-    
     # Add tracking_id at root level for easier Typebot access
     public_data["tracking_id"] = gid
-    
+
     return JSONResponse(
         status_code=201,
         content=public_data,
         headers={"X-Grievance-ID": gid}
     )
 
-@router.put("/{gid}/status", response_model=schemas.GrievancePublic)
-def update_grievance_status(
-    gid: str,
-    payload: schemas.GrievanceStatusUpdate,
+
+def create_grievance(
+    payload: GrievanceCreate,
     db: Session = Depends(get_db)
 ):
-    """Update grievance status, notes, household ID, category, or location."""
-    # Validate ID format
+    """Create a new grievance entry."""
+    values = _new_grievance_values(payload)
+
+    if db.get_bind().dialect.insert_returning:
+        # One round trip: INSERT ... RETURNING hands back the stored row, server defaults included
+        obj = db.scalars(insert(models.Grievance).returning(models.Grievance), [values]).one()
+    else:
+        obj = models.Grievance(**values)
+        db.add(obj)
+        db.flush()
+    # Built before commit, which would expire the row and force a reload
+    public_data = _row_to_dict(obj)
+
+    send_email = _queue_confirmation(db, payload, values)
+    db.commit()
+    return _created(values, public_data, send_email)
+
+
+async def create_grievance_async(
+    payload: GrievanceCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new grievance entry."""
+    values = _new_grievance_values(payload)
+
+    if db.get_bind().dialect.insert_returning:
+        obj = (await db.scalars(insert(models.Grievance).returning(models.Grievance), [values])).one()
+    else:
+        obj = models.Grievance(**values)
+        db.add(obj)
+        await db.flush()
+    public_data = _row_to_dict(obj)
+
+    send_email = _queue_confirmation(db, payload, values)
+    await db.commit()
+    return _created(values, public_data, send_email)
+
+
+router.add_api_route(
+    "/", create_grievance_async if DATABASE_ASYNC else create_grievance, methods=["POST"], status_code=201
+)
+
+def _bulk_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'line'}: {err['msg']}" for err in e.errors()
+    )
+
+
+def _insert_bulk_batch(db: Session, rows: List[Dict[str, Any]], emails: List[Dict[str, Any]]) -> Optional[str]:
+    """executemany INSERT of one batch and its outbox rows in one transaction; returns an error or None."""
+    try:
+        db.execute(insert(models.Grievance), rows)
+        if emails:
+            db.execute(insert(models.EmailOutbox), emails)
+        db.commit()
+        return None
+    except SQLAlchemyError as e:
+        db.rollback()
+        return str(e.orig) if getattr(e, "orig", None) else str(e)
+
+
+class _BodyReadingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose content iterator reads the request body as it goes.
+    Starlette's listens for a client disconnect at the same time, which would
+    swallow the body's messages; here a disconnect surfaces from request.stream().
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/bulk")
+async def bulk_ingest(
+    request: Request,
+    send_confirmation_emails: bool = Query(
+        default=False,
+        description="Queue confirmation emails for non-anonymous rows (off for historical backfills)",
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk-ingest grievances from an NDJSON body (one GrievanceCreate object per line).
+
+    The body is read as it streams in; valid lines are inserted in
+    BULK_INGEST_BATCH_SIZE batches with one executemany INSERT and commit per
+    batch. The response is NDJSON with one result per input line, in line
+    order ({"line", "ok", "id"} or {"line", "ok": false, "error"}), sent as
+    each batch is committed, followed by a {"summary": ...} line. Blank lines
+    are skipped. Rows needing categorization are queued after each commit.
+    """
+
+    async def results() -> AsyncIterator[str]:
+        # Results since the last flush, in line order; valid lines are filled in by the flush
+        window: List[Dict[str, Any]] = []
+        batch: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        emails: List[Dict[str, Any]] = []
+        totals = {"lines": 0, "inserted": 0}
+
+        async def flush() -> str:
+            if batch:
+                rows = [values for _, values in batch]
+                error = await run_in_threadpool(_insert_bulk_batch, db, rows, emails)
+                pending: List[Tuple[str, str]] = []
+                for entry, values in batch:
+                    if error:
+                        entry.update(ok=False, error=error)
+                    else:
+                        entry.update(ok=True, id=values["id"])
+                        if values["category_status"] == CATEGORY_PENDING:
+                            pending.append((values["id"], values["details"]))
+                # Rows that do not fit in the queue stay pending until it drains
+                categorization_queue.enqueue_many(pending)
+                if emails and not error:
+                    email_outbox_sender.notify()
+                batch.clear()
+                emails.clear()
+            totals["lines"] += len(window)
+            totals["inserted"] += sum(1 for entry in window if entry["ok"])
+            chunk = "".join(json.dumps(entry) + "\n" for entry in window)
+            window.clear()
+            return chunk
+
+        def handle(line_no: int, line: bytes) -> None:
+            if not line.strip():
+                return
+            entry: Dict[str, Any] = {"line": line_no}
+            window.append(entry)
+            try:
+                payload = GrievanceCreate.model_validate_json(line)
+                values = _new_grievance_values(payload)
+            except ValidationError as e:
+                entry.update(ok=False, error=_bulk_validation_error(e))
+                return
+            except HTTPException as e:
+                entry.update(ok=False, error=e.detail)
+                return
+            batch.append((entry, values))
+            if send_confirmation_emails and not payload.is_anonymous and payload.complainant_email:
+                emails.append(confirmation_email_values(payload.complainant_email, values["id"], payload.complainant_name))
+
+        try:
+            buffer = b""
+            line_no = 0
+            oversized = False
+            async for chunk in request.stream():
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    line_no += 1
+                    if oversized or len(line) > MAX_BULK_LINE_BYTES:
+                        window.append({"line": line_no, "ok": False, "error": "Line too long"})
+                        oversized = False
+                    else:
+                        handle(line_no, line)
+                    # Also bounds a run of invalid lines, which never fills a batch
+                    if len(window) >= BULK_INGEST_BATCH_SIZE:
+                        yield await flush()
+                if len(buffer) > MAX_BULK_LINE_BYTES:
+                    # Drop the rest of an oversized line instead of buffering it
+                    buffer = b""
+                    oversized = True
+            if buffer or oversized:
+                line_no += 1
+                if oversized or len(buffer) > MAX_BULK_LINE_BYTES:
+                    window.append({"line": line_no, "ok": False, "error": "Line too long"})
+                else:
+                    handle(line_no, buffer)
+            last = await flush()
+            summary = {"lines": totals["lines"], "inserted": totals["inserted"],
+                       "failed": totals["lines"] - totals["inserted"]}
+            yield last + json.dumps({"summary": summary}) + "\n"
+        finally:
+            # The request's session is used past the endpoint's return; release its connection here
+            db.close()
+
+    return _BodyReadingStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def _check_grievance_id(gid: str) -> None:
     if not GRIEVANCE_ID_PATTERN.fullmatch(gid):
         raise HTTPException(
             status_code=400,
             detail=f"Invalid grievance ID format: {gid}"
         )
-    
-    # Fetch grievance
-    grievance = db.query(models.Grievance).filter(models.Grievance.id == gid).first()
-    if not grievance:
-        raise HTTPException(status_code=404, detail="Grievance not found")
-    
+
+
+def _apply_status_update(grievance: models.Grievance, payload: schemas.GrievanceStatusUpdate) -> None:
+    """Apply the fields set in a status update to a loaded grievance."""
     # Update timestamp
     ts = payload.external_updated_at or _now_utc()
-    
+
     # Apply updates conditionally
     if payload.external_status is not None:
         grievance.external_status = payload.external_status
-    
+
     if payload.external_status_note is not None:
         grievance.external_status_note = payload.external_status_note
-    
+
     if payload.external_updated_at is not None:
         grievance.external_updated_at = ts
-    
+
     if payload.category_type is not None:
         grievance.category_type = payload.category_type.strip() or None
-    
+        grievance.category_status = None  # Manually assigned; background jobs leave it alone
+        grievance.category_source = models.CATEGORY_SOURCE_STAFF if grievance.category_type else None
+
     # Handle household ID with Odoo lookup
     if payload.hh_id:
         grievance.hh_id = payload.hh_id
@@ -335,16 +583,67 @@ def update_grievance_status(
             grievance.island = hh_info.get("island")
             grievance.district = hh_info.get("district")
             grievance.village = hh_info.get("village")
-    
+
+
+def update_grievance_status(
+    gid: str,
+    payload: schemas.GrievanceStatusUpdate,
+    db: Session = Depends(get_db)
+):
+    """Update grievance status, notes, household ID, category, or location."""
+    _check_grievance_id(gid)
+
+    # Fetch grievance
+    grievance = db.query(models.Grievance).filter(models.Grievance.id == gid).first()
+    if not grievance:
+        raise HTTPException(status_code=404, detail="Grievance not found")
+
+    _apply_status_update(grievance, payload)
+
     try:
         db.commit()
         db.refresh(grievance)
     except Exception:
         db.rollback()
         raise
+    receipt_cache.invalidate(gid)
     
     return grievance
 
+
+async def update_grievance_status_async(
+    gid: str,
+    payload: schemas.GrievanceStatusUpdate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update grievance status, notes, household ID, category, or location."""
+    _check_grievance_id(gid)
+
+    grievance = await db.get(models.Grievance, gid)
+    if not grievance:
+        raise HTTPException(status_code=404, detail="Grievance not found")
+
+    _apply_status_update(grievance, payload)
+
+    try:
+        await db.commit()
+        # Loads the values computed in SQL (updated_at, change_seq) before serialization
+        await db.refresh(grievance)
+    except Exception:
+        await db.rollback()
+        raise
+    receipt_cache.invalidate(gid)
+
+    return grievance
+
+
+router.add_api_route(
+    "/{gid}/status",
+    update_grievance_status_async if DATABASE_ASYNC else update_grievance_status,
+    methods=["PUT"],
+    response_model=schemas.GrievancePublic,
+)
+
 def get_household_info_from_odoo(hh_id: str) -> dict:
     # Replace this stub with a real Odoo API call if needed
     fake_lookup = {
@@ -353,6 +652,82 @@ def get_household_info_from_odoo(hh_id: str) -> dict:
     }
     return fake_lookup.get(hh_id, {})
 
+def _encode_cursor(created_at: datetime, gid: str) -> str:
+    """Opaque keyset cursor for the export: the (created_at, id) of the last row served."""
+    raw = json.dumps({"c": _to_iso(created_at), "i": gid}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["c"]), str(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _export_rows(db: Session, filters: List[Any], limit: Optional[int]) -> Iterator[models.Grievance]:
+    """Export rows newest first, streamed from the database in EXPORT_BATCH_SIZE batches."""
+    query = (
+        db.query(models.Grievance)
+        .filter(*filters)
+        .order_by(models.Grievance.created_at.desc(), models.Grievance.id.desc())
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query.yield_per(EXPORT_BATCH_SIZE)
+
+
+def _export_public(row: models.Grievance) -> Dict[str, Any]:
+    """JSON-ready row, validated once (the list endpoint used to validate every row twice)."""
+    return GrievancePublic(**_row_to_dict(row)).model_dump(mode="json")
+
+
+def _stream_export(db: Session, rows: Iterator[models.Grievance], fmt: str) -> Iterator[str]:
+    """
+    Encode export rows, yielding one chunk per EXPORT_BATCH_SIZE rows. StreamingResponse
+    runs this sync generator in the threadpool, so a chunk per row would cost a thread hop per row.
+    """
+    try:
+        parts: List[str] = []
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=list(GrievancePublic.model_fields))
+            writer.writeheader()
+        elif fmt == "json":
+            # A JSON array, same shape as before, without materializing the whole list
+            parts.append("[")
+
+        for i, row in enumerate(rows):
+            item = _export_public(row)
+            if fmt == "ndjson":
+                parts.append(json.dumps(item) + "\n")
+            elif fmt == "csv":
+                if item["attachments"] is not None:
+                    item["attachments"] = json.dumps(item["attachments"])
+                writer.writerow(item)
+            else:
+                parts.append(("," if i else "") + json.dumps(item))
+
+            if (i + 1) % EXPORT_BATCH_SIZE == 0:
+                if fmt == "csv":
+                    parts.append(buffer.getvalue())
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield "".join(parts)
+                parts.clear()
+
+        if fmt == "csv":
+            parts.append(buffer.getvalue())
+        elif fmt == "json":
+            parts.append("]")
+        yield "".join(parts)
+    finally:
+        # The request's session is used past the endpoint's return; release its connection here
+        db.close()
+
+
 @router.get("/export", response_model=List[GrievancePublic])
 def export_recent(
     since_hours: int = Query(
@@ -361,19 +736,132 @@ def export_recent(
         le=MAX_EXPORT_HOURS,
         description="How many past hours to export"
     ),
+    format: str = Query(
+        default="json",
+        pattern="^(json|ndjson|csv)$",
+        description="json (array), ndjson (one object per line) or csv",
+    ),
+    limit: Optional[int] = Query(
+        default=None,
+        ge=1,
+        le=MAX_EXPORT_PAGE_SIZE,
+        description="Page size; when more rows remain the X-Next-Cursor header is set",
+    ),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor value from the previous page"),
     db: Session = Depends(get_db),
 ):
-    """Export grievances created within the specified time window."""
+    """
+    Export grievances created within the specified time window, newest first.
+
+    The response is streamed in the requested format so memory stays flat
+    whatever the window size. With `limit`, results are keyset-paginated on
+    (created_at, id): pass the X-Next-Cursor header of one page as `cursor`
+    to get the next one.
+    """
     cutoff = _now_utc() - timedelta(hours=since_hours)
-    
-    rows = (
-        db.query(models.Grievance)
-        .filter(models.Grievance.created_at >= cutoff)
-        .order_by(models.Grievance.created_at.desc())
-        .all()
+    g = models.Grievance
+    filters: List[Any] = [g.created_at >= cutoff]
+    if cursor:
+        after_created, after_id = _decode_cursor(cursor)
+        filters.append(or_(g.created_at < after_created, and_(g.created_at == after_created, g.id < after_id)))
+
+    headers = {}
+    if limit is not None:
+        # Key-only lookup of this page's last row and whether another page follows
+        boundary = (
+            db.query(g.created_at, g.id)
+            .filter(*filters)
+            .order_by(g.created_at.desc(), g.id.desc())
+            .offset(limit - 1)
+            .limit(2)
+            .all()
+        )
+        if len(boundary) == 2:
+            headers["X-Next-Cursor"] = _encode_cursor(*boundary[0])
+
+    media_types = {"json": "application/json", "ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+    if format == "csv":
+        headers["Content-Disposition"] = 'attachment; filename="grievances.csv"'
+    return StreamingResponse(
+        _stream_export(db, _export_rows(db, filters, limit), format),
+        media_type=media_types[format],
+        headers=headers,
+    )
+
+def _encode_change_cursor(updated_at: Optional[datetime], seq: int, gid: str) -> str:
+    """Opaque change feed cursor: the (updated_at, change_seq, id) of the last change served."""
+    raw = json.dumps(
+        {"u": _to_iso(updated_at) if updated_at else None, "s": seq, "i": gid}, separators=(",", ":")
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_change_cursor(cursor: str) -> Tuple[Optional[datetime], int, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        updated_at = datetime.fromisoformat(data["u"]) if data["u"] else None
+        return updated_at, int(data["s"]), str(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/changes", response_model=schemas.GrievanceChangeFeed)
+def list_changes(
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous poll"),
+    since: Optional[datetime] = Query(
+        default=None, description="Start of the feed when no cursor is held yet (updated_at lower bound)"
+    ),
+    limit: int = Query(default=CHANGE_FEED_DEFAULT_LIMIT, ge=1, le=CHANGE_FEED_MAX_LIMIT),
+    db: Session = Depends(get_db),
+):
+    """
+    Grievances created or updated after `cursor`, oldest change first.
+
+    Every insert and update takes the next change_seq, so a sync client only
+    downloads what changed since its last poll. Store `next_cursor` and send
+    it back on the next poll; keep polling while `has_more` is true.
+    """
+    g = models.Grievance
+    if cursor:
+        after_updated, after_seq, after_id = _decode_change_cursor(cursor)
+    else:
+        if since is not None:
+            # Stored timestamps are UTC; normalize offsets such as Tonga's +13:00
+            since = since.replace(tzinfo=timezone.utc) if since.tzinfo is None else since.astimezone(timezone.utc)
+        after_updated, after_seq, after_id = since, 0, ""
+
+    query = db.query(g).filter(g.change_seq.isnot(None))
+    if after_seq:
+        query = query.filter(or_(g.change_seq > after_seq, and_(g.change_seq == after_seq, g.id > after_id)))
+    elif after_updated is not None:
+        query = query.filter(g.updated_at >= after_updated)
+    rows = query.order_by(g.change_seq, g.id).limit(limit + 1).all()
+
+    horizon = _now_utc() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+    items = []
+    has_more = len(rows) > limit
+    for row in rows[:limit]:
+        updated_at = row.updated_at
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        if updated_at > horizon:
+            # Stop at the first unsettled change; it is served on a later poll
+            has_more = False
+            break
+        items.append(row)
+
+    if items:
+        last = items[-1]
+        next_cursor = _encode_change_cursor(last.updated_at, last.change_seq, last.id)
+    else:
+        next_cursor = cursor or _encode_change_cursor(after_updated, after_seq, after_id)
+
+    return schemas.GrievanceChangeFeed(
+        items=[_row_to_public(row) for row in items],
+        next_cursor=next_cursor,
+        has_more=has_more,
     )
-    
-    return [_row_to_public(r) for r in rows]
 
 @router.get("/{gid}", response_model=GrievancePublic)
 def get_grievance(gid: str, db: Session = Depends(get_db)):
@@ -382,15 +870,27 @@ def get_grievance(gid: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Not found")
     return _row_to_public(row)
 
-@router.get("/{gid}/receipt.pdf", response_class=Response)
-def receipt(gid: str, db: Session = Depends(get_db)):
-    """Generate and download a PDF receipt for a grievance."""
-    row = db.get(models.Grievance, gid)
-    if not row:
-        raise HTTPException(status_code=404, detail="Grievance not found")
-    
-    # Build PDF with essential data including attachments and complainant info
-    pdf = build_receipt_pdf({
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the receipt's validators."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _receipt_data(row: models.Grievance) -> Dict[str, Any]:
+    """Essential receipt data including attachments and complainant info"""
+    return {
         "id": row.id,
         "created_at": _to_iso(row.created_at),
         "is_anonymous": row.is_anonymous,
@@ -403,89 +903,200 @@ def receipt(gid: str, db: Session = Depends(get_db)):
         "details": row.details or "N/A",
         "category_type": row.category_type or "Unspecified",
         "attachments": row.attachments,
-    })
-    
+    }
+
+
+def _renderer_unavailable(error: RendererUnavailable) -> HTTPException:
+    """503 with Retry-After for a full render queue, a render timeout or a failed render pool."""
+    detail = (
+        "Receipt rendering is busy, please retry shortly" if isinstance(error, RendererBusy)
+        else "Receipt rendering is temporarily unavailable, please retry shortly"
+    )
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(RECEIPT_RETRY_AFTER_SECONDS)},
+    )
+
+
+@router.get("/{gid}/receipt.pdf", response_class=Response)
+async def receipt(gid: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Download a PDF receipt for a grievance.
+
+    Rendered receipts are cached per grievance version, and clients that
+    send back the ETag or Last-Modified they were given get a 304. Renders
+    are awaited on the event loop, so a download waiting for the render
+    pool doesn't hold a threadpool thread that submissions need.
+    """
+    row = await run_in_threadpool(db.get, models.Grievance, gid)
+    if not row:
+        raise HTTPException(status_code=404, detail="Grievance not found")
+
+    version = receipt_version(row.updated_at, row.created_at)
+    etag = receipt_etag(gid, version)
+    last_modified = row.updated_at or row.created_at or _now_utc()
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.astimezone(timezone.utc), usegmt=True),
+        # Receipts carry personal data: browsers may keep them but must revalidate, shared caches may not
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, etag, last_modified):
+        receipt_cache_requests.inc(1, "not_modified")
+        return Response(status_code=304, headers=headers)
+
+    # The cache may read and write RECEIPT_CACHE_DIR
+    pdf = await run_in_threadpool(receipt_cache.get, gid, version)
+    if pdf is None:
+        try:
+            pdf = await receipt_renderer.render_async(_receipt_data(row))
+        except RendererUnavailable as e:
+            raise _renderer_unavailable(e)
+        await run_in_threadpool(receipt_cache.set, gid, version, pdf)
+
     return Response(
         content=pdf,
         media_type="application/pdf",
         headers={
+            **headers,
             "Content-Disposition": f'inline; filename="{gid}.pdf"'
         }
     )
 
+
+@router.post("/receipts.zip", response_class=Response)
+def receipts_zip(payload: schemas.ReceiptBatchRequest, db: Session = Depends(get_db)):
+    """
+    Download the receipts for several grievances as one ZIP archive.
+
+    Receipts missing from the cache are rendered in parallel on the render
+    pool. Archive entries follow the order of ``ids``.
+    """
+    ids = list(dict.fromkeys(payload.ids))
+    for gid in ids:
+        _check_grievance_id(gid)
+    rows = {row.id: row for row in db.query(models.Grievance).filter(models.Grievance.id.in_(ids))}
+    missing = [gid for gid in ids if gid not in rows]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Grievances not found: {', '.join(missing)}")
+
+    versions = {gid: receipt_version(rows[gid].updated_at, rows[gid].created_at) for gid in ids}
+    pdfs = {gid: receipt_cache.get(gid, versions[gid]) for gid in ids}
+    to_render = [gid for gid in ids if pdfs[gid] is None]
+    try:
+        for gid, pdf in zip(to_render, receipt_renderer.render_many(_receipt_data(rows[gid]) for gid in to_render)):
+            receipt_cache.set(gid, versions[gid], pdf)
+            pdfs[gid] = pdf
+    except RendererUnavailable as e:
+        raise _renderer_unavailable(e)
+
+    buf = io.BytesIO()
+    # PDFs are already compressed; storing them keeps archiving cheap
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as archive:
+        for gid in ids:
+            archive.writestr(f"{gid}.pdf", pdfs[gid])
+
+    return Response(
+        content=buf.getvalue(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="receipts.zip"'},
+    )
+
+def _apply_batch_item(grievance: models.Grievance, item: schemas.GrievanceBatchUpdateItem) -> List[str]:
+    """Apply one batch update item to a loaded row; returns the names of the fields set."""
+    updated_fields: List[str] = []
+
+    # Apply updates conditionally and track changes
+    if item.external_status is not None:
+        grievance.external_status = item.external_status
+        updated_fields.append("external_status")
+
+    if item.external_status_note is not None:
+        grievance.external_status_note = item.external_status_note
+        updated_fields.append("external_status_note")
+
+    if item.external_updated_at is not None:
+        grievance.external_updated_at = item.external_updated_at
+        updated_fields.append("external_updated_at")
+
+    if item.category_type is not None:
+        grievance.category_type = item.category_type
+        grievance.category_status = None  # Manually assigned; background jobs leave it alone
+        grievance.category_source = models.CATEGORY_SOURCE_STAFF if item.category_type else None
+        updated_fields.append("category_type")
+
+    if item.hh_id is not None:
+        grievance.hh_id = item.hh_id
+        updated_fields.append("hh_id")
+
+    # Location overrides from external system
+    if item.island is not None:
+        grievance.island = item.island
+        updated_fields.append("island")
+
+    if item.district is not None:
+        grievance.district = item.district
+        updated_fields.append("district")
+
+    if item.village is not None:
+        grievance.village = item.village
+        updated_fields.append("village")
+
+    return updated_fields
+
+
 @router.put("/status-batch", response_model=schemas.GrievanceBatchUpdateResponse)
 def update_grievances_status_batch(
     payload: schemas.GrievanceBatchUpdateRequest,
     db: Session = Depends(get_db)
 ):
-    """Batch update multiple grievances' status, notes, household ID, category, or location."""
-    results: List[schemas.GrievanceBatchUpdateResult] = []
+    """
+    Batch update multiple grievances' status, notes, household ID, category, or location.
 
-    for item in payload.updates:
-        updated_fields: List[str] = []
-        try:
-            # Fetch grievance
-            grievance = db.query(models.Grievance).filter(
-                models.Grievance.id == item.gid
-            ).first()
-            
-            if not grievance:
+    All target rows are loaded with IN queries, changes are applied in memory
+    and flushed together in one transaction. If that flush fails, the batch is
+    replayed with a savepoint per item so each failure is reported on its own
+    result while the other items still commit.
+    """
+    ids = list(dict.fromkeys(item.gid for item in payload.updates))
+    rows: Dict[str, models.Grievance] = {}
+    for i in range(0, len(ids), BATCH_UPDATE_CHUNK_SIZE):
+        chunk = ids[i:i + BATCH_UPDATE_CHUNK_SIZE]
+        rows.update((row.id, row) for row in db.query(models.Grievance).filter(models.Grievance.id.in_(chunk)))
+
+    results: List[schemas.GrievanceBatchUpdateResult] = []
+    applied: List[int] = []  # Indexes into results for items that found their row
+    try:
+        with db.begin_nested():
+            for item in payload.updates:
+                grievance = rows.get(item.gid)
+                if grievance is None:
+                    results.append(schemas.GrievanceBatchUpdateResult(
+                        gid=item.gid, ok=False, error="Grievance not found"
+                    ))
+                    continue
+                applied.append(len(results))
                 results.append(schemas.GrievanceBatchUpdateResult(
-                    gid=item.gid,
-                    ok=False,
-                    error="Grievance not found"
+                    gid=item.gid, ok=True, updated_fields=_apply_batch_item(grievance, item)
                 ))
-                continue
-
-            # Apply updates conditionally and track changes
-            if item.external_status is not None:
-                grievance.external_status = item.external_status
-                updated_fields.append("external_status")
-
-            if item.external_status_note is not None:
-                grievance.external_status_note = item.external_status_note
-                updated_fields.append("external_status_note")
-
-            if item.external_updated_at is not None:
-                grievance.external_updated_at = item.external_updated_at
-                updated_fields.append("external_updated_at")
-
-            if item.category_type is not None:
-                grievance.category_type = item.category_type
-                updated_fields.append("category_type")
-
-            if item.hh_id is not None:
-                grievance.hh_id = item.hh_id
-                updated_fields.append("hh_id")
-
-            # Location overrides from external system
-            if item.island is not None:
-                grievance.island = item.island
-                updated_fields.append("island")
-            
-            if item.district is not None:
-                grievance.district = item.district
-                updated_fields.append("district")
-            
-            if item.village is not None:
-                grievance.village = item.village
-                updated_fields.append("village")
-
-            db.commit()
-            db.refresh(grievance)
-
-            results.append(schemas.GrievanceBatchUpdateResult(
-                gid=item.gid,
-                ok=True,
-                updated_fields=updated_fields
-            ))
-            
-        except Exception as e:
-            db.rollback()
-            results.append(schemas.GrievanceBatchUpdateResult(
-                gid=item.gid,
-                ok=False,
-                error=str(e)
-            ))
+            db.flush()
+    except SQLAlchemyError:
+        # Rolling back the savepoint expired the pending changes; replay them one item at a time
+        for index in applied:
+            item = payload.updates[index]
+            try:
+                with db.begin_nested():
+                    _apply_batch_item(rows[item.gid], item)
+                    db.flush()
+            except SQLAlchemyError as e:
+                results[index] = schemas.GrievanceBatchUpdateResult(gid=item.gid, ok=False, error=str(e))
+    db.commit()
+
+    for result in results:
+        if result.ok:
+            receipt_cache.invalidate(result.gid)
 
     return schemas.GrievanceBatchUpdateResponse(results=results)
\ No newline at end of file
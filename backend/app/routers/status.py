@@ -1,14 +1,16 @@
 import os
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 from ipaddress import ip_network, ip_address, AddressValueError
 from typing import List
 from dateutil import parser as date_parser
 
-from ..database import get_db
+from ..database import DATABASE_ASYNC, get_async_db, get_db
 from .. import models
 from ..schemas import StatusUpdate
+from ..services.receipt_cache import receipt_cache
 
 router = APIRouter()
 
@@ -61,8 +63,25 @@ def _check_auth(request: Request) -> None:
                 detail="Invalid client IP"
             )
 
-@router.put("/{gid}/status")
-async def update_status(
+def _apply_status(row: models.Grievance, payload: StatusUpdate) -> None:
+    """Copy an external status update onto the grievance."""
+    row.external_status = payload.status
+    row.external_status_note = payload.note
+    
+    # Parse and set timestamp
+    if payload.updated_at:
+        if isinstance(payload.updated_at, str):
+            try:
+                row.external_updated_at = date_parser.parse(payload.updated_at)
+            except (ValueError, TypeError):
+                # Fall back to current time if parsing fails
+                row.external_updated_at = datetime.now(timezone.utc)
+        else:
+            row.external_updated_at = payload.updated_at
+    else:
+        row.external_updated_at = datetime.now(timezone.utc)
+
+def update_status(
     gid: str,
     payload: StatusUpdate,
     request: Request,
@@ -80,29 +99,45 @@ async def update_status(
             detail="Grievance not found"
         )
     
-    # Update fields
-    row.external_status = payload.status
-    row.external_status_note = payload.note
-    
-    # Parse and set timestamp
-    if payload.updated_at:
-        if isinstance(payload.updated_at, str):
-            try:
-                row.external_updated_at = date_parser.parse(payload.updated_at)
-            except (ValueError, TypeError):
-                # Fall back to current time if parsing fails
-                row.external_updated_at = datetime.now(timezone.utc)
-        else:
-            row.external_updated_at = payload.updated_at
-    else:
-        row.external_updated_at = datetime.now(timezone.utc)
+    _apply_status(row, payload)
     
     # Persist changes
     db.add(row)
     db.commit()
+    receipt_cache.invalidate(gid)
     
     return {
         "ok": True,
         "id": gid,
-        "status": row.external_status
-    }
\ No newline at end of file
+        "status": payload.status
+    }
+
+async def update_status_async(
+    gid: str,
+    payload: StatusUpdate,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update grievance status (authenticated endpoint for external systems like Odoo)."""
+    _check_auth(request)
+    
+    row = await db.get(models.Grievance, gid)
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Grievance not found"
+        )
+    
+    _apply_status(row, payload)
+    await db.commit()
+    receipt_cache.invalidate(gid)
+    
+    return {
+        "ok": True,
+        "id": gid,
+        "status": payload.status
+    }
+
+router.add_api_route(
+    "/{gid}/status", update_status_async if DATABASE_ASYNC else update_status, methods=["PUT"]
+)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, field_validator, model_validator, ConfigDict
-from typing import Optional, List, Union, Any
+from typing import Optional, List, Union, Any, Dict
 from datetime import datetime
 import re
 
@@ -10,6 +10,7 @@ class AttachmentIn(BaseModel):
     url: Optional[str] = ""
     size: Optional[int] = 0
     type: Optional[str] = ""
+    sha256: Optional[str] = None  # Content digest of files stored through /upload-file
     
     model_config = ConfigDict(extra='ignore')  # Ignore unexpected fields
 
@@ -100,6 +101,7 @@ class GrievancePublic(BaseModel):
     village: Optional[str] = None
 
     category_type: Optional[str] = None
+    category_status: Optional[str] = None
 
     details: Optional[str] = None
 
@@ -162,6 +164,30 @@ class GrievanceBatchUpdateResult(BaseModel):
 class GrievanceBatchUpdateResponse(BaseModel):
     results: List[GrievanceBatchUpdateResult]
 
+class DirectUploadRequest(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: str = Field(..., description="MIME type the file will be uploaded with")
+    size: int = Field(..., ge=0, description="File size in bytes")
+
+class DirectUploadTicket(BaseModel):
+    key: str
+    upload_url: str = Field(..., description="Pre-signed URL to PUT the file to")
+    method: str
+    headers: Dict[str, str] = Field(..., description="Headers the PUT must carry")
+    expires_at: int = Field(..., description="Unix time after which upload_url stops working")
+    ticket: str = Field(..., description="Pass to /upload-complete once the PUT succeeded")
+
+class DirectUploadComplete(BaseModel):
+    ticket: str
+
+class ReceiptBatchRequest(BaseModel):
+    ids: List[str] = Field(..., description="Grievance ids whose receipts to include", min_length=1, max_length=200)
+
+class GrievanceChangeFeed(BaseModel):
+    items: List[GrievancePublic]
+    next_cursor: str = Field(..., description="Opaque cursor; pass as `cursor` on the next poll")
+    has_more: bool = Field(..., description="Whether more changes can be fetched right away")
+
 class CategorizationRequest(BaseModel):
     details: str = Field(..., description="Grievance details text to categorize", min_length=1)
 
@@ -172,4 +198,77 @@ class CategorizationResponse(BaseModel):
     subcategory_name: Optional[str] = Field(None, description="Human-readable subcategory name")
     confidence: str = Field(..., description="Confidence level: high, medium, or low")
     reasoning: str = Field(..., description="Brief explanation for the categorization")
-    display: str = Field(..., description="Formatted display string for the category")
\ No newline at end of file
+    display: str = Field(..., description="Formatted display string for the category")
+
+class CategorizationBatchRequest(BaseModel):
+    details: List[str] = Field(..., description="Grievance details texts to categorize", min_length=1, max_length=100)
+
+class CategorizationBatchResult(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[CategorizationResponse] = None
+    error: Optional[str] = None
+
+class CategorizationBatchResponse(BaseModel):
+    results: List[CategorizationBatchResult]
+
+class CategorizationQueueStats(BaseModel):
+    running: bool
+    workers: int
+    queue_depth: int
+    max_queue_size: int
+    in_flight: int
+    enqueued: int
+    rejected: int
+    processed: int
+    failed: int
+    retried: int
+    throughput_per_minute: float
+    uptime_seconds: float
+
+class DatabasePoolStats(BaseModel):
+    pool_class: Optional[str] = None
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    checked_out: Optional[int] = None
+    checked_in: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: int
+    connects: int
+    invalidations: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    wait_seconds_avg: float
+    checkout_latency_ms: Dict[str, int]  # Cumulative counts per upper bound, like a Prometheus histogram
+
+class ReceiptRendererStats(BaseModel):
+    running: bool
+    workers: int
+    pending: int
+    max_pending: int
+    rendered: int
+    rejected: int
+    failed: int
+
+class CategorizationCacheStats(BaseModel):
+    entries: int
+    max_entries: int
+    ttl_seconds: int
+    shared_tier: bool
+    hits: int
+    shared_hits: int
+    misses: int
+    evictions: int
+    hit_ratio: float
+
+class LocalClassifierStats(BaseModel):
+    enabled: bool
+    trained: bool
+    classes: int
+    training_examples: int
+    threshold: float
+    local_answers: int
+    escalations: int
+    fallbacks: int
+    escalation_rate: float
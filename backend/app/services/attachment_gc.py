@@ -0,0 +1,199 @@
+"""
+Attachment garbage collection job.
+
+Files uploaded through /upload-file or a pre-signed URL whose grievance was
+never submitted stay in the bucket. This job collects the object keys that
+grievances reference, streaming the ``attachments`` JSON in keyset-paginated
+batches, then walks the bucket listing page by page and removes objects that
+are not referenced and are older than a grace period (an upload still waiting
+for its submission is recent) with multi-object deletes:
+
+    python -m app.services.attachment_gc --grace-hours 24 --dry-run
+
+Memory stays bounded on large buckets: the listing and deletes are handled
+one page at a time, and referenced keys are kept as a sorted array of 64-bit
+digests (8 bytes per attachment) rather than a set of strings.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import unquote, urlsplit
+
+from .. import models
+from ..database import SessionLocal
+from ..utils.minio import MAX_DELETE_KEYS, MAX_LIST_KEYS, MinIOClient, minio_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRACE_HOURS = float(os.getenv("ATTACHMENT_GC_GRACE_HOURS", "24"))
+
+
+def _digest(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ReferencedKeys:
+    """
+    Object keys referenced by grievances, as sorted 64-bit digests.
+
+    A digest collision can only make an orphan look referenced (it is kept),
+    never the reverse.
+    """
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._digests = array("Q", (_digest(key) for key in keys))
+        self._sorted = False
+
+    def add(self, key: str) -> None:
+        self._digests.append(_digest(key))
+        self._sorted = False
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def __contains__(self, key: str) -> bool:
+        if not self._sorted:
+            self._digests = array("Q", sorted(self._digests))
+            self._sorted = True
+        digest = _digest(key)
+        index = bisect_left(self._digests, digest)
+        return index < len(self._digests) and self._digests[index] == digest
+
+
+def attachment_key(attachment: Any, bucket: str) -> Optional[str]:
+    """Object key in ``bucket`` an attachment points to, or None for other URLs."""
+    url = attachment.get("url") if isinstance(attachment, dict) else attachment
+    if not isinstance(url, str):
+        return None
+    # Match on the path only: stored URLs use the internal or the public MinIO host
+    path = urlsplit(url).path
+    prefix = f"/{bucket}/"
+    if not path.startswith(prefix):
+        return None
+    return unquote(path[len(prefix):]) or None
+
+
+def collect_referenced_keys(session_factory: Callable, bucket: str, batch_size: int = 1000) -> ReferencedKeys:
+    """Keys of every object referenced by a grievance's attachments, read in batches."""
+    referenced = ReferencedKeys()
+    last_id = ""
+    while True:
+        db = session_factory()
+        try:
+            rows = (
+                db.query(models.Grievance.id, models.Grievance.attachments)
+                .filter(models.Grievance.attachments.isnot(None), models.Grievance.id > last_id)
+                .order_by(models.Grievance.id)
+                .limit(batch_size)
+                .all()
+            )
+        finally:
+            db.close()
+        if not rows:
+            return referenced
+
+        for _, attachments in rows:
+            if isinstance(attachments, str):
+                try:
+                    attachments = json.loads(attachments)
+                except ValueError:
+                    continue
+            if isinstance(attachments, dict):
+                attachments = [attachments]
+            for attachment in attachments if isinstance(attachments, list) else ():
+                key = attachment_key(attachment, bucket)
+                if key:
+                    referenced.add(key)
+        last_id = rows[-1][0]
+
+
+def run_attachment_gc(
+    session_factory: Callable = SessionLocal,
+    grace: timedelta = timedelta(hours=DEFAULT_GRACE_HOURS),
+    batch_size: int = 1000,
+    prefix: str = "",
+    dry_run: bool = False,
+    client: MinIOClient = minio_client,
+) -> Dict[str, Any]:
+    """
+    Delete unreferenced attachment objects older than ``grace``.
+
+    Args:
+        session_factory: Callable returning a SQLAlchemy session
+        grace: Objects modified more recently than this are never deleted
+        batch_size: Grievance rows read, listing page size and keys per bulk delete
+            (the last two capped at S3's limit of 1000)
+        prefix: Only consider objects under this key prefix
+        dry_run: Count orphans without deleting them
+        client: MinIO client for the bucket
+
+    Returns:
+        Counts of referenced keys and of objects scanned, kept as recent,
+        found orphaned, deleted and failed to delete.
+    """
+    cutoff = datetime.now(timezone.utc) - grace
+    # References are read before the listing: anything submitted during the
+    # run points at an object uploaded within the grace period
+    referenced = collect_referenced_keys(session_factory, client.bucket_name, batch_size)
+    logger.info(f"{len(referenced)} attachment references loaded")
+
+    summary = {"referenced": len(referenced), "scanned": 0, "recent": 0, "orphaned": 0,
+               "deleted": 0, "failed": 0, "dry_run": dry_run}
+    pending: List[str] = []
+
+    def flush() -> None:
+        if not pending:
+            return
+        if dry_run:
+            logger.info(f"Would delete {len(pending)} orphaned attachments, first {pending[0]}")
+        else:
+            failed = client.delete_objects(pending)
+            for key, code in failed.items():
+                logger.warning(f"Could not delete orphaned attachment {key}: {code}")
+            summary["deleted"] += len(pending) - len(failed)
+            summary["failed"] += len(failed)
+            logger.info(f"Scanned {summary['scanned']} objects, deleted {summary['deleted']} orphans")
+        pending.clear()
+
+    for obj in client.list_objects(prefix=prefix, page_size=min(batch_size, MAX_LIST_KEYS)):
+        summary["scanned"] += 1
+        if obj["key"] in referenced:
+            continue
+        if obj["last_modified"] is None or obj["last_modified"] > cutoff:
+            summary["recent"] += 1
+            continue
+        summary["orphaned"] += 1
+        pending.append(obj["key"])
+        if len(pending) >= min(batch_size, MAX_DELETE_KEYS):
+            flush()
+    flush()
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Delete attachment objects no grievance references.")
+    parser.add_argument("--grace-hours", type=float, default=DEFAULT_GRACE_HOURS)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting them")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = run_attachment_gc(
+        grace=timedelta(hours=args.grace_hours),
+        batch_size=args.batch_size,
+        prefix=args.prefix,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Content-addressed cache for LLM categorization results.
+
+Results are keyed on the normalized grievance text, the model name and the
+category taxonomy version, so a Typebot preview followed by the final
+submission of the same text only pays for one LLM call. Entries live in a
+bounded in-process LRU and, when ``CATEGORIZATION_CACHE_REDIS_URL`` is set,
+in a shared Redis tier so all API workers benefit.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # Redis tier is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "grievance:categorization:"
+
+
+def normalize_details(details: str) -> str:
+    """Collapse case and whitespace so trivially different texts share an entry."""
+    return " ".join(details.lower().split())
+
+
+class CategorizationCache:
+    """Two-tier (LRU + optional Redis) cache with TTL and hit/miss counters."""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        redis_url: Optional[str] = None,
+        redis_client: Any = None,
+    ):
+        self.max_entries = (
+            max_entries if max_entries is not None else int(os.getenv("CATEGORIZATION_CACHE_SIZE", "1024"))
+        )
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None else int(os.getenv("CATEGORIZATION_CACHE_TTL", "86400"))
+        )
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._redis = redis_client
+        if self._redis is None:
+            url = redis_url if redis_url is not None else os.getenv("CATEGORIZATION_CACHE_REDIS_URL", "")
+            if url and redis is not None:
+                self._redis = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+            elif url:
+                logger.warning("CATEGORIZATION_CACHE_REDIS_URL set but the redis package is not installed")
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(details: str, model: str, taxonomy_version: str) -> str:
+        raw = f"{model}\0{taxonomy_version}\0{normalize_details(details)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(value)
+                del self._entries[key]
+
+        value = self._get_shared(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._put_local(key, value, now)
+        return dict(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._put_local(key, dict(value), time.monotonic())
+        self._set_shared(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "shared_tier": self._redis is not None,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+    def _put_local(self, key: str, value: Dict[str, Any], now: float) -> None:
+        # Caller holds self._lock
+        self._entries[key] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _get_shared(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(KEY_PREFIX + key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            # A cache outage must never break categorization
+            logger.warning(f"Categorization cache read failed: {e}")
+            return None
+
+    def _set_shared(self, key: str, value: Dict[str, Any]) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.setex(KEY_PREFIX + key, self.ttl_seconds, json.dumps(value))
+        except Exception as e:
+            logger.warning(f"Categorization cache write failed: {e}")
+
+
+# Global instance
+categorization_cache = CategorizationCache()
@@ -0,0 +1,371 @@
+"""
+Background categorization queue.
+
+Grievances submitted without a category are persisted immediately with
+``category_status = "pending"``. A bounded pool of worker threads then calls
+the LLM categorizer off the request path and fills in ``category_type`` once
+a result is available, retrying transient LLM errors with exponential backoff.
+
+Rows that do not fit in the queue stay pending; once the queue drains, the
+workers sweep the table for pending rows again, so a burst larger than the
+queue (e.g. a bulk ingest) is worked through instead of waiting for a restart.
+
+Every API worker process runs its own queue. A pending row is leased to one
+process at a time through ``category_claimed_until``: set when the row is
+inserted, or claimed by a sweep like the email outbox claims its batches, and
+released if the row does not fit in the queue. A process that dies leaves its
+leases to expire, after which any other process's sweep picks the rows up.
+The queue retries LLM errors itself, so its calls go out with the OpenAI
+client's own retries turned off.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from openai import OpenAIError
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from .llm_categorizer import CATEGORY_TAXONOMY_VERSION, categorize_grievance, get_category_display
+
+logger = logging.getLogger(__name__)
+
+# Values stored in Grievance.category_status
+CATEGORY_PENDING = "pending"
+CATEGORY_DONE = "done"
+CATEGORY_FAILED = "failed"
+
+# Window used to compute the rolling throughput figure
+THROUGHPUT_WINDOW_SECONDS = 60
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class CategorizationQueue:
+    """Bounded in-process queue drained by a pool of categorization workers."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        claim_seconds: Optional[float] = None,
+        session_factory: Callable = SessionLocal,
+        # Retried here with backoff; SDK retries on top would multiply the calls per row
+        categorize: Callable[[str], Dict[str, Any]] = partial(categorize_grievance, max_retries=0),
+    ):
+        self.workers = workers if workers is not None else int(os.getenv("CATEGORIZATION_WORKERS", "2"))
+        self.max_size = max_size if max_size is not None else int(os.getenv("CATEGORIZATION_QUEUE_SIZE", "1000"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("CATEGORIZATION_MAX_RETRIES", "3"))
+        self.backoff_base = (
+            backoff_base if backoff_base is not None else float(os.getenv("CATEGORIZATION_RETRY_BACKOFF", "1.0"))
+        )
+        # Long enough for a full queue to drain; a lease that runs out early only risks a second LLM call
+        self.claim_seconds = (
+            claim_seconds if claim_seconds is not None else float(os.getenv("CATEGORIZATION_CLAIM_SECONDS", "900"))
+        )
+        self._session_factory = session_factory
+        self._categorize = categorize
+
+        self._queue: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue(maxsize=self.max_size)
+        self._threads: list = []
+        self._lock = threading.Lock()
+        self._queued_ids: set = set()
+        self._started_at: Optional[float] = None
+        # Pending rows were left out of the queue; sweep for them when it drains
+        self._sweep_needed = False
+
+        # Counters exposed through stats()
+        self._in_flight = 0
+        self._enqueued = 0
+        self._rejected = 0
+        self._processed = 0
+        self._failed = 0
+        self._retried = 0
+        self._completions: Deque[float] = deque(maxlen=10000)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self) -> None:
+        """Start the worker threads and re-enqueue rows left pending by a previous run."""
+        if self.running or self.workers <= 0:
+            return
+        self._started_at = time.monotonic()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"categorizer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.enqueue_pending()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal the workers to exit and wait for them to finish their current job."""
+        if not self.running:
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def claim_until(self) -> Optional[datetime]:
+        """
+        Lease for a pending row about to be inserted and enqueued here, or None
+        when the workers are not running and another process should take it.
+        """
+        if not self.running:
+            return None
+        return _now() + timedelta(seconds=self.claim_seconds)
+
+    def enqueue(self, gid: str, details: str) -> bool:
+        """
+        Schedule a grievance for background categorization.
+
+        Returns False when the workers are not running or the queue is full; the
+        row then stays pending and is picked up again by enqueue_pending(), on
+        start or once the workers have drained the queue.
+        """
+        if not self.running:
+            return False
+        if not self._put(gid, details):
+            self._release([gid])
+            return False
+        return True
+
+    def _put(self, gid: str, details: str) -> bool:
+        if not self.running:
+            return False
+        with self._lock:
+            # Already queued or being processed; don't pay for a second LLM call
+            if gid in self._queued_ids:
+                return True
+            self._queued_ids.add(gid)
+        try:
+            self._queue.put_nowait((gid, details))
+        except queue.Full:
+            with self._lock:
+                self._queued_ids.discard(gid)
+                self._rejected += 1
+                self._sweep_needed = True
+            logger.warning(f"Categorization queue full, leaving {gid} pending until it drains")
+            return False
+        with self._lock:
+            self._enqueued += 1
+        return True
+
+    def enqueue_many(self, jobs: Iterable[Tuple[str, str]]) -> int:
+        """
+        Schedule several grievances, stopping at the first one that does not
+        fit: the rest stay pending for the sweep. Returns how many were queued.
+        """
+        if not self.running:
+            return 0
+        jobs = list(jobs)
+        queued = 0
+        for gid, details in jobs:
+            if not self._put(gid, details):
+                break
+            queued += 1
+        self._release([gid for gid, _ in jobs[queued:]])
+        return queued
+
+    def enqueue_pending(self) -> int:
+        """
+        Claim and enqueue grievances persisted as pending (before a restart, or
+        that did not fit in the queue) and not leased to another process.
+        """
+        if not self.running:
+            return 0
+        limit = self.max_size - self._queue.qsize()
+        if limit <= 0:
+            with self._lock:
+                self._sweep_needed = True
+            return 0
+        try:
+            rows = self._claim_pending(limit)
+        except Exception as e:
+            logger.error(f"Failed to claim pending grievances: {e}")
+            return 0
+        if len(rows) == limit:
+            # There may be more than one queue's worth
+            with self._lock:
+                self._sweep_needed = True
+        return self.enqueue_many(rows)
+
+    def _claim_pending(self, limit: int) -> List[Tuple[str, str]]:
+        g = models.Grievance
+        now = _now()
+        db = self._session_factory()
+        try:
+            rows = (
+                db.query(g.id, g.details)
+                .filter(
+                    g.category_status == CATEGORY_PENDING,
+                    g.details.isnot(None),
+                    or_(g.category_claimed_until.is_(None), g.category_claimed_until <= now),
+                )
+                .order_by(g.created_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)  # Ignored on SQLite; lets several API workers sweep at once
+                .all()
+            )
+            if rows:
+                self._set_claim(db, [gid for gid, _ in rows], now + timedelta(seconds=self.claim_seconds))
+            db.commit()
+            return [(gid, details) for gid, details in rows]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _release(self, gids: List[str]) -> None:
+        """Drop the lease on rows that did not fit in the queue, so any process's sweep can take them."""
+        if not gids:
+            return
+        db = self._session_factory()
+        try:
+            self._set_claim(db, gids, None)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to release {len(gids)} pending grievances, leaving them until the lease expires: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _set_claim(db: Session, gids: List[str], claimed_until: Optional[datetime]) -> None:
+        g = models.Grievance.__table__
+        db.execute(
+            update(g)
+            .where(g.c.id.in_(gids), g.c.category_status == CATEGORY_PENDING)
+            # Bookkeeping only: not an edit, so it stays out of the change feed
+            .values(category_claimed_until=claimed_until, change_seq=g.c.change_seq, updated_at=g.c.updated_at)
+        )
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued job has been processed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth and worker throughput."""
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(1 for t in self._completions if now - t <= THROUGHPUT_WINDOW_SECONDS)
+            return {
+                "running": self.running,
+                "workers": len(self._threads),
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self.max_size,
+                "in_flight": self._in_flight,
+                "enqueued": self._enqueued,
+                "rejected": self._rejected,
+                "processed": self._processed,
+                "failed": self._failed,
+                "retried": self._retried,
+                "throughput_per_minute": recent * 60.0 / THROUGHPUT_WINDOW_SECONDS,
+                "uptime_seconds": now - self._started_at if self._started_at else 0.0,
+            }
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            with self._lock:
+                self._in_flight += 1
+            try:
+                self._process(*job)
+            except Exception as e:
+                logger.error(f"Categorization worker error for {job[0]}: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._queued_ids.discard(job[0])
+                    sweep = self._sweep_needed and self._queue.empty()
+                    if sweep:
+                        self._sweep_needed = False
+                # Before task_done, so wait_idle() does not see an idle queue in between
+                if sweep:
+                    self.enqueue_pending()
+                self._queue.task_done()
+
+    def _process(self, gid: str, details: str) -> None:
+        category_type = None
+        source = None
+        status = CATEGORY_FAILED
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self._categorize(details)
+                category_type = get_category_display(result["category"], result.get("subcategory"))
+                source = result.get("source")
+                status = CATEGORY_DONE
+                break
+            except OpenAIError as e:
+                # Transient LLM/API errors are retried with exponential backoff
+                if attempt < self.max_retries:
+                    with self._lock:
+                        self._retried += 1
+                    time.sleep(self.backoff_base * (2 ** attempt))
+                    continue
+                logger.warning(f"Categorization of {gid} failed after {attempt + 1} attempts: {e}")
+            except Exception as e:
+                # Configuration errors (e.g. missing API key) will not fix themselves
+                logger.warning(f"Categorization of {gid} failed: {e}")
+                break
+
+        self._store(gid, category_type, source, status)
+
+        with self._lock:
+            if status == CATEGORY_DONE:
+                self._processed += 1
+                self._completions.append(time.monotonic())
+            else:
+                self._failed += 1
+
+    def _store(self, gid: str, category_type: Optional[str], source: Optional[str], status: str) -> None:
+        db = self._session_factory()
+        try:
+            row = db.get(models.Grievance, gid)
+            if not row or row.category_status != CATEGORY_PENDING:
+                return
+            # Never overwrite a category assigned by staff while the job was queued
+            if row.category_type is None:
+                row.category_type = category_type
+                if status == CATEGORY_DONE:
+                    row.category_version = CATEGORY_TAXONOMY_VERSION
+                    row.category_source = source
+            row.category_status = status
+            row.category_claimed_until = None
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# Global instance
+categorization_queue = CategorizationQueue()
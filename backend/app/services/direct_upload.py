@@ -0,0 +1,140 @@
+"""
+Direct-to-storage attachment uploads.
+
+Instead of sending file bytes through /upload-file, a client asks for a
+short-lived pre-signed PUT URL, uploads straight to MinIO and then calls the
+completion endpoint. Attachment bandwidth and memory never touch the API
+workers.
+
+A pre-signed PUT cannot limit what the client sends, so the ticket issued
+with the URL records what was declared (key, name, type, size) under an
+HMAC, and completion checks the stored object against it: objects that are
+too large, of another type or of another size are deleted and refused.
+Tickets are stateless, so any API worker can complete any upload.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from ..utils.minio import PresignNotConfigured, minio_client
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_URL_EXPIRY_SECONDS = int(os.getenv("DIRECT_UPLOAD_URL_EXPIRY", "900"))
+# How long after the URL expires an upload started in time may still be completed
+COMPLETE_GRACE_SECONDS = 3600
+
+
+class UploadRejected(Exception):
+    """The upload ticket or the stored object failed verification."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _secret() -> bytes:
+    secret = os.getenv("UPLOAD_TOKEN_SECRET", "") or minio_client.secret_key
+    if not secret:
+        # An empty HMAC key would let anyone mint tickets
+        raise PresignNotConfigured("UPLOAD_TOKEN_SECRET or MINIO_SECRET_KEY must be set")
+    return secret.encode("utf-8")
+
+
+def _sign(payload: bytes) -> str:
+    return hmac.new(_secret(), payload, hashlib.sha256).hexdigest()
+
+
+def _encode_ticket(claims: Dict[str, Any]) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload.decode('ascii')}.{_sign(payload)}"
+
+
+def _decode_ticket(ticket: str) -> Dict[str, Any]:
+    payload, _, signature = ticket.encode("ascii", errors="replace").partition(b".")
+    if not signature or not hmac.compare_digest(_sign(payload), signature.decode("ascii")):
+        raise UploadRejected(400, "Invalid upload ticket")
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        expires = int(claims["exp"])
+    except (ValueError, KeyError, TypeError):
+        raise UploadRejected(400, "Invalid upload ticket")
+    if expires + COMPLETE_GRACE_SECONDS < time.time():
+        raise UploadRejected(400, "Upload ticket expired")
+    return claims
+
+
+def create_upload(filename: str, content_type: str, size: int) -> Dict[str, Any]:
+    """Pre-signed PUT URL for a new object plus the ticket to complete it with."""
+    key = minio_client.new_object_key(filename)
+    expires = int(time.time()) + UPLOAD_URL_EXPIRY_SECONDS
+    upload_url = minio_client.presigned_put_url(key, timedelta(seconds=UPLOAD_URL_EXPIRY_SECONDS))
+    ticket = _encode_ticket({"key": key, "name": filename, "type": content_type, "size": size, "exp": expires})
+    return {
+        "key": key,
+        "upload_url": upload_url,
+        "method": "PUT",
+        "headers": {"Content-Type": content_type},
+        "expires_at": expires,
+        "ticket": ticket,
+    }
+
+
+def _problem(
+    claims: Dict[str, Any], stored: Optional[Dict[str, Any]], max_size: int, allowed_types: Sequence[str]
+) -> Optional[Tuple[int, str]]:
+    """Why the stored object cannot be accepted for this ticket, if it cannot."""
+    if stored is None:
+        return 404, "Uploaded object not found"
+    if stored["size"] > max_size:
+        return 413, "File too large."
+    if stored["type"] != claims["type"] or stored["type"] not in allowed_types:
+        return 400, f"Stored content type {stored['type']} does not match the declared {claims['type']}."
+    if stored["size"] != claims["size"]:
+        return 400, f"Stored size {stored['size']} does not match the declared {claims['size']}."
+    return None
+
+
+def _attachment(claims: Dict[str, Any], stored: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": claims["name"],
+        "url": minio_client.object_url(claims["key"]),
+        "size": stored["size"],
+        "type": stored["type"],
+        "key": claims["key"],
+    }
+
+
+def complete_upload(ticket: str, max_size: int, allowed_types: Sequence[str]) -> Dict[str, Any]:
+    """
+    Verify an uploaded object against its ticket and return its attachment info,
+    in the same shape /upload-file returns.
+    """
+    claims = _decode_ticket(ticket)
+    stored = minio_client.stat_object(claims["key"])
+    problem = _problem(claims, stored, max_size, allowed_types)
+    if problem is not None:
+        if stored is not None and not minio_client.delete_file(claims["key"]):
+            logger.warning(f"Could not delete rejected direct upload {claims['key']}")
+        raise UploadRejected(*problem)
+    return _attachment(claims, stored)
+
+
+async def complete_upload_async(ticket: str, max_size: int, allowed_types: Sequence[str]) -> Dict[str, Any]:
+    """complete_upload() on the event loop, over the async MinIO client."""
+    claims = _decode_ticket(ticket)
+    stored = await minio_client.stat_object_async(claims["key"])
+    problem = _problem(claims, stored, max_size, allowed_types)
+    if problem is not None:
+        if stored is not None and not await minio_client.delete_file_async(claims["key"]):
+            logger.warning(f"Could not delete rejected direct upload {claims['key']}")
+        raise UploadRejected(*problem)
+    return _attachment(claims, stored)
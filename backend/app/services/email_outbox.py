@@ -0,0 +1,289 @@
+"""
+Email outbox and background sender.
+
+Submissions never talk to SMTP: confirmation emails are written to the
+``email_outbox`` table in the same transaction as the grievance, and a
+background thread drains due rows in batches over a warm SMTP connection,
+retrying failures with exponential backoff and recording delivery state.
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from ..utils.email import (
+    build_grievance_confirmation_email,
+    build_message,
+    get_smtp_config,
+    open_smtp_connection,
+    send_smtp_message,
+)
+
+logger = logging.getLogger(__name__)
+
+# Values stored in EmailOutbox.status
+EMAIL_PENDING = "pending"
+EMAIL_SENT = "sent"
+EMAIL_FAILED = "failed"
+
+# Claimed rows are hidden from other senders for this long; if a sender dies
+# mid-batch its rows become due again afterwards
+CLAIM_LEASE_SECONDS = 300
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def queue_grievance_confirmation_email(
+    db: Session,
+    to_email: str,
+    grievance_id: str,
+    complainant_name: Optional[str] = None,
+    details: Optional[str] = None,
+) -> models.EmailOutbox:
+    """
+    Add a confirmation email to the outbox. The caller commits it together
+    with the grievance, so an email is queued if and only if the grievance
+    was saved.
+    """
+    row = models.EmailOutbox(**confirmation_email_values(to_email, grievance_id, complainant_name))
+    db.add(row)
+    return row
+
+
+def confirmation_email_values(
+    to_email: str,
+    grievance_id: str,
+    complainant_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Column values for a confirmation email outbox row, for bulk inserts."""
+    content = build_grievance_confirmation_email(grievance_id, complainant_name)
+    return {"grievance_id": grievance_id, "to_email": to_email, **content}
+
+
+class EmailOutboxSender:
+    """Background thread that delivers outbox rows over a reused SMTP connection."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        session_factory: Callable = SessionLocal,
+        smtp_config: Callable[[], Dict[str, Any]] = get_smtp_config,
+    ):
+        self.enabled = enabled if enabled is not None else os.getenv("EMAIL_OUTBOX_SENDER", "true").lower() == "true"
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+        self.backoff_base = (
+            backoff_base if backoff_base is not None else float(os.getenv("EMAIL_OUTBOX_RETRY_BACKOFF", "30"))
+        )
+        self.poll_interval = (
+            poll_interval if poll_interval is not None else float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", "5"))
+        )
+        self.idle_timeout = (
+            idle_timeout if idle_timeout is not None else float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+        )
+        self._session_factory = session_factory
+        self._smtp_config = smtp_config
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections_opened = 0
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._disconnect()
+
+    def notify(self) -> None:
+        """Wake the sender right away instead of waiting for the next poll."""
+        self._wake.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None,
+            "connected": self._server is not None,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "connections_opened": self.connections_opened,
+        }
+
+    def send_pending(self) -> int:
+        """
+        Claim and deliver one batch of due emails.
+
+        Returns the number of rows processed (sent, rescheduled or failed).
+        """
+        batch = self._claim_batch()
+        if not batch:
+            return 0
+
+        config = self._smtp_config()
+        outcomes: List[Tuple[int, int, Optional[str]]] = []
+        connect_error: Optional[str] = None
+        for row_id, attempts, message in batch:
+            if connect_error is None:
+                error, connect_failed = self._deliver(config, message)
+                if connect_failed:
+                    # Don't hammer an unreachable server for every row in the batch
+                    connect_error = error
+            else:
+                error = connect_error
+            outcomes.append((row_id, attempts, error))
+
+        self._record(outcomes)
+        return len(outcomes)
+
+    def _claim_batch(self) -> List[Tuple[int, int, Any]]:
+        config = self._smtp_config()
+        now = _now()
+        db = self._session_factory()
+        try:
+            rows = (
+                db.query(models.EmailOutbox)
+                .filter(models.EmailOutbox.status == EMAIL_PENDING, models.EmailOutbox.next_attempt_at <= now)
+                .order_by(models.EmailOutbox.next_attempt_at, models.EmailOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)  # Ignored on SQLite; lets several API workers share the outbox
+                .all()
+            )
+            batch = []
+            lease = now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+            for row in rows:
+                row.attempts += 1
+                row.next_attempt_at = lease
+                message = build_message(config["from_email"], row.to_email, row.subject, row.text_body, row.html_body)
+                batch.append((row.id, row.attempts, message))
+            db.commit()
+            return batch
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _deliver(self, config: Dict[str, Any], message: Any) -> Tuple[Optional[str], bool]:
+        """Send one message, reconnecting once if the warm connection went away. Returns (error, connect_failed)."""
+        for attempt in range(2):
+            try:
+                server = self._connection(config)
+            except Exception as e:
+                return f"SMTP connection failed: {e}", True
+            try:
+                send_smtp_message(server, message)
+                self._last_used = time.monotonic()
+                return None, False
+            except smtplib.SMTPServerDisconnected as e:
+                self._disconnect()
+                if attempt:
+                    return str(e), True
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # Rejected message; the connection is still usable
+                return str(e), False
+            except Exception as e:
+                self._disconnect()
+                return str(e), True
+        return "SMTP delivery failed", True
+
+    def _connection(self, config: Dict[str, Any]) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout / 2:
+            # Servers drop idle clients; check before reusing an old connection
+            try:
+                self._server.noop()
+            except Exception:
+                self._disconnect()
+        if self._server is None:
+            self._server = open_smtp_connection(config)
+            self._last_used = time.monotonic()
+            self.connections_opened += 1
+        return self._server
+
+    def _disconnect(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+        self._server = None
+
+    def _record(self, outcomes: List[Tuple[int, int, Optional[str]]]) -> None:
+        now = _now()
+        updates = []
+        for row_id, attempts, error in outcomes:
+            if error is None:
+                updates.append({"id": row_id, "status": EMAIL_SENT, "sent_at": now, "last_error": None})
+                self.sent += 1
+            elif attempts >= self.max_attempts:
+                updates.append({"id": row_id, "status": EMAIL_FAILED, "last_error": error})
+                self.failed += 1
+                logger.error(f"Giving up on outbox email {row_id} after {attempts} attempts: {error}")
+            else:
+                retry_at = now + timedelta(seconds=self.backoff_base * (2 ** (attempts - 1)))
+                updates.append({"id": row_id, "next_attempt_at": retry_at, "last_error": error})
+                self.retried += 1
+                logger.warning(f"Outbox email {row_id} failed (attempt {attempts}), retrying at {retry_at}: {error}")
+
+        db = self._session_factory()
+        try:
+            db.execute(update(models.EmailOutbox), updates)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.send_pending()
+            except Exception as e:
+                logger.error(f"Email outbox sender error: {e}")
+                processed = 0
+            if processed >= self.batch_size:
+                continue  # More may be waiting
+            if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                self._disconnect()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+# Global instance
+email_outbox_sender = EmailOutboxSender()
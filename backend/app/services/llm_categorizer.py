@@ -6,11 +6,22 @@ using a Large Language Model (OpenAI GPT) based on the details provided
 by the complainant.
 """
 
+import asyncio
 import os
-from typing import Optional, Dict, Any
-from openai import OpenAI, OpenAIError
+import hashlib
+import threading
+import time
+import weakref
+from typing import Optional, Dict, Any, Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI, OpenAIError
 import json
 
+from .. import models
+from .categorization_cache import categorization_cache
+from .local_classifier import local_classifier
+from .metrics import llm_request_duration
+
 
 # Vaka Sosiale grievance categories and subcategories
 CATEGORIES = {
@@ -67,6 +78,12 @@ CATEGORIES = {
     }
 }
 
+# Changes whenever CATEGORIES changes, so cached or stored results from an
+# older taxonomy can be told apart from current ones
+CATEGORY_TAXONOMY_VERSION = hashlib.sha256(
+    json.dumps(CATEGORIES, sort_keys=True).encode("utf-8")
+).hexdigest()[:12]
+
 
 def _format_categories_for_prompt() -> str:
     """Format categories into a readable string for the LLM prompt."""
@@ -78,13 +95,248 @@ def _format_categories_for_prompt() -> str:
     return "\n".join(lines)
 
 
-def categorize_grievance(details: str, model: Optional[str] = None) -> Dict[str, Any]:
+# Static prompt segments, built once at import instead of on every call
+SYSTEM_PROMPT = """You are an expert grievance categorization assistant for Vaka Sosiale, a social protection program. 
+Your task is to analyze grievance descriptions and categorize them into the appropriate category and subcategory.
+
+Be precise and consistent in your categorization. Consider the context and intent of the grievance carefully."""
+
+_USER_PROMPT_HEADER = f"""Please categorize the following grievance into the appropriate category and subcategory from the Vaka Sosiale system.
+
+Categories and subcategories:
+{_format_categories_for_prompt()}
+
+Grievance details:
+"""
+
+_USER_PROMPT_FOOTER = """
+
+Respond with a JSON object containing:
+- category: The main category number (e.g., "1", "2")
+- subcategory: The subcategory code (e.g., "1.1", "2.3") or null if category 7 (Others)
+- confidence: "high", "medium", or "low"
+- reasoning: Brief explanation (1-2 sentences) for why you chose this category
+
+Example response format:
+{
+    "category": "2",
+    "subcategory": "2.3",
+    "confidence": "high",
+    "reasoning": "The grievance clearly states that a household member was not registered during the enrollment process."
+}"""
+
+
+# Process-wide OpenAI clients, reused so connections (and TLS sessions) are
+# kept alive between categorizations instead of being set up on every call
+_clients: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_clients_lock = threading.Lock()
+
+
+def _client_options() -> Dict[str, Any]:
+    """Connection pool, keep-alive and timeout settings shared by both clients."""
+    timeout = httpx.Timeout(
+        float(os.getenv("OPENAI_TIMEOUT", "10")),
+        connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+    )
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+    )
+    return {
+        "base_url": os.getenv("OPENAI_BASE_URL") or None,
+        "timeout": timeout,
+        "limits": limits,
+        "max_retries": int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+    }
+
+
+def get_openai_client(api_key: str) -> OpenAI:
+    """Return the shared OpenAI client for this API key, creating it on first use."""
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+    client = _clients.get((api_key, base_url))
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            options = _client_options()
+            client = OpenAI(
+                api_key=api_key,
+                base_url=options["base_url"],
+                timeout=options["timeout"],
+                max_retries=options["max_retries"],
+                http_client=httpx.Client(limits=options["limits"], timeout=options["timeout"]),
+            )
+            _clients[(api_key, base_url)] = client
+    return client
+
+
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client for this API key and event loop.
+
+    httpx async connection pools are bound to the loop that created them, so
+    one client is kept per running loop.
+    """
+    loop = asyncio.get_running_loop()
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+    with _clients_lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        client = loop_clients.get((api_key, base_url))
+        if client is None:
+            options = _client_options()
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=options["base_url"],
+                timeout=options["timeout"],
+                max_retries=options["max_retries"],
+                http_client=httpx.AsyncClient(limits=options["limits"], timeout=options["timeout"]),
+            )
+            loop_clients[(api_key, base_url)] = client
+    return client
+
+
+def close_openai_clients() -> None:
+    """
+    Close pooled connections (on shutdown, or after rotating the API key).
+
+    Async clients can only be closed on their own loop; call
+    aclose_openai_clients() there first. Any left over belong to loops that
+    are gone and are just dropped.
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
+        _async_clients.clear()
+
+
+async def aclose_openai_clients() -> None:
+    """Close the running event loop's async clients."""
+    with _clients_lock:
+        clients = list(_async_clients.pop(asyncio.get_running_loop(), {}).values())
+    for client in clients:
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+
+def _completion_kwargs(details: str, model: str) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": _USER_PROMPT_HEADER + details + _USER_PROMPT_FOOTER}
+        ],
+        "temperature": 0.3,  # Lower temperature for more consistent categorization
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _prepare(details: str, model: Optional[str]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """
+    Validate input and resolve the model.
+    
+    Returns (model, cache_key, result) where result is set when the LLM call
+    can be skipped: a cached answer, or a confident local classification.
+    """
+    if not details or not details.strip():
+        raise ValueError("Grievance details cannot be empty")
+    
+    if not model:
+        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    
+    # The same text was already categorized with this model and taxonomy
+    cache_key = categorization_cache.make_key(details, model, CATEGORY_TAXONOMY_VERSION)
+    cached = categorization_cache.get(cache_key)
+    if cached is not None:
+        return model, cache_key, cached
+    
+    # Obvious cases are answered by the local classifier without an LLM round trip
+    return model, cache_key, local_classifier.classify(details)
+
+
+def _require_api_key(details: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Return (api_key, None), or (None, local_guess) for offline deployments without a key."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        local = local_classifier.fallback(details)
+        if local is not None:
+            return None, local
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+    return api_key, None
+
+
+def _parse_response(content: str) -> Dict[str, Any]:
+    """Validate the LLM's JSON answer against CATEGORIES and enrich it with names."""
+    result = json.loads(content)
+    
+    # Validate and enrich the response
+    category = result.get("category", "7")
+    subcategory = result.get("subcategory")
+    
+    # Validate category exists
+    if category not in CATEGORIES:
+        category = "7"
+        subcategory = None
+    
+    # Get category and subcategory names
+    category_data = CATEGORIES[category]
+    category_name = category_data["name"]
+    subcategory_name = None
+    
+    if subcategory and subcategory in category_data["subcategories"]:
+        subcategory_name = category_data["subcategories"][subcategory]
+    elif category != "7" and category_data["subcategories"]:
+        # If no valid subcategory provided but category has subcategories, default to first
+        first_subcat = list(category_data["subcategories"].keys())[0]
+        subcategory = first_subcat
+        subcategory_name = category_data["subcategories"][first_subcat]
+    
+    return {
+        "category": category,
+        "subcategory": subcategory,
+        "category_name": category_name,
+        "subcategory_name": subcategory_name,
+        "confidence": result.get("confidence", "medium"),
+        "reasoning": result.get("reasoning", "Categorized based on content analysis"),
+        "source": models.CATEGORY_SOURCE_LLM,
+    }
+
+
+def _fallback_result(reasoning: str) -> Dict[str, Any]:
+    """Fallback to the "Others" category when the LLM answer can't be used."""
+    return {
+        "category": "7",
+        "subcategory": None,
+        "category_name": "Others (please describe)",
+        "subcategory_name": None,
+        "confidence": "low",
+        "reasoning": reasoning,
+        "source": models.CATEGORY_SOURCE_FALLBACK,
+    }
+
+
+def categorize_grievance(
+    details: str, model: Optional[str] = None, max_retries: Optional[int] = None
+) -> Dict[str, Any]:
     """
     Categorize a grievance based on its details using an LLM.
     
     Args:
         details: The grievance details text provided by the complainant
         model: Optional OpenAI model name (defaults to env var or gpt-4o-mini)
+        max_retries: Optional override of the client's OPENAI_MAX_RETRIES, e.g. 0
+            for callers that retry with their own backoff
         
     Returns:
         Dictionary containing:
@@ -94,124 +346,94 @@ def categorize_grievance(details: str, model: Optional[str] = None) -> Dict[str,
         - subcategory_name: Human-readable subcategory name
         - confidence: Confidence level (high/medium/low)
         - reasoning: Brief explanation for the categorization
+        - source: Where the answer came from (models.CATEGORY_SOURCE_LLM, _LOCAL or _FALLBACK)
         
     Raises:
         ValueError: If details is empty or None
         OpenAIError: If there's an error communicating with OpenAI API
     """
-    if not details or not details.strip():
-        raise ValueError("Grievance details cannot be empty")
-    
-    # Get API key and model from environment
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY environment variable not set")
+    model, cache_key, ready = _prepare(details, model)
+    if ready is not None:
+        return ready
     
-    if not model:
-        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    api_key, local = _require_api_key(details)
+    if local is not None:
+        return local
+    client = get_openai_client(api_key)
+    if max_retries is not None:
+        # Shares the pooled HTTP client; only the retry policy differs
+        client = client.with_options(max_retries=max_retries)
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
-    
-    # Construct the prompt
-    categories_text = _format_categories_for_prompt()
-    
-    system_prompt = """You are an expert grievance categorization assistant for Vaka Sosiale, a social protection program. 
-Your task is to analyze grievance descriptions and categorize them into the appropriate category and subcategory.
-
-Be precise and consistent in your categorization. Consider the context and intent of the grievance carefully."""
-    
-    user_prompt = f"""Please categorize the following grievance into the appropriate category and subcategory from the Vaka Sosiale system.
-
-Categories and subcategories:
-{categories_text}
-
-Grievance details:
-{details}
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        response = client.chat.completions.create(**_completion_kwargs(details, model))
+        categorization = _parse_response(response.choices[0].message.content)
+        
+        # Only successful LLM answers are cached; fallbacks below are not
+        categorization_cache.set(cache_key, categorization)
+        return categorization
+        
+    except OpenAIError:
+        outcome = "api_error"
+        # Keep categorizing from the local model while the LLM is unreachable,
+        # otherwise re-raise OpenAI errors for proper handling upstream
+        local = local_classifier.fallback(details)
+        if local is not None:
+            return local
+        raise
+    except json.JSONDecodeError:
+        outcome = "invalid_response"
+        return _fallback_result("Unable to parse categorization response")
+    except Exception as e:
+        outcome = "error"
+        return _fallback_result(f"Error during categorization: {str(e)}")
+    finally:
+        llm_request_duration.observe(time.perf_counter() - start, outcome)
 
-Respond with a JSON object containing:
-- category: The main category number (e.g., "1", "2")
-- subcategory: The subcategory code (e.g., "1.1", "2.3") or null if category 7 (Others)
-- confidence: "high", "medium", or "low"
-- reasoning: Brief explanation (1-2 sentences) for why you chose this category
 
-Example response format:
-{{
-    "category": "2",
-    "subcategory": "2.3",
-    "confidence": "high",
-    "reasoning": "The grievance clearly states that a household member was not registered during the enrollment process."
-}}"""
+async def categorize_grievance_async(
+    details: str, model: Optional[str] = None, max_retries: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Async variant of categorize_grievance() for use from async handlers.
+    
+    Uses the shared AsyncOpenAI client so the event loop is never blocked on
+    the LLM round trip. Arguments, return value and errors are the same.
+    """
+    model, cache_key, ready = _prepare(details, model)
+    if ready is not None:
+        return ready
+    
+    api_key, local = _require_api_key(details)
+    if local is not None:
+        return local
+    client = get_async_openai_client(api_key)
+    if max_retries is not None:
+        client = client.with_options(max_retries=max_retries)
     
+    start = time.perf_counter()
+    outcome = "ok"
     try:
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.3,  # Lower temperature for more consistent categorization
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse the response
-        result = json.loads(response.choices[0].message.content)
-        
-        # Validate and enrich the response
-        category = result.get("category", "7")
-        subcategory = result.get("subcategory")
+        response = await client.chat.completions.create(**_completion_kwargs(details, model))
+        categorization = _parse_response(response.choices[0].message.content)
+        categorization_cache.set(cache_key, categorization)
+        return categorization
         
-        # Validate category exists
-        if category not in CATEGORIES:
-            category = "7"
-            subcategory = None
-        
-        # Get category and subcategory names
-        category_data = CATEGORIES[category]
-        category_name = category_data["name"]
-        subcategory_name = None
-        
-        if subcategory and subcategory in category_data["subcategories"]:
-            subcategory_name = category_data["subcategories"][subcategory]
-        elif category != "7" and category_data["subcategories"]:
-            # If no valid subcategory provided but category has subcategories, default to first
-            first_subcat = list(category_data["subcategories"].keys())[0]
-            subcategory = first_subcat
-            subcategory_name = category_data["subcategories"][first_subcat]
-        
-        return {
-            "category": category,
-            "subcategory": subcategory,
-            "category_name": category_name,
-            "subcategory_name": subcategory_name,
-            "confidence": result.get("confidence", "medium"),
-            "reasoning": result.get("reasoning", "Categorized based on content analysis")
-        }
-        
-    except OpenAIError as e:
-        # Re-raise OpenAI errors for proper handling upstream
+    except OpenAIError:
+        outcome = "api_error"
+        local = local_classifier.fallback(details)
+        if local is not None:
+            return local
         raise
-    except json.JSONDecodeError as e:
-        # Fallback to "Others" category if JSON parsing fails
-        return {
-            "category": "7",
-            "subcategory": None,
-            "category_name": "Others (please describe)",
-            "subcategory_name": None,
-            "confidence": "low",
-            "reasoning": "Unable to parse categorization response"
-        }
+    except json.JSONDecodeError:
+        outcome = "invalid_response"
+        return _fallback_result("Unable to parse categorization response")
     except Exception as e:
-        # Fallback to "Others" category for any other errors
-        return {
-            "category": "7",
-            "subcategory": None,
-            "category_name": "Others (please describe)",
-            "subcategory_name": None,
-            "confidence": "low",
-            "reasoning": f"Error during categorization: {str(e)}"
-        }
+        outcome = "error"
+        return _fallback_result(f"Error during categorization: {str(e)}")
+    finally:
+        llm_request_duration.observe(time.perf_counter() - start, outcome)
 
 
 def get_category_display(category: str, subcategory: Optional[str] = None) -> str:
@@ -0,0 +1,341 @@
+"""
+Local first-pass grievance classifier.
+
+A small multinomial Naive Bayes model trained from grievances whose category
+from the Vaka Sosiale taxonomy was assigned by staff or answered by the LLM
+(never from its own answers or fallbacks). categorize_grievance()
+consults it before the LLM and only escalates when the local confidence is
+below LOCAL_CLASSIFIER_THRESHOLD; when the LLM is unreachable (or no API key
+is configured) the local best guess is used instead.
+
+The model is pure Python so field deployments need no extra dependencies.
+Evaluate it against the current database with:
+
+    python -m app.services.local_classifier --evaluate --threshold 0.9
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Labels the model learns from; its own answers and fallbacks would reinforce its mistakes
+TRUSTED_LABEL_SOURCES = (models.CATEGORY_SOURCE_STAFF, models.CATEGORY_SOURCE_LLM)
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by for from had has have he her his i in is it its me my
+of on or our she so that the their them they this to was we were with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word unigrams and bigrams, without stopwords."""
+    words = [w for w in TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+@lru_cache(maxsize=1)
+def _taxonomy_labels() -> Dict[str, Tuple[str, Optional[str]]]:
+    """Map each stored display string (e.g. "2.3 HH member not registered") to (category, subcategory)."""
+    # Imported here: llm_categorizer itself imports this module
+    from .llm_categorizer import CATEGORIES, get_category_display
+
+    labels = {}
+    for category, data in CATEGORIES.items():
+        labels[get_category_display(category)] = (category, None)
+        for subcategory in data["subcategories"]:
+            labels[get_category_display(category, subcategory)] = (category, subcategory)
+    return labels
+
+
+class _NaiveBayesModel:
+    """Immutable trained model; replaced wholesale on retrain so readers need no lock."""
+
+    def __init__(self, examples: List[Tuple[str, str]], alpha: float = 1.0):
+        self.alpha = alpha
+        class_docs: Counter = Counter()
+        token_counts: Dict[str, Counter] = defaultdict(Counter)
+        for text, label in examples:
+            class_docs[label] += 1
+            token_counts[label].update(tokenize(text))
+
+        self.vocab = set()
+        for counts in token_counts.values():
+            self.vocab.update(counts)
+
+        total_docs = sum(class_docs.values())
+        self.log_prior = {label: math.log(n / total_docs) for label, n in class_docs.items()}
+        self.log_likelihood: Dict[str, Dict[str, float]] = {}
+        self.log_unseen: Dict[str, float] = {}
+        vocab_size = len(self.vocab)
+        for label, counts in token_counts.items():
+            denominator = sum(counts.values()) + alpha * vocab_size
+            self.log_likelihood[label] = {tok: math.log((n + alpha) / denominator) for tok, n in counts.items()}
+            self.log_unseen[label] = math.log(alpha / denominator)
+        self.class_counts = dict(class_docs)
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        tokens = [t for t in tokenize(text) if t in self.vocab]
+        if not tokens:
+            return None
+
+        scores = {}
+        for label, prior in self.log_prior.items():
+            likelihood = self.log_likelihood[label]
+            unseen = self.log_unseen[label]
+            scores[label] = prior + sum(likelihood.get(t, unseen) for t in tokens)
+
+        # Softmax over log scores gives the posterior of the best label
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        normalizer = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+class LocalClassifier:
+    """Thread-safe holder for the current local model plus usage counters."""
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        min_examples: Optional[int] = None,
+        min_class_examples: int = 3,
+        enabled: Optional[bool] = None,
+    ):
+        self.threshold = (
+            threshold if threshold is not None else float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9"))
+        )
+        self.min_examples = (
+            min_examples if min_examples is not None else int(os.getenv("LOCAL_CLASSIFIER_MIN_EXAMPLES", "50"))
+        )
+        self.min_class_examples = min_class_examples
+        self.enabled = (
+            enabled if enabled is not None else os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+        )
+        self._model: Optional[_NaiveBayesModel] = None
+        self._lock = threading.Lock()
+        self.local_answers = 0
+        self.escalations = 0
+        self.fallbacks = 0
+
+    @property
+    def trained(self) -> bool:
+        return self._model is not None
+
+    def train(self, examples: Iterable[Tuple[str, str]]) -> int:
+        """
+        Train from (details, category_type display string) pairs.
+
+        Labels outside the current taxonomy and classes with too few examples
+        are ignored. Returns the number of examples used; the model stays
+        untrained (everything escalates to the LLM) below min_examples.
+        """
+        labels = _taxonomy_labels()
+        usable = [(text, label) for text, label in examples if text and label in labels]
+        per_class = Counter(label for _, label in usable)
+        usable = [(text, label) for text, label in usable if per_class[label] >= self.min_class_examples]
+
+        model = _NaiveBayesModel(usable) if len(usable) >= self.min_examples else None
+        with self._lock:
+            self._model = model
+        return len(usable) if model else 0
+
+    def train_from_db(self, session_factory: Callable = SessionLocal) -> int:
+        """Train from categorized grievances in the database."""
+        if not self.enabled:
+            return 0
+        db = session_factory()
+        try:
+            examples = load_labeled_examples(db)
+        except Exception as e:
+            logger.warning(f"Local classifier training skipped: {e}")
+            return 0
+        finally:
+            db.close()
+        used = self.train(examples)
+        logger.info(f"Local classifier trained on {used} grievances")
+        return used
+
+    def train_in_background(self, session_factory: Callable = SessionLocal) -> Optional[threading.Thread]:
+        """
+        Run train_from_db() on a daemon thread so startup doesn't wait on a
+        full table scan; until it finishes every grievance escalates to the LLM.
+        """
+        if not self.enabled:
+            return None
+        thread = threading.Thread(
+            target=self.train_from_db, args=(session_factory,), name="local-classifier-train", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def predict(self, details: str) -> Optional[Dict[str, Any]]:
+        """Best local guess as a categorize_grievance()-style dict, with `probability` added."""
+        model = self._model
+        if not self.enabled or model is None:
+            return None
+        prediction = model.predict(details)
+        if prediction is None:
+            return None
+
+        label, probability = prediction
+        category, subcategory = _taxonomy_labels()[label]
+        from .llm_categorizer import CATEGORIES
+
+        category_data = CATEGORIES[category]
+        return {
+            "category": category,
+            "subcategory": subcategory,
+            "category_name": category_data["name"],
+            "subcategory_name": category_data["subcategories"][subcategory] if subcategory else None,
+            "confidence": "high" if probability >= self.threshold else ("medium" if probability >= 0.6 else "low"),
+            "reasoning": f"Matched by the local classifier ({probability:.0%} confidence)",
+            "probability": probability,
+            "source": models.CATEGORY_SOURCE_LOCAL,
+        }
+
+    def classify(self, details: str) -> Optional[Dict[str, Any]]:
+        """Return a local result if it is confident enough to skip the LLM, else None."""
+        result = self.predict(details)
+        if result is None or result["probability"] < self.threshold:
+            if self.trained:
+                with self._lock:
+                    self.escalations += 1
+            return None
+        with self._lock:
+            self.local_answers += 1
+        return result
+
+    def fallback(self, details: str) -> Optional[Dict[str, Any]]:
+        """Best local guess regardless of confidence, used when the LLM can't be reached."""
+        result = self.predict(details)
+        if result is not None:
+            with self._lock:
+                self.fallbacks += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        model = self._model
+        with self._lock:
+            decided = self.local_answers + self.escalations
+            return {
+                "enabled": self.enabled,
+                "trained": model is not None,
+                "classes": len(model.class_counts) if model else 0,
+                "training_examples": sum(model.class_counts.values()) if model else 0,
+                "threshold": self.threshold,
+                "local_answers": self.local_answers,
+                "escalations": self.escalations,
+                "fallbacks": self.fallbacks,
+                "escalation_rate": self.escalations / decided if decided else 0.0,
+            }
+
+
+def load_labeled_examples(db: Session) -> List[Tuple[str, str]]:
+    """
+    (details, category_type) pairs for grievances with a trusted category in
+    the current taxonomy: assigned by staff, answered by the LLM, or stored
+    before label sources were recorded and never auto-categorized.
+    """
+    labels = _taxonomy_labels()
+    g = models.Grievance
+    trusted = or_(
+        g.category_source.in_(TRUSTED_LABEL_SOURCES),
+        and_(g.category_source.is_(None), g.category_version.is_(None)),
+    )
+    rows = (
+        db.query(g.details, g.category_type)
+        .filter(g.details.isnot(None), g.category_type.in_(list(labels)), trusted)
+        .yield_per(1000)
+    )
+    return [(details, category_type) for details, category_type in rows]
+
+
+def evaluate(
+    examples: List[Tuple[str, str]],
+    threshold: float,
+    test_fraction: float = 0.2,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Hold out `test_fraction` of the examples, train on the rest and report
+    how the classifier would have performed in front of the LLM.
+
+    accuracy_local is measured on the grievances answered locally;
+    escalation_rate is the share that would still be sent to the LLM.
+    """
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    split = max(1, int(len(shuffled) * test_fraction))
+    test, train = shuffled[:split], shuffled[split:]
+
+    classifier = LocalClassifier(threshold=threshold, min_examples=1, min_class_examples=1, enabled=True)
+    classifier.train(train)
+
+    labels = _taxonomy_labels()
+    answered = correct_local = correct_best = 0
+    for details, label in test:
+        result = classifier.predict(details)
+        if result is None:
+            continue
+        is_correct = (result["category"], result["subcategory"]) == labels[label]
+        correct_best += is_correct
+        if result["probability"] >= threshold:
+            answered += 1
+            correct_local += is_correct
+
+    return {
+        "train_examples": len(train),
+        "test_examples": len(test),
+        "threshold": threshold,
+        "answered_locally": answered,
+        "escalation_rate": 1 - answered / len(test) if test else 0.0,
+        "accuracy_local": correct_local / answered if answered else 0.0,
+        "accuracy_best_guess": correct_best / len(test) if test else 0.0,
+    }
+
+
+# Global instance
+local_classifier = LocalClassifier()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Evaluate the local grievance classifier.")
+    parser.add_argument("--evaluate", action="store_true", help="Hold-out evaluation on database rows")
+    parser.add_argument("--threshold", type=float, action="append",
+                        help="Confidence threshold(s) to report (repeatable)")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        examples = load_labeled_examples(db)
+    finally:
+        db.close()
+    if not args.evaluate:
+        print(json.dumps({"labeled_examples": len(examples)}))
+        return
+    for threshold in args.threshold or [local_classifier.threshold]:
+        print(json.dumps(evaluate(examples, threshold, args.test_fraction, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Prometheus-style metrics without external dependencies.
+
+Counters, gauges and histograms live in a process-wide registry and are
+rendered in the Prometheus text exposition format by GET /metrics. Recording
+is a dict lookup on the label values plus a few additions under a lock, so
+the instrumentation stays on in production. Label values must come from
+small fixed sets (route templates, outcomes), never from ids or user input.
+
+DB query counts and time are also attributed to the HTTP request that issued
+them through a context variable that MetricsMiddleware sets per request; the
+context is copied into threadpool workers, so sync handlers are covered.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers fast DB-only requests up to slow LLM and SMTP round trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+POOL_CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _check(self, labels: LabelValues) -> None:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            if labels not in self._values:
+                self._check(labels)
+                self._values[labels] = 0.0
+            self._values[labels] += amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, *labels: str) -> None:
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._check(labels)
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last)..., sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                self._check(labels)
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the duration of its block."""
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def sum(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[-1] if series else 0.0
+
+    def cumulative(self, *labels: str) -> List[int]:
+        """Observations at or below each bucket bound, +Inf last."""
+        with self._lock:
+            series = list(self._series.get(labels) or [0] * (len(self.buckets) + 2))
+        running, counts = 0, []
+        for count in series[:-1]:
+            running += int(count)
+            counts.append(running)
+        return counts
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = self.header()
+        for labels, series in items:
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                running += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {running}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {running}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: LabelValues):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        for metric in self._metrics:
+            metric.reset()
+
+
+registry = Registry()
+
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served",
+))
+http_requests_in_flight.set(0)
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"),
+))
+http_request_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "Database queries issued per HTTP request",
+    ("route",), buckets=QUERY_COUNT_BUCKETS,
+))
+http_request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in database queries per HTTP request",
+    ("route",),
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Database statement execution time, all callers",
+    buckets=DB_QUERY_BUCKETS,
+))
+llm_request_duration = registry.register(Histogram(
+    "llm_request_duration_seconds", "LLM categorization call latency by outcome",
+    ("outcome",),
+))
+smtp_send_duration = registry.register(Histogram(
+    "smtp_send_duration_seconds", "SMTP message send latency by outcome",
+    ("outcome",),
+))
+minio_upload_duration = registry.register(Histogram(
+    "minio_upload_duration_seconds", "MinIO object upload latency by outcome",
+    ("outcome",),
+))
+minio_request_duration = registry.register(Histogram(
+    "minio_request_duration_seconds", "MinIO request latency per attempt by S3 operation and outcome",
+    ("operation", "outcome"),
+))
+minio_request_retries = registry.register(Counter(
+    "minio_request_retries_total", "MinIO requests retried after a 5xx response or connection failure",
+    ("operation",),
+))
+
+# Connection pools, labelled by pool name (see services/pool_metrics.py)
+db_pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a connection from the pool, waiting included, by outcome",
+    ("pool", "outcome"), buckets=POOL_CHECKOUT_BUCKETS,
+))
+db_pool_checkout_wait_max = registry.register(Gauge(
+    "db_pool_checkout_wait_max_seconds", "Longest checkout wait since startup",
+    ("pool",),
+))
+db_pool_checkouts = registry.register(Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool",
+    ("pool",),
+))
+db_pool_connects = registry.register(Counter(
+    "db_pool_connects_total", "New database connections opened by the pool",
+    ("pool",),
+))
+db_pool_invalidations = registry.register(Counter(
+    "db_pool_invalidations_total", "Pooled connections invalidated after an error",
+    ("pool",),
+))
+db_pool_connections = registry.register(Gauge(
+    "db_pool_connections", "Pool configuration and live usage, refreshed on scrape",
+    ("pool", "state"),
+))
+
+
+class RequestDBStats:
+    """Database usage of one HTTP request."""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+current_request_db: ContextVar[Optional[RequestDBStats]] = ContextVar("current_request_db", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    start = getattr(context, "_metrics_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    db_query_duration.observe(elapsed)
+    stats = current_request_db.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+def install_query_metrics(engine: Engine) -> None:
+    """Time every statement executed through the engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,134 @@
+"""
+Connection pool instrumentation.
+
+InstrumentedQueuePool times every checkout (including the time spent waiting
+for a connection when the pool is exhausted) and counts checkout timeouts.
+PoolMetrics records those timings, connect/invalidate counts and the pool's
+live checked-out/overflow figures in the process-wide metrics registry, so
+GET /metrics exports them and GET /health/db-pool summarizes the same series.
+That lets pool_size/max_overflow be sized against the number of uvicorn
+workers and threadpool threads instead of guessed.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+from .metrics import (
+    db_pool_checkout_wait,
+    db_pool_checkout_wait_max,
+    db_pool_checkouts,
+    db_pool_connections,
+    db_pool_connects,
+    db_pool_invalidations,
+)
+
+
+class PoolMetrics:
+    """Records one engine's pool in the metrics registry under its pool label."""
+
+    def __init__(self, pool: str = "main"):
+        self.pool = pool
+        # Guards the read-compare-set of the max wait gauge
+        self._lock = threading.Lock()
+
+    def install(self, engine: Engine) -> None:
+        """Attach to an engine; checkout timing needs the engine to use InstrumentedQueuePool."""
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.metrics = self
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        db_pool_connects.inc(1, self.pool)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        db_pool_checkouts.inc(1, self.pool)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        db_pool_invalidations.inc(1, self.pool)
+
+    def observe_wait(self, seconds: float) -> None:
+        self._observe(seconds, "ok")
+
+    def observe_timeout(self, seconds: float) -> None:
+        self._observe(seconds, "timeout")
+
+    def _observe(self, seconds: float, outcome: str) -> None:
+        db_pool_checkout_wait.observe(seconds, self.pool, outcome)
+        with self._lock:
+            if seconds > db_pool_checkout_wait_max.value(self.pool):
+                db_pool_checkout_wait_max.set(seconds, self.pool)
+
+    def collect(self, pool: Optional[Pool]) -> None:
+        """Refresh the live usage gauges from a QueuePool (before a scrape)."""
+        if not isinstance(pool, QueuePool):
+            return
+        db_pool_connections.set(pool.size(), self.pool, "size")
+        db_pool_connections.set(pool._max_overflow, self.pool, "max_overflow")
+        db_pool_connections.set(pool.checkedout(), self.pool, "checked_out")
+        db_pool_connections.set(pool.checkedin(), self.pool, "checked_in")
+        # QueuePool.overflow() starts at -pool_size; only connections beyond pool_size count
+        db_pool_connections.set(max(pool.overflow(), 0), self.pool, "overflow")
+
+    def stats(self, pool: Optional[Pool] = None) -> Dict[str, Any]:
+        """Counters plus, for a QueuePool, its configured size and live usage."""
+        self.collect(pool)
+        buckets = db_pool_checkout_wait.buckets + (float("inf"),)
+        latency = db_pool_checkout_wait.cumulative(self.pool, "ok")
+        observed = latency[-1] + db_pool_checkout_wait.count(self.pool, "timeout")
+        wait_total = db_pool_checkout_wait.sum(self.pool, "ok") + db_pool_checkout_wait.sum(self.pool, "timeout")
+        result: Dict[str, Any] = {
+            "pool_class": type(pool).__name__ if pool is not None else None,
+            "pool_size": None,
+            "max_overflow": None,
+            "checked_out": None,
+            "checked_in": None,
+            "overflow": None,
+            "checkouts": int(db_pool_checkouts.value(self.pool)),
+            "connects": int(db_pool_connects.value(self.pool)),
+            "invalidations": int(db_pool_invalidations.value(self.pool)),
+            "timeouts": db_pool_checkout_wait.count(self.pool, "timeout"),
+            "wait_seconds_total": round(wait_total, 6),
+            "wait_seconds_max": round(db_pool_checkout_wait_max.value(self.pool), 6),
+            "wait_seconds_avg": round(wait_total / observed, 6) if observed else 0.0,
+            "checkout_latency_ms": {
+                "+Inf" if bound == float("inf") else f"{bound * 1000:g}": count
+                for bound, count in zip(buckets, latency)
+            },
+        }
+        if isinstance(pool, QueuePool):
+            for state in ("checked_out", "checked_in", "overflow", "max_overflow"):
+                result[state] = int(db_pool_connections.value(self.pool, state))
+            result["pool_size"] = int(db_pool_connections.value(self.pool, "size"))
+        return result
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout took, and checkout timeouts, to its PoolMetrics."""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics is not None:
+                self.metrics.observe_timeout(time.perf_counter() - start)
+            raise
+        if self.metrics is not None:
+            self.metrics.observe_wait(time.perf_counter() - start)
+        return record
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # engine.dispose() swaps in a fresh pool; keep reporting to the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
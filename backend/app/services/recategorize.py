@@ -0,0 +1,261 @@
+"""
+Batch categorization and bulk re-categorization job.
+
+categorize_many() runs several LLM categorizations concurrently with a cap on
+in-flight requests; it backs the batch API endpoint and the job below.
+
+The job streams grievances still waiting for auto-categorization (pending or
+failed), or that were auto-categorized under an older version of CATEGORIES,
+in keyset-paginated
+batches, categorizes each batch concurrently and writes the results back with
+one bulk UPDATE per batch. Progress is checkpointed to a JSON file so an
+interrupted run resumes where it stopped:
+
+    python -m app.services.recategorize --batch-size 200 --concurrency 8
+
+Rows without a category_status are left alone: the submitter sent an empty
+category, or staff set or cleared it. Rows from before category_status
+existed look the same, so they are only included with --include-legacy.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from sqlalchemy import and_, bindparam, or_, update
+
+from .. import models
+from ..database import SessionLocal
+from .categorization_queue import CATEGORY_DONE, CATEGORY_FAILED, CATEGORY_PENDING
+from .llm_categorizer import (
+    CATEGORY_TAXONOMY_VERSION,
+    aclose_openai_clients,
+    categorize_grievance_async,
+    get_category_display,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.getenv("CATEGORIZATION_BATCH_CONCURRENCY", "5"))
+DEFAULT_CHECKPOINT_PATH = os.getenv("RECATEGORIZE_CHECKPOINT", ".recategorize-checkpoint.json")
+
+
+async def categorize_many(
+    details_list: List[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Categorize several texts concurrently, at most `concurrency` at a time.
+
+    Returns one entry per input, in order: the categorization dict, or the
+    exception raised for that item.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(details: str) -> Union[Dict[str, Any], Exception]:
+        async with semaphore:
+            try:
+                return await categorize_grievance_async(details)
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*(_one(details) for details in details_list))
+
+
+def _legacy_filter():
+    """Uncategorized rows that never had a category_status (nor an auto-categorization)."""
+    g = models.Grievance
+    return and_(g.category_type.is_(None), g.category_status.is_(None), g.category_version.is_(None))
+
+
+def _stale_filter(include_legacy: bool = False):
+    """
+    Rows needing (re-)categorization: auto-categorization pending or failed,
+    or done under an old taxonomy; plus legacy rows when asked for.
+    """
+    g = models.Grievance
+    needs_work = or_(
+        g.category_status.in_([CATEGORY_PENDING, CATEGORY_FAILED]),
+        and_(
+            g.category_status == CATEGORY_DONE,
+            or_(g.category_version.is_(None), g.category_version != CATEGORY_TAXONOMY_VERSION),
+        ),
+    )
+    if include_legacy:
+        needs_work = or_(needs_work, _legacy_filter())
+    return and_(g.details.isnot(None), needs_work)
+
+
+def _write_guard(include_legacy: bool):
+    """Rows the job may still write to: staff assignments clear category_status."""
+    guard = models.Grievance.category_status.isnot(None)
+    return or_(guard, _legacy_filter()) if include_legacy else guard
+
+
+def _load_checkpoint(path: Optional[str]) -> Dict[str, Any]:
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            # A checkpoint from an older taxonomy no longer describes this run
+            if checkpoint.get("taxonomy_version") == CATEGORY_TAXONOMY_VERSION:
+                return checkpoint
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+    return {"taxonomy_version": CATEGORY_TAXONOMY_VERSION, "last_id": "", "processed": 0, "updated": 0, "failed": 0}
+
+
+def _save_checkpoint(path: Optional[str], checkpoint: Dict[str, Any]) -> None:
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def run_recategorization(
+    session_factory: Callable = SessionLocal,
+    batch_size: int = 100,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT_PATH,
+    limit: Optional[int] = None,
+    include_legacy: bool = False,
+) -> Dict[str, Any]:
+    """
+    Re-categorize stale grievances in batches, resuming from `checkpoint_path`.
+
+    Args:
+        session_factory: Callable returning a SQLAlchemy session
+        batch_size: Rows fetched, categorized and written per batch
+        concurrency: Maximum concurrent LLM requests within a batch
+        checkpoint_path: JSON checkpoint file (None disables checkpointing)
+        limit: Stop after this many rows (the checkpoint allows resuming later)
+        include_legacy: Also categorize rows with no category and no
+            category_status, as stored before auto-categorization tracked its
+            status. Rows deliberately left empty look the same, so only use it
+            for data from before that migration.
+
+    Returns:
+        The final checkpoint: last_id, processed, updated and failed counts.
+        Rows that failed are skipped by the checkpoint; a fresh run (without
+        the checkpoint file) picks them up again.
+    """
+    # One event loop for the whole run so the async OpenAI connection pool is reused across batches
+    return asyncio.run(_run(session_factory, batch_size, concurrency, checkpoint_path, limit, include_legacy))
+
+
+async def _run(*args: Any) -> Dict[str, Any]:
+    try:
+        return await _recategorize(*args)
+    finally:
+        # The loop closes with the run; its clients have to be closed before that
+        await aclose_openai_clients()
+
+
+async def _recategorize(
+    session_factory: Callable,
+    batch_size: int,
+    concurrency: int,
+    checkpoint_path: Optional[str],
+    limit: Optional[int],
+    include_legacy: bool,
+) -> Dict[str, Any]:
+    checkpoint = _load_checkpoint(checkpoint_path)
+    table = models.Grievance.__table__
+    write_back = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        # Never overwrite a category assigned or cleared by staff since the row was read
+        .where(_write_guard(include_legacy))
+        .values(
+            category_type=bindparam("b_category_type"),
+            category_source=bindparam("b_category_source"),
+            category_status=CATEGORY_DONE,
+            category_version=CATEGORY_TAXONOMY_VERSION,
+        )
+    )
+
+    processed_this_run = 0
+    while limit is None or processed_this_run < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed_this_run)
+        db = session_factory()
+        try:
+            rows = (
+                db.query(models.Grievance.id, models.Grievance.details)
+                .filter(_stale_filter(include_legacy), models.Grievance.id > checkpoint["last_id"])
+                .order_by(models.Grievance.id)
+                .limit(size)
+                .all()
+            )
+            if not rows:
+                break
+
+            results = await categorize_many([details for _, details in rows], concurrency)
+
+            params = []
+            for (gid, _), result in zip(rows, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Re-categorization of {gid} failed: {result}")
+                    checkpoint["failed"] += 1
+                    continue
+                params.append({
+                    "b_id": gid,
+                    "b_category_type": get_category_display(result["category"], result.get("subcategory")),
+                    "b_category_source": result.get("source"),
+                })
+
+            if params:
+                db.execute(write_back, params)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        checkpoint["last_id"] = rows[-1][0]
+        checkpoint["processed"] += len(rows)
+        checkpoint["updated"] += len(params)
+        processed_this_run += len(rows)
+        _save_checkpoint(checkpoint_path, checkpoint)
+        logger.info(
+            f"Re-categorized {checkpoint['processed']} grievances "
+            f"({checkpoint['updated']} updated, {checkpoint['failed']} failed), last id {checkpoint['last_id']}"
+        )
+
+    return checkpoint
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-categorize uncategorized or stale grievances.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument(
+        "--include-legacy", action="store_true",
+        help="Also categorize uncategorized rows without a category_status (pre-migration data)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    summary = run_recategorization(
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        checkpoint_path=args.checkpoint,
+        limit=args.limit,
+        include_legacy=args.include_legacy,
+    )
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Cache for generated receipt PDFs.
+
+A receipt only changes when its grievance row changes, so rendered PDFs are
+keyed on ``(grievance id, version)`` where the version is the row's
+``updated_at`` (every ORM update bumps it). Entries live in an in-process LRU
+bounded by total bytes and, when ``RECEIPT_CACHE_DIR`` is set, in a directory
+shared by all API workers on the host. A stale version is never served
+because a modified row has a new key; the status endpoints additionally call
+invalidate() so the old bytes don't wait for LRU eviction.
+
+The version also drives the HTTP validators: the ETag is derived from it
+without rendering, so a conditional request for an unchanged receipt is
+answered with 304 after a primary-key lookup.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+# Bump when build_receipt_pdf's output changes so cached receipts and client ETags roll over
+RECEIPT_LAYOUT_VERSION = "1"
+
+receipt_cache_requests = registry.register(Counter(
+    "receipt_cache_requests_total", "Receipt requests by cache result",
+    ("result",),
+))
+
+
+def receipt_version(updated_at: Optional[datetime], created_at: Optional[datetime]) -> str:
+    """Version string for a grievance row; changes whenever the row is updated."""
+    stamp = updated_at or created_at
+    if stamp is None:
+        return "0"
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return str(int(stamp.timestamp() * 1_000_000))
+
+
+def receipt_etag(gid: str, version: str) -> str:
+    digest = hashlib.sha256(f"{gid}\0{version}\0{RECEIPT_LAYOUT_VERSION}".encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+class ReceiptCache:
+    """Byte-bounded LRU of rendered receipts with an optional on-disk tier."""
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        directory: Optional[str] = None,
+    ):
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else int(os.getenv("RECEIPT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        )
+        directory = directory if directory is not None else os.getenv("RECEIPT_CACHE_DIR", "")
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._versions: Dict[str, str] = {}  # gid -> version held in memory
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.directory is not None
+
+    def get(self, gid: str, version: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        key = (gid, version)
+        with self._lock:
+            pdf = self._entries.get(key)
+            if pdf is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                receipt_cache_requests.inc(1, "memory")
+                return pdf
+
+        pdf = self._read_disk(gid, version)
+        with self._lock:
+            if pdf is None:
+                self.misses += 1
+                receipt_cache_requests.inc(1, "miss")
+                return None
+            self.disk_hits += 1
+            self._put_local(gid, version, pdf)
+        receipt_cache_requests.inc(1, "disk")
+        return pdf
+
+    def set(self, gid: str, version: str, pdf: bytes) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._put_local(gid, version, pdf)
+        self._write_disk(gid, version, pdf)
+
+    def invalidate(self, gid: str) -> None:
+        """Drop every cached version of a grievance's receipt."""
+        with self._lock:
+            self._drop_local(gid)
+        if self.directory is not None:
+            for path in self.directory.glob(f"{gid}-*.pdf"):
+                path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._bytes = 0
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_tier": self.directory is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _put_local(self, gid: str, version: str, pdf: bytes) -> None:
+        # Caller holds self._lock
+        if len(pdf) > self.max_bytes:
+            return
+        self._drop_local(gid)  # Only the newest version of a receipt is worth keeping
+        self._entries[(gid, version)] = pdf
+        self._versions[gid] = version
+        self._bytes += len(pdf)
+        while self._bytes > self.max_bytes:
+            (old_gid, _), old_pdf = self._entries.popitem(last=False)
+            self._versions.pop(old_gid, None)
+            self._bytes -= len(old_pdf)
+            self.evictions += 1
+
+    def _drop_local(self, gid: str) -> None:
+        # Caller holds self._lock
+        version = self._versions.pop(gid, None)
+        if version is not None:
+            self._bytes -= len(self._entries.pop((gid, version)))
+
+    def _path(self, gid: str, version: str) -> Path:
+        return self.directory / f"{gid}-{version}-{RECEIPT_LAYOUT_VERSION}.pdf"
+
+    def _read_disk(self, gid: str, version: str) -> Optional[bytes]:
+        if self.directory is None:
+            return None
+        try:
+            return self._path(gid, version).read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Receipt cache read failed: {e}")
+            return None
+
+    def _write_disk(self, gid: str, version: str, pdf: bytes) -> None:
+        if self.directory is None:
+            return
+        try:
+            for path in self.directory.glob(f"{gid}-*.pdf"):
+                path.unlink(missing_ok=True)
+            # Write then rename so other workers never read a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp, self._path(gid, version))
+        except OSError as e:
+            logger.warning(f"Receipt cache write failed: {e}")
+
+
+# Global instance
+receipt_cache = ReceiptCache()
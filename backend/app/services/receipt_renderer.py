@@ -0,0 +1,274 @@
+"""
+Receipt rendering off the request threads.
+
+ReportLab is pure-Python and CPU-bound, so rendering a receipt in the
+threadpool holds the GIL and slows every other sync request in the worker.
+ReceiptRenderer sends renders to a small pool of worker processes instead;
+the request thread just waits on the result with the GIL released.
+
+The pool is bounded: at most ``max_pending`` renders (running plus queued)
+are accepted at a time. Past that, render() waits up to ``queue_wait``
+seconds for a slot and then raises RendererBusy, which the API turns into a
+503 with Retry-After, so a burst of receipt downloads queues briefly and is
+then shed instead of starving submissions. A render that takes longer than
+``timeout`` raises RendererTimeout, and a pool whose worker process died
+raises RendererUnavailable (the next submission starts a fresh pool); both
+get the same 503. render_async() waits for the slot and the result on the
+event loop, so a queued download holds no threadpool thread. Bulk renders
+keep at most ``workers`` jobs in the pool at once, leaving the rest of the
+queue to single downloads.
+
+With ``workers`` set to 0 (or before start()) receipts are rendered in the
+calling thread, which is what the test suite and one-off scripts use.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional
+
+import anyio
+
+from ..utils.pdf import build_receipt_pdf
+from .metrics import Counter, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+receipt_render_duration = registry.register(Histogram(
+    "receipt_render_duration_seconds", "Receipt PDF render latency including queueing, by outcome",
+    ("outcome",),
+))
+receipt_renders_rejected = registry.register(Counter(
+    "receipt_renders_rejected_total", "Receipt renders refused because the render queue was full",
+))
+
+
+# How often render_async() checks for a free slot while the queue is full
+SLOT_POLL_SECONDS = 0.02
+
+
+class RendererUnavailable(Exception):
+    """Raised when a receipt can't be rendered right now; the client should retry."""
+
+
+class RendererBusy(RendererUnavailable):
+    """Raised when the render queue stays full for longer than the allowed wait."""
+
+
+class RendererTimeout(RendererUnavailable):
+    """Raised when a render takes longer than the renderer's timeout."""
+
+
+def _default_workers() -> int:
+    return min(4, os.cpu_count() or 1)
+
+
+class ReceiptRenderer:
+    """Bounded process pool for build_receipt_pdf()."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        queue_wait: Optional[float] = None,
+        timeout: Optional[float] = None,
+        render: Callable[[Dict[str, Any]], bytes] = build_receipt_pdf,
+    ):
+        self.workers = (
+            workers if workers is not None else int(os.getenv("RECEIPT_RENDER_WORKERS", str(_default_workers())))
+        )
+        self.max_pending = (
+            max_pending if max_pending is not None
+            else int(os.getenv("RECEIPT_RENDER_QUEUE_SIZE", str(max(self.workers, 1) * 4)))
+        )
+        self.queue_wait = (
+            queue_wait if queue_wait is not None else float(os.getenv("RECEIPT_RENDER_QUEUE_WAIT", "2"))
+        )
+        self.timeout = timeout if timeout is not None else float(os.getenv("RECEIPT_RENDER_TIMEOUT", "30"))
+        self._render = render
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(max(self.max_pending, 1))
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self._pending = 0
+        self._rendered = 0
+        self._rejected = 0
+        self._failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        if self.running or self.workers <= 0:
+            return
+        self._executor = self._create_executor()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked: the API process has logging, categorization
+        # and outbox threads whose locks a forked child could inherit held
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def stop(self) -> None:
+        """Wait for in-flight renders and shut the worker processes down."""
+        if not self.running:
+            return
+        executor, self._executor = self._executor, None
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    def render(self, data: Dict[str, Any]) -> bytes:
+        """Render one receipt, waiting up to queue_wait for a free slot."""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_wait):
+            self._reject()
+        try:
+            pdf = self._result(self._submit(data))
+        except Exception as e:
+            receipt_render_duration.observe(time.perf_counter() - start, _outcome(e))
+            raise
+        receipt_render_duration.observe(time.perf_counter() - start, "ok")
+        return pdf
+
+    async def render_async(self, data: Dict[str, Any]) -> bytes:
+        """
+        Render one receipt from the event loop: poll for a free slot for up to
+        queue_wait, then await the worker process without holding a thread.
+        Without a pool the render runs inline in a worker thread.
+        """
+        if self._executor is None:
+            return await anyio.to_thread.run_sync(self.render, data)
+
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.queue_wait
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._reject()
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+        try:
+            future = self._submit(data)
+            try:
+                pdf = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                raise RendererTimeout(f"Receipt render took longer than {self.timeout:g}s")
+            except BrokenProcessPool as e:
+                raise RendererUnavailable(f"Receipt render pool failed: {e}")
+        except Exception as e:
+            receipt_render_duration.observe(time.perf_counter() - start, _outcome(e))
+            raise
+        receipt_render_duration.observe(time.perf_counter() - start, "ok")
+        return pdf
+
+    def render_many(self, items: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+        """
+        Render receipts in input order, keeping up to ``workers`` of them in
+        the pool at a time so a large batch uses every core without taking
+        the whole queue.
+        """
+        window = max(self.workers, 1)
+        futures: Deque[Future] = deque()
+        try:
+            for data in items:
+                if len(futures) >= window:
+                    yield self._result(futures.popleft())
+                if not self._slots.acquire(timeout=self.queue_wait):
+                    self._reject()
+                futures.append(self._submit(data))
+            while futures:
+                yield self._result(futures.popleft())
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "workers": self.workers if self.running else 0,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "rendered": self._rendered,
+                "rejected": self._rejected,
+                "failed": self._failed,
+            }
+
+    def _reject(self) -> None:
+        with self._lock:
+            self._rejected += 1
+        receipt_renders_rejected.inc()
+        raise RendererBusy("Receipt render queue is full")
+
+    def _result(self, future: Future) -> bytes:
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            # The worker keeps its slot until the render actually finishes
+            raise RendererTimeout(f"Receipt render took longer than {self.timeout:g}s")
+        except BrokenProcessPool as e:
+            raise RendererUnavailable(f"Receipt render pool failed: {e}")
+
+    def _submit(self, data: Dict[str, Any]) -> Future:
+        """Start a render in a slot the caller has already acquired."""
+        with self._lock:
+            self._pending += 1
+
+        executor = self._executor
+        if executor is None:
+            future: Future = Future()
+            try:
+                future.set_result(self._render(data))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                try:
+                    future = executor.submit(self._render, data)
+                except BrokenProcessPool:
+                    # A worker process died; renders already queued on it have failed
+                    future = self._replace_executor(executor).submit(self._render, data)
+            except Exception:
+                self._release(None)
+                raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is broken:
+                logger.error("Receipt render pool broke, starting a new one")
+                self._executor = self._create_executor()
+            executor = self._executor
+        broken.shutdown(wait=False, cancel_futures=True)
+        if executor is None:  # Stopped meanwhile
+            raise RendererUnavailable("Receipt render pool is stopped")
+        return executor
+
+    def _release(self, future: Optional[Future]) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled():
+                if future.exception() is None:
+                    self._rendered += 1
+                else:
+                    self._failed += 1
+                    logger.error(f"Receipt render failed: {future.exception()}")
+        self._slots.release()
+
+
+def _outcome(error: Exception) -> str:
+    return "timeout" if isinstance(error, RendererTimeout) else "error"
+
+
+# Global instance
+receipt_renderer = ReceiptRenderer()
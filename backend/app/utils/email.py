@@ -1,11 +1,14 @@
 """Email utility for sending notifications via SMTP."""
 import smtplib
 import os
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import Any, Dict, Optional
 import logging
 
+from ..services.metrics import smtp_send_duration
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,40 +21,23 @@ def get_smtp_config():
         "password": os.getenv("SMTP_PASSWORD", ""),
         "from_email": os.getenv("SMTP_FROM_EMAIL", "noreply@grievance.local"),
         "use_tls": os.getenv("SMTP_USE_TLS", "false").lower() == "true",
+        "timeout": float(os.getenv("SMTP_TIMEOUT", "30")),
     }
 
 
-def send_grievance_confirmation_email(
-    to_email: str,
+def build_grievance_confirmation_email(
     grievance_id: str,
     complainant_name: Optional[str] = None,
-    details: Optional[str] = None,
-) -> bool:
+) -> Dict[str, str]:
     """
-    Send a confirmation email to the complainant after grievance submission.
-    
-    Args:
-        to_email: Recipient email address
-        grievance_id: The grievance tracking ID
-        complainant_name: Optional name of the complainant
-        details: Optional grievance details preview
+    Render the confirmation email for a grievance.
     
     Returns:
-        True if email was sent successfully, False otherwise
+        Dictionary with "subject", "text_body" and "html_body"
     """
-    try:
-        config = get_smtp_config()
-        
-        # Create message
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = f"Grievance Confirmation - {grievance_id}"
-        msg["From"] = config["from_email"]
-        msg["To"] = to_email
-        
-        # Create email body
-        greeting = f"Dear {complainant_name}," if complainant_name else "Dear Complainant,"
-        
-        text_body = f"""{greeting}
+    greeting = f"Dear {complainant_name}," if complainant_name else "Dear Complainant,"
+    
+    text_body = f"""{greeting}
 
 Thank you for submitting your grievance to Vaka Sosiale.
 
@@ -65,8 +51,8 @@ We will review your submission and update you on the progress.
 Best regards,
 Vaka Sosiale Grievance Team
 """
-        
-        html_body = f"""
+    
+    html_body = f"""
 <html>
 <body>
     <p>{greeting}</p>
@@ -85,12 +71,84 @@ Vaka Sosiale Grievance Team
 </body>
 </html>
 """
+    
+    return {
+        "subject": f"Grievance Confirmation - {grievance_id}",
+        "text_body": text_body,
+        "html_body": html_body,
+    }
+
+
+def build_message(
+    from_email: str,
+    to_email: str,
+    subject: str,
+    text_body: str,
+    html_body: Optional[str] = None,
+) -> MIMEMultipart:
+    """Assemble a multipart message with plain text and (optional) HTML versions."""
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = from_email
+    msg["To"] = to_email
+    msg.attach(MIMEText(text_body, "plain"))
+    if html_body:
+        msg.attach(MIMEText(html_body, "html"))
+    return msg
+
+
+def open_smtp_connection(config: Dict[str, Any]) -> smtplib.SMTP:
+    """Connect, STARTTLS and log in according to the SMTP configuration."""
+    server = smtplib.SMTP(config["host"], config["port"], timeout=config["timeout"])
+    try:
+        if config["use_tls"]:
+            server.starttls()
         
-        # Attach both plain text and HTML versions
-        part1 = MIMEText(text_body, "plain")
-        part2 = MIMEText(html_body, "html")
-        msg.attach(part1)
-        msg.attach(part2)
+        if config["username"] and config["password"]:
+            server.login(config["username"], config["password"])
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def send_smtp_message(server: smtplib.SMTP, message: MIMEMultipart) -> None:
+    """server.send_message(), with its latency recorded in smtp_send_duration_seconds."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        server.send_message(message)
+        outcome = "ok"
+    finally:
+        smtp_send_duration.observe(time.perf_counter() - start, outcome)
+
+
+def send_grievance_confirmation_email(
+    to_email: str,
+    grievance_id: str,
+    complainant_name: Optional[str] = None,
+    details: Optional[str] = None,
+) -> bool:
+    """
+    Send a confirmation email to the complainant after grievance submission.
+    
+    This sends immediately over a dedicated SMTP connection. Submissions use
+    the email outbox (app.services.email_outbox) instead, so they never wait
+    on the mail server.
+    
+    Args:
+        to_email: Recipient email address
+        grievance_id: The grievance tracking ID
+        complainant_name: Optional name of the complainant
+        details: Optional grievance details preview
+    
+    Returns:
+        True if email was sent successfully, False otherwise
+    """
+    try:
+        config = get_smtp_config()
+        content = build_grievance_confirmation_email(grievance_id, complainant_name)
+        msg = build_message(config["from_email"], to_email, **content)
         
         # Send email
         with smtplib.SMTP(config["host"], config["port"]) as server:
@@ -100,7 +158,7 @@ Vaka Sosiale Grievance Team
             if config["username"] and config["password"]:
                 server.login(config["username"], config["password"])
             
-            server.send_message(msg)
+            send_smtp_message(server, msg)
             logger.info(f"Confirmation email sent to {to_email} for grievance {grievance_id}")
             return True
             
@@ -1,17 +1,137 @@
+import copy
+import logging
 from io import BytesIO
+from reportlab import rl_config
 from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 from pathlib import Path
 
+try:
+    from reportlab.lib.utils import _digester
+except ImportError:  # pragma: no cover - private helper; receipts fall back to plain drawImage()
+    _digester = None
+
+logger = logging.getLogger(__name__)
+
+# Static receipt assets, prepared once at import and shared (read-only) by every
+# build_receipt_pdf() call: styles, table styles, title metrics and the logo,
+# whose PNG decode, compression and ASCII85 encoding used to dominate each receipt.
+# Reusing the encoded logo relies on ReportLab internals, so it is only enabled
+# after a probe receipt built that way matches one built with plain drawImage().
+
+LOGO_PATH = str(Path(__file__).parent.parent / "static" / "images" / "VAKA SOCIALE_final_NEW.png")
+LOGO_MASK = "auto"
+LOGO_WIDTH = 50*mm
+LOGO_HEIGHT = 15*mm
+
+TITLE = "Grievance / Feedback Receipt"
+TITLE_FONT = "Helvetica-Bold"
+TITLE_FONT_SIZE = 16
+TITLE_WIDTH = stringWidth(TITLE, TITLE_FONT, TITLE_FONT_SIZE)
+
+_styles = getSampleStyleSheet()
+
+# Bold style for labels (first column)
+LABEL_STYLE = ParagraphStyle(
+    'Label',
+    parent=_styles['Normal'],
+    fontName='Helvetica-Bold',
+    fontSize=11,
+    leading=14,
+)
+
+# Italic style for content (second column)
+CONTENT_STYLE = ParagraphStyle(
+    'Content',
+    parent=_styles['Normal'],
+    fontName='Helvetica-Oblique',
+    fontSize=11,
+    leading=14,
+)
+
+_CELL_STYLE_COMMANDS = [
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 5),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+    ('TOPPADDING', (0, 0), (-1, -1), 5),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+]
+DETAILS_TABLE_STYLE = TableStyle(_CELL_STYLE_COMMANDS)
+ATTACHMENT_TABLE_STYLE = TableStyle(_CELL_STYLE_COMMANDS + [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),  # Header background
+])
+
+DETAILS_COL_WIDTHS = [45*mm, 125*mm]
+# Column widths: 10mm for number, 90mm for name, 70mm for link
+ATTACHMENT_COL_WIDTHS = [10*mm, 90*mm, 70*mm]
+
+
+def _encode_logo() -> Optional[pdfdoc.PDFImageXObject]:
+    """
+    The logo as an encoded PDF image object, named the way canvas.drawImage()
+    names a file image so drawImage() finds it already registered.
+    """
+    if not os.path.exists(LOGO_PATH):
+        return None
+    try:
+        name = _digester(f"{LOGO_PATH}{LOGO_MASK}".encode("utf-8")) if _digester else "VakaSosialeLogo"
+        logo = pdfdoc.PDFImageXObject(name, LOGO_PATH, mask=LOGO_MASK)
+        logo.name = name
+        return logo
+    except Exception:
+        # If logo fails to load, receipts are rendered without it
+        return None
+
+
+_LOGO = _encode_logo()
+
+
+def _register_logo(c: canvas.Canvas) -> None:
+    """Add copies of the pre-encoded logo (and its soft mask) to this canvas's document."""
+    doc = c._doc
+    reg_name = doc.getXObjectName(_LOGO.name)
+    if reg_name in doc.idToObject:
+        return
+    # Copies, because registering sets per-document attributes on the objects
+    logo = copy.copy(_LOGO)
+    c._setXObjects(logo)
+    doc.Reference(logo, reg_name)
+    doc.addForm(_LOGO.name, logo)
+    smask = getattr(logo, "_smask", None)
+    if smask is not None:
+        smask = copy.copy(smask)
+        c._setXObjects(smask)
+        logo.smask = doc.Reference(smask, doc.getXObjectName(smask.name))
+        del logo._smask
+
+
+def _prepared_logo_matches() -> bool:
+    """Whether registering the pre-encoded logo yields the same PDF as drawImage() alone."""
+    probe = {"id": "GRV-LOGO-PROBE", "details": "Logo probe"}
+    invariant = rl_config.invariant
+    rl_config.invariant = 1  # Fixed document ids and dates so the two builds are comparable
+    try:
+        if _build_receipt_pdf(probe, reuse_logo=True) == _build_receipt_pdf(probe, reuse_logo=False):
+            return True
+        logger.warning("Pre-encoded receipt logo doesn't match drawImage() output; encoding it per receipt")
+    except Exception as e:
+        logger.warning(f"Pre-encoded receipt logo failed ({e}); encoding it per receipt")
+    finally:
+        rl_config.invariant = invariant
+    return False
+
+
 def format_timestamp(iso_string: str) -> str:
     """Convert ISO timestamp to local time format like 'Tue Jul 22 2025 18:06:48'"""
     try:
@@ -24,6 +144,10 @@ def format_timestamp(iso_string: str) -> str:
         return iso_string
 
 def build_receipt_pdf(data: dict) -> bytes:
+    return _build_receipt_pdf(data, reuse_logo=_LOGO_REUSABLE)
+
+
+def _build_receipt_pdf(data: dict, reuse_logo: bool) -> bytes:
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     
@@ -37,27 +161,19 @@ def build_receipt_pdf(data: dict) -> bytes:
     y = height - 20*mm
     
     # Add logo image at the top (centered)
-    logo_path = Path(__file__).parent.parent / "static" / "images" / "VAKA SOCIALE_final_NEW.png"
-    if logo_path.exists():
-        try:
-            # Load and draw the logo
-            img = ImageReader(str(logo_path))
-            img_width = 50*mm  # Logo width
-            img_height = 15*mm  # Logo height
-            x_logo = (width - img_width) / 2  # Center the logo
-            c.drawImage(img, x_logo, y - img_height, width=img_width, height=img_height, preserveAspectRatio=True, mask='auto')
-            y -= (img_height + 5*mm)  # Move down after logo
-        except Exception as e:
-            # If logo fails to load, just skip it
-            pass
-    
-    c.setFont("Helvetica-Bold", 16)
+    if _LOGO is not None:
+        if reuse_logo:
+            _register_logo(c)
+        x_logo = (width - LOGO_WIDTH) / 2  # Center the logo
+        c.drawImage(LOGO_PATH, x_logo, y - LOGO_HEIGHT, width=LOGO_WIDTH, height=LOGO_HEIGHT,
+                    preserveAspectRatio=True, mask=LOGO_MASK)
+        y -= (LOGO_HEIGHT + 5*mm)  # Move down after logo
+    
+    c.setFont(TITLE_FONT, TITLE_FONT_SIZE)
     
     # Center-align the title
-    title = "Grievance / Feedback Receipt"
-    title_width = c.stringWidth(title, "Helvetica-Bold", 16)
-    x_centered = (width - title_width) / 2
-    c.drawString(x_centered, y, title)
+    x_centered = (width - TITLE_WIDTH) / 2
+    c.drawString(x_centered, y, TITLE)
     
     y -= 15*mm
     
@@ -100,26 +216,8 @@ def build_receipt_pdf(data: dict) -> bytes:
     table_data.append(["Details:", data.get('details') or '-'])
     table_data.append(["Category type:", data.get('category_type') or '-'])
     
-    # Create styles for table cells
-    styles = getSampleStyleSheet()
-    
-    # Bold style for labels (first column)
-    label_style = ParagraphStyle(
-        'Label',
-        parent=styles['Normal'],
-        fontName='Helvetica-Bold',
-        fontSize=11,
-        leading=14,
-    )
-    
-    # Italic style for content (second column)
-    content_style = ParagraphStyle(
-        'Content',
-        parent=styles['Normal'],
-        fontName='Helvetica-Oblique',
-        fontSize=11,
-        leading=14,
-    )
+    label_style = LABEL_STYLE
+    content_style = CONTENT_STYLE
     
     # Convert table data to use Paragraph objects for proper text wrapping
     formatted_table_data = []
@@ -130,18 +228,8 @@ def build_receipt_pdf(data: dict) -> bytes:
         ])
     
     # Create the table
-    col_widths = [45*mm, 125*mm]  # Column widths
-    table = Table(formatted_table_data, colWidths=col_widths)
-    
-    # Apply table style
-    table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 5),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    table = Table(formatted_table_data, colWidths=DETAILS_COL_WIDTHS)
+    table.setStyle(DETAILS_TABLE_STYLE)
     
     # Calculate table height and draw it
     table_width, table_height = table.wrap(width, height)
@@ -197,18 +285,8 @@ def build_receipt_pdf(data: dict) -> bytes:
                 ])
         
         # Create attachments table with three columns: #, Name, Link
-        # Column widths: 10mm for number, 90mm for name, 70mm for link
-        attachment_col_widths = [10*mm, 90*mm, 70*mm]
-        attachment_table = Table(formatted_attachment_data, colWidths=attachment_col_widths)
-        attachment_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),  # Header background
-        ]))
+        attachment_table = Table(formatted_attachment_data, colWidths=ATTACHMENT_COL_WIDTHS)
+        attachment_table.setStyle(ATTACHMENT_TABLE_STYLE)
         
         # Check if we need a new page
         att_table_width, att_table_height = attachment_table.wrap(width, height)
@@ -223,3 +301,6 @@ def build_receipt_pdf(data: dict) -> bytes:
     pdf = buf.getvalue()
     buf.close()
     return pdf
+
+
+_LOGO_REUSABLE = _LOGO is not None and _prepared_logo_matches()
@@ -0,0 +1,190 @@
+"""
+Streaming multipart/form-data uploads.
+
+FastAPI's ``UploadFile`` parameters are only filled in once Starlette has
+spooled the whole request body, so the size limit and content-type check can
+only run after the client has sent everything. MultipartFileStream instead
+parses the body as it arrives and hands out the file field's bytes chunk by
+chunk, and stream_to_thread() feeds those chunks to a blocking consumer (the
+MinIO uploader) running in a worker thread, with a small bounded buffer in
+between so neither side holds more than a few chunks.
+"""
+
+import threading
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Iterator, Optional, Tuple, TypeVar
+
+import anyio
+import multipart
+from multipart.multipart import parse_options_header
+from starlette.datastructures import Headers
+
+T = TypeVar("T")
+
+# Chunks buffered between the request reader and the upload thread
+STREAM_BUFFER_CHUNKS = 8
+
+
+class MultipartError(Exception):
+    """The request body is not a well-formed multipart/form-data upload."""
+
+
+class MissingFileField(MultipartError):
+    """The multipart body ended without the expected file field."""
+
+
+class UploadInterrupted(Exception):
+    """The request body stopped before the file was complete."""
+
+
+class MultipartFileStream:
+    """Incremental reader for one file field of a multipart/form-data body."""
+
+    def __init__(self, headers: Headers, stream: AsyncIterator[bytes], field_name: str = "file"):
+        content_type, params = parse_options_header(headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise MultipartError("Expected a multipart/form-data body")
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+
+        self._stream = stream.__aiter__()
+        self._parser = multipart.MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+        self._headers: dict = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._in_file = False
+        self._found = False
+        self._finished = False
+        self._body_done = False
+        self._data: Deque[bytes] = deque()
+
+    async def open(self) -> Tuple[str, str]:
+        """Read up to the file field's headers; returns its filename and content type."""
+        while not self._found:
+            if not await self._feed():
+                raise MissingFileField(f"Missing file field '{self.field_name}'")
+        return self.filename, self.content_type
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """The file field's content, as it arrives."""
+        while True:
+            while self._data:
+                yield self._data.popleft()
+            if self._finished:
+                return
+            if not await self._feed():
+                raise UploadInterrupted("Request body ended inside the file field")
+
+    async def _feed(self) -> bool:
+        if self._body_done:
+            return False
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._body_done = True
+            return False
+        if chunk:
+            try:
+                self._parser.write(chunk)
+            except multipart.multipart.MultipartParseError as e:
+                raise MultipartError(f"Malformed multipart body: {e}")
+        return True
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        self._in_file = not self._found and name == self.field_name and b"filename" in options
+        if self._in_file:
+            self._found = True
+            self.filename = options[b"filename"].decode("utf-8", errors="replace")
+            content_type = self._headers.get(b"content-type", b"application/octet-stream")
+            self.content_type = content_type.decode("latin-1").strip()
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file and end > start:
+            self._data.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._finished = True
+
+
+async def stream_to_thread(
+    chunks: AsyncIterator[bytes],
+    consume: Callable[[Iterator[bytes]], T],
+    buffer_chunks: int = STREAM_BUFFER_CHUNKS,
+) -> T:
+    """
+    Run ``consume`` in a worker thread, feeding it ``chunks`` from this task.
+
+    The consumer sees a plain iterator. If the producer fails part way (bad
+    body, client disconnect) the iterator raises UploadInterrupted so the
+    consumer can abort instead of finishing a truncated object; if the
+    consumer stops early (e.g. size limit), reading the body stops too.
+    """
+    send, receive = anyio.create_memory_object_stream(buffer_chunks)
+    interrupted = threading.Event()
+    outcome: dict = {}
+
+    def iterate() -> Iterator[bytes]:
+        while True:
+            try:
+                yield anyio.from_thread.run(receive.receive)
+            except anyio.EndOfStream:
+                if interrupted.is_set():
+                    raise UploadInterrupted("Upload interrupted")
+                return
+
+    def run_consumer() -> None:
+        try:
+            outcome["result"] = consume(iterate())
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            anyio.from_thread.run_sync(receive.close)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(anyio.to_thread.run_sync, run_consumer)
+        complete = False
+        try:
+            async for chunk in chunks:
+                await send.send(chunk)
+            complete = True
+        except (anyio.BrokenResourceError, anyio.ClosedResourceError):
+            complete = True  # The consumer stopped reading; its outcome says why
+        except BaseException as e:
+            outcome.setdefault("producer_error", e)
+        finally:
+            if not complete:
+                interrupted.set()
+            send.close()
+
+    if "producer_error" in outcome:
+        raise outcome["producer_error"]
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
@@ -1,11 +1,35 @@
+import base64
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape, unescape
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+# Background categorization workers and the email outbox sender use the app's
+# own engine; tests drive CategorizationQueue/EmailOutboxSender instances explicitly.
+# Receipts render inline unless a test starts its own ReceiptRenderer pool.
+os.environ.setdefault("CATEGORIZATION_WORKERS", "0")
+os.environ.setdefault("EMAIL_OUTBOX_SENDER", "false")
+os.environ.setdefault("RECEIPT_RENDER_WORKERS", "0")
+
 from app.main import app
 from app.database import Base, get_db
+from app.services.categorization_cache import categorization_cache
+from app.services.llm_categorizer import close_openai_clients
+from app.services.receipt_cache import receipt_cache
+from app.utils.minio import minio_client
 
 # Create an in-memory SQLite database for testing
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -18,6 +42,18 @@ engine = create_engine(
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def reset_categorizer_state():
+    """Keep cached LLM results, receipts and (mocked) shared OpenAI clients from leaking between tests"""
+    categorization_cache.clear()
+    receipt_cache.clear()
+    close_openai_clients()
+    yield
+    categorization_cache.clear()
+    receipt_cache.clear()
+    close_openai_clients()
+
+
 @pytest.fixture(scope="function")
 def test_db():
     """Create a fresh database for each test"""
@@ -43,3 +79,232 @@ def client(test_db):
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
+
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    """The slice of the S3 REST API that MinIOClient uses, over anonymous requests"""
+    protocol_version = "HTTP/1.1"
+
+    def _route(self):
+        url = urlsplit(self.path)
+        bucket, _, key = url.path.lstrip("/").partition("/")
+        return bucket, unquote(key), {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        store = self.server.store
+        with store.lock:
+            store.requests.append((self.command, self.path))
+            store.connections.add(self.client_address)
+            store.largest_body = max(store.largest_body, length)
+        if store.discard_bodies:
+            while length > 0:
+                length -= len(self.rfile.read(min(length, 64 * 1024)))
+            body = b""
+        else:
+            body = self.rfile.read(length)
+        if store.delay:
+            time.sleep(store.delay)
+        return body
+
+    def _injected_failure(self) -> bool:
+        """Answer with an error queued by FakeS3.fail() instead of handling the request"""
+        store = self.server.store
+        with store.lock:
+            for i, (method, status) in enumerate(store.failures):
+                if method in (None, self.command):
+                    del store.failures[i]
+                    break
+            else:
+                return False
+        self._reply(status, b"<Error><Code>InternalError</Code></Error>")
+        return True
+
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_PUT(self):
+        bucket, key, query = self._route()
+        body = self._body()
+        if self._injected_failure():
+            return
+        store = self.server.store
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with store.lock:
+            if "uploadId" in query:
+                if query["uploadId"] not in store.uploads:
+                    return self._reply(404)
+                store.uploads[query["uploadId"]]["parts"][int(query["partNumber"])] = body
+            elif "x-amz-copy-source" in self.headers:
+                source = unquote(self.headers["x-amz-copy-source"]).lstrip("/").partition("/")[2]
+                if source not in store.objects:
+                    return self._reply(404)
+                store.objects[key] = dict(store.objects[source])
+                if self.headers.get("x-amz-metadata-directive") == "REPLACE":
+                    store.objects[key]["content_type"] = self.headers.get("Content-Type")
+                store.modified[key] = time.time()
+                store.copied += 1
+                return self._reply(200, b"<CopyObjectResult></CopyObjectResult>")
+            else:
+                store.objects[key] = {"body": body, "content_type": self.headers.get("Content-Type")}
+                store.modified[key] = time.time()
+        self._reply(200, headers={"ETag": etag})
+
+    def do_POST(self):
+        bucket, key, query = self._route()
+        body = self._body()
+        if self._injected_failure():
+            return
+        store = self.server.store
+        if "delete" in query:
+            return self._delete_objects(body)
+        with store.lock:
+            if "uploads" in query:
+                upload_id = uuid.uuid4().hex
+                store.uploads[upload_id] = {"key": key, "parts": {}, "content_type": self.headers.get("Content-Type")}
+                xml = f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                return self._reply(200, xml.encode())
+            upload = store.uploads.pop(query.get("uploadId"), None)
+            if upload is None:
+                return self._reply(404)
+            numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+            data = b"".join(upload["parts"][n] for n in numbers)
+            store.objects[key] = {"body": data, "content_type": upload["content_type"], "parts": len(numbers)}
+            store.modified[key] = time.time()
+            store.completed += 1
+        self._reply(200, b"<CompleteMultipartUploadResult></CompleteMultipartUploadResult>")
+
+    def do_DELETE(self):
+        bucket, key, query = self._route()
+        self._body()
+        if self._injected_failure():
+            return
+        store = self.server.store
+        with store.lock:
+            if "uploadId" in query:
+                store.uploads.pop(query["uploadId"], None)
+                store.aborted += 1
+            else:
+                store.objects.pop(key, None)
+                store.modified.pop(key, None)
+        self._reply(204)
+
+    def _delete_objects(self, body):
+        store = self.server.store
+        if self.headers.get("Content-MD5") != base64.b64encode(hashlib.md5(body).digest()).decode():
+            return self._reply(400, b"<Error><Code>InvalidDigest</Code></Error>")
+        keys = [unescape(k) for k in re.findall(r"<Key>(.*?)</Key>", body.decode())]
+        errors = []
+        with store.lock:
+            store.bulk_deletes.append(len(keys))
+            for key in keys:
+                if key in store.undeletable:
+                    errors.append(f"<Error><Key>{escape(key)}</Key><Code>AccessDenied</Code></Error>")
+                    continue
+                store.objects.pop(key, None)
+                store.modified.pop(key, None)
+        self._reply(200, ("<DeleteResult>" + "".join(errors) + "</DeleteResult>").encode())
+
+    def do_HEAD(self):
+        bucket, key, query = self._route()
+        self._body()
+        if self._injected_failure():
+            return
+        store = self.server.store
+        obj = store.objects.get(key)
+        if obj is None:
+            return self._reply(404)
+        modified = store.modified.get(key, time.time())
+        self._reply(200, obj["body"], headers={
+            "Content-Type": obj["content_type"], "Last-Modified": formatdate(modified, usegmt=True),
+        })
+
+    def do_GET(self):
+        bucket, key, query = self._route()
+        self._body()
+        if self._injected_failure():
+            return
+        if not key and query.get("list-type") == "2":
+            return self._list_objects(query)
+        obj = self.server.store.objects.get(key)
+        self._reply(200, obj["body"]) if obj else self._reply(404)
+
+    def _list_objects(self, query):
+        """ListObjectsV2; the continuation token is the last key of the previous page"""
+        store = self.server.store
+        prefix, after = query.get("prefix", ""), query.get("continuation-token", "")
+        with store.lock:
+            keys = sorted(k for k in store.objects if k.startswith(prefix) and k > after)
+            limit = int(query.get("max-keys", 1000))
+            page = [(k, len(store.objects[k]["body"]), store.modified.get(k, time.time())) for k in keys[:limit]]
+        contents = "".join(
+            f"<Contents><Key>{escape(k)}</Key><Size>{size}</Size><LastModified>"
+            f"{datetime.fromtimestamp(modified, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified></Contents>"
+            for k, size, modified in page
+        )
+        truncated = len(keys) > limit
+        token = f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>" if truncated else ""
+        xml = (
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{token}{contents}</ListBucketResult>"
+        )
+        self._reply(200, xml.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeS3:
+    """In-process S3 stand-in; objects and multipart uploads are kept in memory"""
+
+    def __init__(self, discard_bodies=False):
+        self.discard_bodies = discard_bodies  # Benchmarks: don't hold uploaded bytes in this process
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.uploads = {}
+        self.requests = []
+        self.largest_body = 0
+        self.completed = 0
+        self.aborted = 0
+        self.copied = 0
+        self.modified = {}  # key -> epoch seconds; objects added directly count as just written
+        self.bulk_deletes = []
+        self.undeletable = set()
+        self.failures = []
+        self.connections = set()
+        self.delay = 0.0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeS3Handler)
+        self.server.daemon_threads = True
+        self.server.store = self
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def fail(self, status, times=1, method=None):
+        """Answer the next ``times`` requests (of ``method``, if given) with ``status``"""
+        with self.lock:
+            self.failures.extend([(method, status)] * times)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_s3(monkeypatch):
+    """Point the global MinIO client at an in-process S3 stand-in"""
+    s3 = FakeS3()
+    monkeypatch.setattr(minio_client, "endpoint", s3.endpoint)
+    monkeypatch.setattr(minio_client, "public_endpoint", s3.endpoint)
+    monkeypatch.setattr(minio_client, "access_key", "test-access")
+    monkeypatch.setattr(minio_client, "secret_key", "test-secret")
+    monkeypatch.setattr(minio_client, "_signer", None)
+    monkeypatch.setattr(minio_client, "retry_backoff", 0.01)
+    yield s3
+    minio_client.close()  # Connections to this server must not outlive it
+    s3.close()
@@ -0,0 +1,126 @@
+"""
+Tests for the async (DATABASE_ASYNC) versions of the grievance and status write endpoints.
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import database, models
+from app.database import Base, async_database_url, create_async_db_engine, get_async_db
+from app.routers import grievances, status as status_router
+from app.schemas import GrievancePublic
+
+
+@pytest.fixture
+def async_app(tmp_path):
+    """The async handlers on a file-backed SQLite database served through aiosqlite"""
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(bind=sync_engine)
+    async_engine = create_async_db_engine(url)
+    sessions = database.async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with sessions() as db:
+            yield db
+
+    app = FastAPI()
+    app.add_api_route("/api/grievances/", grievances.create_grievance_async, methods=["POST"], status_code=201)
+    app.add_api_route(
+        "/api/grievances/{gid}/status",
+        grievances.update_grievance_status_async,
+        methods=["PUT"],
+        response_model=GrievancePublic,
+    )
+    app.add_api_route("/api/status/{gid}/status", status_router.update_status_async, methods=["PUT"])
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    with TestClient(app) as client:
+        yield client, sessionmaker(bind=sync_engine)
+    asyncio.run(async_engine.dispose())
+    sync_engine.dispose()
+
+
+@pytest.mark.parametrize("url,expected", [
+    ("postgresql://u:p@db:5432/grievance", "postgresql+asyncpg://u:p@db:5432/grievance"),
+    ("postgresql+psycopg2://u:p@db/grievance", "postgresql+asyncpg://u:p@db/grievance"),
+    ("sqlite:///./grievance.db", "sqlite+aiosqlite:///./grievance.db"),
+])
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+
+def test_async_database_url_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@db/grievance")
+
+
+def test_get_async_db_requires_configuration(monkeypatch):
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    with pytest.raises(RuntimeError):
+        asyncio.run(get_async_db().__anext__())
+
+
+def test_async_create_grievance(async_app):
+    client, sessions = async_app
+    response = client.post("/api/grievances/", json={
+        "is_anonymous": True,
+        "category_type": "1.1 Inquiries",
+        "details": "  Submitted through the async engine  ",
+    })
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["tracking_id"] == data["id"] == response.headers["x-grievance-id"]
+    assert data["details"] == "Submitted through the async engine"
+    assert data["created_at"]
+
+    with sessions() as db:
+        row = db.get(models.Grievance, data["id"])
+        assert row.category_type == "1.1 Inquiries"
+        assert row.change_seq == 1
+
+
+def test_async_update_grievance_status(async_app):
+    client, _ = async_app
+    gid = client.post("/api/grievances/", json={"category_type": "Test", "details": "Road flooded"}).json()["id"]
+
+    response = client.put(f"/api/grievances/{gid}/status", json={
+        "external_status": "In Progress",
+        "category_type": "2.1 Infrastructure",
+    })
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["external_status"] == "In Progress"
+    assert data["category_type"] == "2.1 Infrastructure"
+    assert data["updated_at"]
+
+    assert client.put("/api/grievances/GRV-NOTAVALIDID/status", json={}).status_code == 400
+    missing = "GRV-" + "0" * 26
+    assert client.put(f"/api/grievances/{missing}/status", json={}).status_code == 404
+
+
+def test_async_external_status_update(async_app, monkeypatch):
+    client, sessions = async_app
+    monkeypatch.setattr(status_router, "ODOO_TOKEN", "secret")
+    gid = client.post("/api/grievances/", json={"category_type": "Test", "details": "Water supply"}).json()["id"]
+
+    assert client.put(f"/api/status/{gid}/status", json={"status": "Resolved"}).status_code == 401
+
+    response = client.put(
+        f"/api/status/{gid}/status",
+        json={"status": "Resolved", "note": "Pipe repaired", "updated_at": "2024-05-01T10:00:00Z"},
+        headers={"Authorization": "Bearer secret"},
+    )
+    assert response.json() == {"ok": True, "id": gid, "status": "Resolved"}
+
+    with sessions() as db:
+        row = db.get(models.Grievance, gid)
+        assert row.external_status == "Resolved"
+        assert row.external_status_note == "Pipe repaired"
+        assert row.external_updated_at.year == 2024
@@ -0,0 +1,89 @@
+"""
+Tests for the attachment garbage collection job.
+"""
+import time
+from datetime import timedelta
+
+from app import models
+from app.services.attachment_gc import ReferencedKeys, attachment_key, run_attachment_gc
+from app.utils.minio import minio_client
+from tests.conftest import TestingSessionLocal
+
+DAY = 24 * 3600
+
+
+def _store(fake_s3, key, age=0.0):
+    fake_s3.objects[key] = {"body": b"data", "content_type": "image/jpeg"}
+    fake_s3.modified[key] = time.time() - age
+
+
+def _seed(db, fake_s3):
+    bucket = minio_client.bucket_name
+    for key in ["kept.jpg", "public host.pdf", "orphan-1.jpg", "orphan-2.jpg", "orphan-3.jpg", "orphan-4.jpg",
+                "orphan-5.jpg"]:
+        _store(fake_s3, key, age=3 * DAY)
+    _store(fake_s3, "pending.jpg")  # Uploaded, grievance not submitted yet
+    db.add_all([
+        models.Grievance(id="GRV-00000000000000000000000001",
+                         attachments=[{"name": "a", "url": f"{minio_client.endpoint}/{bucket}/kept.jpg"}]),
+        models.Grievance(id="GRV-00000000000000000000000002",
+                         attachments=[{"name": "b", "url": f"http://localhost:9000/{bucket}/public%20host.pdf"},
+                                      {"name": "c", "url": "https://example.org/elsewhere.jpg"}]),
+        models.Grievance(id="GRV-00000000000000000000000003", details="No attachments"),
+    ])
+    db.commit()
+
+
+def test_old_orphans_deleted_in_bulk(test_db, fake_s3):
+    _seed(test_db, fake_s3)
+
+    summary = run_attachment_gc(TestingSessionLocal, grace=timedelta(days=1), batch_size=2)
+
+    assert sorted(fake_s3.objects) == ["kept.jpg", "pending.jpg", "public host.pdf"]
+    assert summary == {"referenced": 2, "scanned": 8, "recent": 1, "orphaned": 5,
+                       "deleted": 5, "failed": 0, "dry_run": False}
+    assert fake_s3.bulk_deletes == [2, 2, 1]
+    assert [method for method, _ in fake_s3.requests].count("GET") == 4  # Listing pages of 2
+
+
+def test_dry_run_deletes_nothing(test_db, fake_s3):
+    _seed(test_db, fake_s3)
+
+    summary = run_attachment_gc(TestingSessionLocal, grace=timedelta(days=1), dry_run=True)
+
+    assert summary["orphaned"] == 5
+    assert summary["deleted"] == 0
+    assert len(fake_s3.objects) == 8
+    assert fake_s3.bulk_deletes == []
+
+
+def test_longer_grace_keeps_everything(test_db, fake_s3):
+    _seed(test_db, fake_s3)
+    summary = run_attachment_gc(TestingSessionLocal, grace=timedelta(days=7))
+    assert summary["recent"] == 6
+    assert len(fake_s3.objects) == 8
+
+
+def test_failed_deletes_are_counted(test_db, fake_s3):
+    _seed(test_db, fake_s3)
+    fake_s3.undeletable.add("orphan-3.jpg")
+
+    summary = run_attachment_gc(TestingSessionLocal, grace=timedelta(days=1))
+
+    assert summary["deleted"] == 4
+    assert summary["failed"] == 1
+    assert "orphan-3.jpg" in fake_s3.objects
+
+
+def test_attachment_key_and_referenced_keys():
+    bucket = minio_client.bucket_name
+    assert attachment_key({"url": f"http://minio:9000/{bucket}/a%26b.jpg"}, bucket) == "a&b.jpg"
+    assert attachment_key(f"http://localhost:9000/{bucket}/x.pdf", bucket) == "x.pdf"
+    assert attachment_key({"url": "http://minio:9000/other-bucket/x.pdf"}, bucket) is None
+    assert attachment_key({"name": "no url"}, bucket) is None
+
+    keys = ReferencedKeys(f"{i}.jpg" for i in range(1000))
+    keys.add("late.pdf")
+    assert "late.pdf" in keys and "999.jpg" in keys
+    assert "1000.jpg" not in keys
+    assert len(keys) == 1001
@@ -473,3 +473,68 @@ def test_batch_update_empty_string_values(client):
     assert grievance["external_status_note"] == ""
     assert grievance["hh_id"] == ""
 
+
+
+def test_batch_update_uses_one_select_and_one_commit(client, test_db):
+    """Rows are loaded with a single IN query and written in one transaction"""
+    from sqlalchemy import event
+    from tests.conftest import engine
+
+    ids = []
+    for i in range(5):
+        response = client.post("/api/grievances/", json={"details": f"Grievance {i}", "category_type": ""})
+        ids.append(response.json()["id"])
+
+    statements = []
+    commits = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    def count_commit(conn):
+        commits.append(1)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(engine, "commit", count_commit)
+    try:
+        response = client.put("/api/grievances/status-batch", json={
+            "updates": [{"gid": gid, "external_status": "Resolved"} for gid in ids]
+        })
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+        event.remove(engine, "commit", count_commit)
+
+    assert all(r["ok"] for r in response.json()["results"])
+    assert statements.count("SELECT") == 1
+    assert len(commits) == 1
+
+
+def test_batch_update_failing_item_reported_individually(client, test_db):
+    """A database error on one row is isolated by per-item savepoints"""
+    from sqlalchemy import event
+    from sqlalchemy.exc import IntegrityError
+    from app import models
+
+    ids = []
+    for i in range(3):
+        response = client.post("/api/grievances/", json={"details": f"Grievance {i}", "category_type": ""})
+        ids.append(response.json()["id"])
+
+    def reject_second(mapper, connection, target):
+        if target.id == ids[1]:
+            raise IntegrityError("UPDATE grievance", {}, Exception("constraint violated"))
+
+    event.listen(models.Grievance, "before_update", reject_second)
+    try:
+        response = client.put("/api/grievances/status-batch", json={
+            "updates": [{"gid": gid, "external_status": f"Status {i}"} for i, gid in enumerate(ids)]
+        })
+    finally:
+        event.remove(models.Grievance, "before_update", reject_second)
+
+    results = response.json()["results"]
+    assert [r["ok"] for r in results] == [True, False, True]
+    assert "constraint violated" in results[1]["error"]
+
+    statuses = [client.get(f"/api/grievances/{gid}").json()["external_status"] for gid in ids]
+    assert statuses == ["Status 0", None, "Status 2"]
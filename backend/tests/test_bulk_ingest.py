@@ -0,0 +1,155 @@
+"""
+Tests for the NDJSON bulk ingest endpoint.
+"""
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+from app import models
+from app.main import app
+from app.routers import grievances
+from app.services.categorization_queue import CATEGORY_DONE, CATEGORY_PENDING, CategorizationQueue
+from tests.conftest import TestingSessionLocal
+
+
+def _ndjson(*objects):
+    return "\n".join(o if isinstance(o, str) else json.dumps(o) for o in objects).encode("utf-8")
+
+
+def _post(client, body, **params):
+    response = client.post(
+        "/api/grievances/bulk", content=body, params=params, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines[:-1], lines[-1]["summary"]
+
+
+def test_bulk_ingest_reports_each_line(client, test_db):
+    body = _ndjson(
+        {"details": "First", "category_type": "1.1 Inquiries", "island": "Tongatapu"},
+        {"grievance_details": "Second (Typebot field name)", "category_type": ""},
+        "",
+        {"details": "Bad email", "is_anonymous": False, "complainant_email": "not-an-email"},
+        {"id": "GRV-01K88MF7431X7NF9D4GHQN5742", "details": "Client-supplied id"},
+        "{not json",
+        {"details": "Needs categorization"},
+    )
+    with patch("app.routers.grievances.categorization_queue", **{"claim_until.return_value": None}) as mock_queue:
+        results, summary = _post(client, body)
+
+    assert [r["line"] for r in results] == [1, 2, 4, 5, 6, 7]
+    assert [r["ok"] for r in results] == [True, True, False, False, False, True]
+    assert "complainant_email" in results[2]["error"]
+    assert "ID field is not allowed" in results[3]["error"]
+    assert summary == {"lines": 6, "inserted": 3, "failed": 3}
+
+    rows = {row.id: row for row in test_db.query(models.Grievance).all()}
+    assert set(rows) == {results[0]["id"], results[1]["id"], results[5]["id"]}
+    assert rows[results[0]["id"]].island == "Tongatapu"
+    assert rows[results[1]["id"]].details == "Second (Typebot field name)"
+    assert rows[results[1]["id"]].category_status is None
+    assert rows[results[5]["id"]].category_status == CATEGORY_PENDING
+    mock_queue.enqueue_many.assert_called_once_with([(results[5]["id"], "Needs categorization")])
+
+
+def test_bulk_ingest_batches_inserts(client, test_db, monkeypatch):
+    monkeypatch.setattr(grievances, "BULK_INGEST_BATCH_SIZE", 3)
+    body = _ndjson(*({"details": f"Grievance {i}", "category_type": ""} for i in range(10)))
+
+    with patch.object(grievances, "_insert_bulk_batch", wraps=grievances._insert_bulk_batch) as insert_batch:
+        results, summary = _post(client, body)
+
+    assert insert_batch.call_count == 4
+    assert summary["inserted"] == 10
+    assert len({r["id"] for r in results}) == 10
+    assert test_db.query(models.Grievance).count() == 10
+
+
+def test_bulk_ingest_confirmation_emails_opt_in(client, test_db):
+    row = {"details": "Backfilled", "category_type": "", "is_anonymous": False, "complainant_email": "a@example.com"}
+
+    _post(client, _ndjson(row))
+    assert test_db.query(models.EmailOutbox).count() == 0
+
+    results, _ = _post(client, _ndjson(row), send_confirmation_emails="true")
+    outbox = test_db.query(models.EmailOutbox).one()
+    assert outbox.grievance_id == results[0]["id"]
+    assert outbox.to_email == "a@example.com"
+
+
+def test_bulk_ingest_oversized_line(client, test_db, monkeypatch):
+    monkeypatch.setattr(grievances, "MAX_BULK_LINE_BYTES", 64)
+    body = _ndjson({"details": "x" * 200}, {"details": "Fine", "category_type": ""})
+
+    results, summary = _post(client, body)
+    assert results[0] == {"line": 1, "ok": False, "error": "Line too long"}
+    assert results[1]["ok"] is True
+    assert summary["inserted"] == 1
+
+
+def test_bulk_ingest_empty_body(client):
+    results, summary = _post(client, b"")
+    assert results == []
+    assert summary == {"lines": 0, "inserted": 0, "failed": 0}
+
+
+def test_bulk_ingest_more_rows_than_queue_size_all_categorized(client, test_db, monkeypatch):
+    monkeypatch.setattr(grievances, "BULK_INGEST_BATCH_SIZE", 10)
+    release = threading.Event()
+
+    def categorize(details):
+        release.wait(5)  # Hold the workers until the whole body is in, so the queue overflows
+        return {"category": "1", "subcategory": "1.1"}
+
+    queue = CategorizationQueue(workers=1, max_size=5, backoff_base=0, session_factory=TestingSessionLocal,
+                                categorize=categorize)
+    monkeypatch.setattr(grievances, "categorization_queue", queue)
+    queue.start()
+    try:
+        _, summary = _post(client, _ndjson(*({"details": f"Grievance {i}"} for i in range(37))))
+        assert summary["inserted"] == 37
+        assert queue.stats()["rejected"] >= 1
+        release.set()
+        assert queue.wait_idle(timeout=10)
+    finally:
+        queue.stop()
+
+    test_db.expire_all()
+    statuses = [row.category_status for row in test_db.query(models.Grievance).all()]
+    assert statuses == [CATEGORY_DONE] * 37
+
+
+def test_bulk_ingest_streams_results_per_batch(client, monkeypatch):
+    monkeypatch.setattr(grievances, "BULK_INGEST_BATCH_SIZE", 2)
+    chunks = [
+        _ndjson({"details": f"Grievance {i}", "category_type": ""}, {"details": f"Other {i}", "category_type": ""}) + b"\n"
+        for i in range(3)
+    ]
+    events = []
+    body = []
+
+    async def receive():
+        if chunks:
+            events.append("request")
+            return {"type": "http.request", "body": chunks.pop(0), "more_body": bool(chunks)}
+        await asyncio.sleep(3600)  # No disconnect
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            events.append("response")
+            body.append(message["body"])
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/api/grievances/bulk", "raw_path": b"/api/grievances/bulk", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/x-ndjson")], "client": ("test", 1), "server": ("test", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+
+    # Each batch's results go out before the next part of the body is read
+    assert events == ["request", "response"] * 3 + ["response"]  # Then the summary
+    lines = [json.loads(line) for line in b"".join(body).decode().splitlines()]
+    assert [r["line"] for r in lines[:-1]] == [1, 2, 3, 4, 5, 6]
+    assert lines[-1]["summary"] == {"lines": 6, "inserted": 6, "failed": 0}
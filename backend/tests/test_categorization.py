@@ -11,6 +11,11 @@ import json
 from openai import OpenAIError
 
 
+@pytest.fixture(autouse=True)
+def openai_api_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+
 def test_categorize_endpoint_registration_issue(client):
     """Test categorization endpoint with a registration-related grievance"""
     mock_response = MagicMock()
@@ -338,3 +343,71 @@ def test_categorize_with_missing_subcategory_fills_first(client):
         # Should default to first subcategory
         assert data["subcategory"] == "2.1"
         assert data["subcategory_name"] == "HH not registered - not informed"
+
+
+def test_openai_client_is_reused_across_calls(client):
+    """The OpenAI client (and its connection pool) is created once per process"""
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = json.dumps({
+        "category": "1",
+        "subcategory": "1.1",
+        "confidence": "high",
+        "reasoning": "General question."
+    })
+    
+    with patch('app.services.llm_categorizer.OpenAI') as mock_openai, \
+         patch.dict('os.environ', {"OPENAI_API_KEY": "test-key"}):
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = mock_response
+        
+        for details in ("When is the next payment?", "How do I register my household?"):
+            response = client.post("/api/grievances/categorize/", json={"details": details})
+            assert response.status_code == 200
+        
+        assert mock_openai.call_count == 1
+        assert mock_client.chat.completions.create.call_count == 2
+
+
+def test_categorize_grievance_async():
+    """The async variant uses AsyncOpenAI and returns the same result shape"""
+    import asyncio
+    from unittest.mock import AsyncMock
+    from app.services.llm_categorizer import categorize_grievance_async
+    
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = json.dumps({
+        "category": "5",
+        "subcategory": "5.2",
+        "confidence": "high",
+        "reasoning": "Staff ignored the request."
+    })
+    
+    with patch('app.services.llm_categorizer.AsyncOpenAI') as mock_openai, \
+         patch.dict('os.environ', {"OPENAI_API_KEY": "test-key"}):
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        
+        result = asyncio.run(categorize_grievance_async("Nobody answered my request for weeks"))
+    
+    assert result["subcategory"] == "5.2"
+    assert result["subcategory_name"] == "Inaction to requests"
+
+
+def test_async_clients_are_closed_on_their_loop():
+    """Shutdown closes the loop's AsyncOpenAI clients rather than just forgetting them"""
+    import asyncio
+    from app.services.llm_categorizer import aclose_openai_clients, get_async_openai_client
+
+    async def run():
+        client = get_async_openai_client("test-key")
+        await aclose_openai_clients()
+        return client, get_async_openai_client("test-key")
+
+    closed, fresh = asyncio.run(run())
+
+    assert closed.is_closed()
+    assert fresh is not closed
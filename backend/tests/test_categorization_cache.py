@@ -0,0 +1,127 @@
+"""
+Tests for the categorization result cache.
+"""
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.services.categorization_cache import CategorizationCache, categorization_cache
+from app.services.llm_categorizer import CATEGORY_TAXONOMY_VERSION
+
+
+def _mock_openai_response(content):
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = content
+    return mock_response
+
+
+class FakeRedis:
+    """Minimal stand-in for the redis client used by the shared tier"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value.encode("utf-8")
+
+
+def test_preview_then_submission_hits_llm_once(client, monkeypatch):
+    """The Typebot preview and a re-send of the same text share one LLM call"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    content = json.dumps({"category": "2", "subcategory": "2.3", "confidence": "high", "reasoning": "r"})
+
+    with patch("app.services.llm_categorizer.OpenAI") as mock_openai:
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = _mock_openai_response(content)
+
+        first = client.post("/api/grievances/categorize/", json={
+            "details": "My son was not registered in the household."
+        })
+        second = client.post("/api/grievances/categorize/", json={
+            "details": "  my son was NOT registered   in the household. "
+        })
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert first.json() == second.json()
+        assert mock_client.chat.completions.create.call_count == 1
+
+    stats = client.get("/api/grievances/categorize/cache").json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_fallback_results_not_cached(client, monkeypatch):
+    """Unparseable LLM responses fall back to category 7 and are retried next time"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    with patch("app.services.llm_categorizer.OpenAI") as mock_openai:
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = _mock_openai_response("not json")
+
+        for _ in range(2):
+            response = client.post("/api/grievances/categorize/", json={"details": "Some grievance"})
+            assert response.json()["category"] == "7"
+
+        assert mock_client.chat.completions.create.call_count == 2
+    assert categorization_cache.stats()["entries"] == 0
+
+
+def test_key_depends_on_model_and_taxonomy():
+    key = CategorizationCache.make_key("Details", "gpt-4o-mini", CATEGORY_TAXONOMY_VERSION)
+    assert key == CategorizationCache.make_key(" details ", "gpt-4o-mini", CATEGORY_TAXONOMY_VERSION)
+    assert key != CategorizationCache.make_key("Details", "gpt-4o", CATEGORY_TAXONOMY_VERSION)
+    assert key != CategorizationCache.make_key("Details", "gpt-4o-mini", "other-version")
+
+
+def test_lru_eviction():
+    cache = CategorizationCache(max_entries=2, ttl_seconds=60, redis_url="")
+    cache.set("a", {"category": "1"})
+    cache.set("b", {"category": "2"})
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", {"category": "3"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"category": "1"}
+    assert cache.get("c") == {"category": "3"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = CategorizationCache(max_entries=10, ttl_seconds=60, redis_url="")
+    with patch("app.services.categorization_cache.time.monotonic", return_value=1000.0):
+        cache.set("a", {"category": "1"})
+    with patch("app.services.categorization_cache.time.monotonic", return_value=1059.0):
+        assert cache.get("a") == {"category": "1"}
+    with patch("app.services.categorization_cache.time.monotonic", return_value=1061.0):
+        assert cache.get("a") is None
+
+
+def test_shared_tier_between_workers():
+    shared = FakeRedis()
+    worker_a = CategorizationCache(max_entries=10, ttl_seconds=60, redis_client=shared)
+    worker_b = CategorizationCache(max_entries=10, ttl_seconds=60, redis_client=shared)
+
+    worker_a.set("a", {"category": "1"})
+
+    assert worker_b.get("a") == {"category": "1"}
+    assert worker_b.stats()["shared_hits"] == 1
+    # Promoted into the local tier
+    assert worker_b.get("a") == {"category": "1"}
+    assert worker_b.stats()["hits"] == 1
+
+
+def test_shared_tier_errors_are_misses():
+    broken = MagicMock()
+    broken.get.side_effect = ConnectionError("redis down")
+    broken.setex.side_effect = ConnectionError("redis down")
+    cache = CategorizationCache(max_entries=10, ttl_seconds=60, redis_client=broken)
+
+    cache.set("a", {"category": "1"})
+    assert cache.get("missing") is None
+    assert cache.get("a") == {"category": "1"}
@@ -0,0 +1,230 @@
+"""
+Tests for the background categorization queue.
+
+The queue is exercised with a stubbed categorizer so no OpenAI calls are made.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import httpx
+import pytest
+from openai import OpenAI, OpenAIError
+
+from app import models
+from app.services import llm_categorizer
+from app.services.categorization_queue import (
+    CategorizationQueue,
+    CATEGORY_PENDING,
+    CATEGORY_DONE,
+    CATEGORY_FAILED,
+)
+from tests.conftest import TestingSessionLocal
+
+
+REGISTRATION_RESULT = {
+    "category": "2",
+    "subcategory": "2.3",
+    "category_name": "Registration related",
+    "subcategory_name": "HH member not registered",
+    "confidence": "high",
+    "reasoning": "Household member missing from registration.",
+    "source": models.CATEGORY_SOURCE_LLM,
+}
+
+
+def _add_pending(db, gid="GRV-01K88MF7431X7NF9D4GHQN5742", details="My son was not registered"):
+    db.add(models.Grievance(id=gid, details=details, category_status=CATEGORY_PENDING))
+    db.commit()
+    return gid
+
+
+def _run(categorize, gids, **kwargs):
+    q = CategorizationQueue(
+        workers=2, max_size=10, backoff_base=0, session_factory=TestingSessionLocal,
+        categorize=categorize, **kwargs
+    )
+    q.start()
+    try:
+        for gid in gids:
+            q.enqueue(gid, "details")
+        assert q.wait_idle(timeout=5)
+    finally:
+        q.stop()
+    return q
+
+
+def test_create_grievance_marks_pending_and_enqueues(client):
+    """Uncategorized submissions return immediately with a pending category"""
+    with patch("app.routers.grievances.categorization_queue", **{"claim_until.return_value": None}) as mock_queue:
+        response = client.post("/api/grievances/", json={
+            "is_anonymous": True,
+            "details": "My household member was not registered"
+        })
+        assert response.status_code == 201
+
+        data = response.json()
+        assert data["category_type"] is None
+        assert data["category_status"] == CATEGORY_PENDING
+        mock_queue.enqueue.assert_called_once_with(data["id"], "My household member was not registered")
+
+
+def test_create_grievance_with_category_not_enqueued(client):
+    """A provided category (even empty) skips background categorization"""
+    with patch("app.routers.grievances.categorization_queue", **{"claim_until.return_value": None}) as mock_queue:
+        for category in ("Service Delivery", ""):
+            response = client.post("/api/grievances/", json={
+                "details": "Some details",
+                "category_type": category
+            })
+            assert response.status_code == 201
+            assert response.json()["category_status"] is None
+        mock_queue.enqueue.assert_not_called()
+
+
+def test_worker_fills_category(test_db):
+    gid = _add_pending(test_db)
+
+    q = _run(lambda details: REGISTRATION_RESULT, [gid])
+
+    test_db.expire_all()
+    row = test_db.get(models.Grievance, gid)
+    assert row.category_type == "2.3 HH member not registered"
+    assert row.category_status == CATEGORY_DONE
+    assert row.category_source == models.CATEGORY_SOURCE_LLM
+    assert q.stats()["processed"] == 1
+
+
+def test_worker_retries_transient_errors(test_db):
+    gid = _add_pending(test_db)
+    calls = []
+
+    def flaky(details):
+        calls.append(details)
+        if len(calls) == 1:
+            raise OpenAIError("Rate limited")
+        return REGISTRATION_RESULT
+
+    q = _run(flaky, [gid], max_retries=2)
+
+    test_db.expire_all()
+    assert test_db.get(models.Grievance, gid).category_status == CATEGORY_DONE
+    assert len(calls) == 2
+    assert q.stats()["retried"] == 1
+
+
+def test_worker_marks_failed_without_retrying_config_errors(test_db):
+    gid = _add_pending(test_db)
+    calls = []
+
+    def broken(details):
+        calls.append(details)
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+
+    q = _run(broken, [gid], max_retries=3)
+
+    test_db.expire_all()
+    row = test_db.get(models.Grievance, gid)
+    assert row.category_type is None
+    assert row.category_status == CATEGORY_FAILED
+    assert len(calls) == 1
+    assert q.stats()["failed"] == 1
+
+
+def test_worker_keeps_category_set_while_queued(test_db):
+    gid = _add_pending(test_db)
+    row = test_db.get(models.Grievance, gid)
+    row.category_type = "5.3 Discourtesy or poor service"
+    test_db.commit()
+
+    _run(lambda details: REGISTRATION_RESULT, [gid])
+
+    test_db.expire_all()
+    assert test_db.get(models.Grievance, gid).category_type == "5.3 Discourtesy or poor service"
+
+
+def test_start_recovers_pending_rows(test_db):
+    gid = _add_pending(test_db)
+
+    q = CategorizationQueue(
+        workers=1, max_size=10, backoff_base=0, session_factory=TestingSessionLocal,
+        categorize=lambda details: REGISTRATION_RESULT
+    )
+    q.start()
+    try:
+        assert q.wait_idle(timeout=5)
+    finally:
+        q.stop()
+
+    test_db.expire_all()
+    assert test_db.get(models.Grievance, gid).category_status == CATEGORY_DONE
+
+
+def test_enqueue_rejected_when_not_running():
+    q = CategorizationQueue(workers=0, session_factory=TestingSessionLocal)
+    assert q.enqueue("GRV-01K88MF7431X7NF9D4GHQN5742", "details") is False
+
+
+def test_queue_stats_endpoint(client):
+    response = client.get("/api/grievances/categorize/queue")
+    assert response.status_code == 200
+
+    data = response.json()
+    for key in ("queue_depth", "in_flight", "processed", "failed", "retried", "throughput_per_minute"):
+        assert key in data
+
+
+def test_sweep_claims_only_unleased_rows(test_db):
+    """Rows leased to another worker process are left to it until the lease expires"""
+    now = datetime.now(timezone.utc)
+    free = _add_pending(test_db, gid="GRV-01K88MF7431X7NF9D4GHQN5741")
+    expired = _add_pending(test_db, gid="GRV-01K88MF7431X7NF9D4GHQN5742")
+    leased = _add_pending(test_db, gid="GRV-01K88MF7431X7NF9D4GHQN5743")
+    test_db.get(models.Grievance, expired).category_claimed_until = now - timedelta(seconds=1)
+    test_db.get(models.Grievance, leased).category_claimed_until = now + timedelta(minutes=5)
+    test_db.commit()
+    change_seq = test_db.get(models.Grievance, leased).change_seq
+
+    q = _run(lambda details: REGISTRATION_RESULT, [])
+
+    test_db.expire_all()
+    for gid in (free, expired):
+        row = test_db.get(models.Grievance, gid)
+        assert (row.category_status, row.category_claimed_until) == (CATEGORY_DONE, None)
+    row = test_db.get(models.Grievance, leased)
+    assert row.category_status == CATEGORY_PENDING
+    assert row.change_seq == change_seq
+    assert q.stats()["processed"] == 2
+
+
+def test_rows_that_do_not_fit_are_released(test_db):
+    gids = [_add_pending(test_db, gid=f"GRV-01K88MF7431X7NF9D4GHQN574{i}") for i in range(3)]
+    lease = datetime.now(timezone.utc) + timedelta(minutes=5)
+    for gid in gids:
+        test_db.get(models.Grievance, gid).category_claimed_until = lease
+    test_db.commit()
+
+    q = CategorizationQueue(workers=1, max_size=1, session_factory=TestingSessionLocal)
+    q._threads = [None]  # Running, but nothing drains the queue
+    assert q.enqueue_many([(gid, "details") for gid in gids]) == 1
+
+    test_db.expire_all()
+    assert [test_db.get(models.Grievance, gid).category_claimed_until is None for gid in gids] == [False, True, True]
+
+
+def test_queue_calls_skip_client_retries(monkeypatch):
+    """The queue retries with its own backoff, so each attempt is a single HTTP request"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(500, json={"error": {"message": "boom"}})
+
+    client = OpenAI(api_key="test-key", max_retries=2, http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(llm_categorizer, "get_openai_client", lambda api_key: client)
+    monkeypatch.setattr(llm_categorizer.local_classifier, "predict", lambda details: None)
+
+    q = CategorizationQueue(workers=0, session_factory=TestingSessionLocal)
+    with pytest.raises(OpenAIError):
+        q._categorize("Queue retry budget check")
+    assert len(requests) == 1
@@ -0,0 +1,115 @@
+"""
+Tests for the incremental change feed used by Odoo synchronization.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+
+from app import models
+from app.routers import grievances
+
+
+@pytest.fixture(autouse=True)
+def no_settle_delay(monkeypatch):
+    monkeypatch.setattr(grievances, "CHANGE_FEED_SETTLE_SECONDS", 0)
+
+
+def _create(client, details):
+    return client.post("/api/grievances/", json={"details": details, "category_type": ""}).json()["id"]
+
+
+def _poll(client, **params):
+    response = client.get("/api/grievances/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_feed_returns_only_new_changes(client):
+    first = _create(client, "First")
+    second = _create(client, "Second")
+
+    page = _poll(client)
+    assert [item["id"] for item in page["items"]] == [first, second]
+    assert page["has_more"] is False
+
+    # Nothing changed: empty page, cursor kept
+    again = _poll(client, cursor=page["next_cursor"])
+    assert again["items"] == []
+    assert again["next_cursor"] == page["next_cursor"]
+
+    # An update moves the grievance to the end of the feed
+    client.put(f"/api/grievances/{first}/status", json={"external_status": "In Progress"})
+    third = _create(client, "Third")
+    changes = _poll(client, cursor=page["next_cursor"])
+    assert [item["id"] for item in changes["items"]] == [first, third]
+    assert changes["items"][0]["external_status"] == "In Progress"
+
+
+def test_feed_pages_are_bounded(client):
+    ids = [_create(client, f"Grievance {i}") for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        page = _poll(client, limit=2, **({"cursor": cursor} if cursor else {}))
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        assert len(page["items"]) <= 2
+        if not page["has_more"]:
+            break
+    assert seen == ids
+
+
+def test_rows_sharing_a_sequence_number_are_not_skipped(client, test_db):
+    """A multi-row UPDATE gives every row the same change_seq; the id tie-breaker pages through them"""
+    ids = [_create(client, f"Grievance {i}") for i in range(3)]
+    page = _poll(client)
+    test_db.query(models.Grievance).update({"island": "Tongatapu"})
+    test_db.commit()
+
+    first = _poll(client, cursor=page["next_cursor"], limit=2)
+    rest = _poll(client, cursor=first["next_cursor"], limit=2)
+    assert [item["id"] for item in first["items"] + rest["items"]] == ids
+
+
+def test_since_starts_feed_at_updated_at(client, test_db):
+    old = _create(client, "Old")
+    test_db.query(models.Grievance).filter_by(id=old).update(
+        {"updated_at": datetime.now(timezone.utc) - timedelta(days=2)}
+    )
+    test_db.commit()
+    recent = _create(client, "Recent")
+
+    since = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    page = _poll(client, since=since)
+    assert [item["id"] for item in page["items"]] == [recent]
+
+
+def test_unsettled_changes_held_back(client, monkeypatch):
+    _create(client, "Just now")
+    monkeypatch.setattr(grievances, "CHANGE_FEED_SETTLE_SECONDS", 60)
+    page = _poll(client)
+    assert page["items"] == []
+    assert page["has_more"] is False
+
+
+@pytest.mark.parametrize("configured,statement_timeout_ms,expected", [
+    (None, 0, 2.0),
+    ("0.5", 0, 0.5),
+    (None, 5000, 15.0),  # A transaction may still be inside its last few statements
+    ("30", 5000, 30.0),
+    ("1", 5000, 15.0),
+])
+def test_settle_window_covers_statement_timeout(configured, statement_timeout_ms, expected):
+    assert grievances._change_feed_settle_seconds(configured, statement_timeout_ms) == expected
+
+
+def test_invalid_cursor_rejected(client):
+    response = client.get("/api/grievances/changes", params={"cursor": "garbage"})
+    assert response.status_code == 400
+
+
+def test_postgresql_uses_sequence():
+    statement = insert(models.Grievance).values(id="GRV-X")
+    assert "nextval('grievance_change_seq')" in str(statement.compile(dialect=postgresql.dialect()))
@@ -0,0 +1,85 @@
+"""
+Tests for the pure-ASGI CORS middleware.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.cors import CORSMiddleware
+
+
+def _client(**kwargs):
+    app = FastAPI()
+
+    @app.get("/thing")
+    def thing():
+        return {"ok": True}
+
+    app.add_middleware(CORSMiddleware, **kwargs)
+    return TestClient(app)
+
+
+PREFLIGHT = {"Access-Control-Request-Method": "POST", "Access-Control-Request-Headers": "content-type"}
+
+
+def test_default_allows_any_origin(client):
+    response = client.get("/", headers={"Origin": "https://typebot.example.org"})
+    assert response.headers["access-control-allow-origin"] == "*"
+    assert response.headers["access-control-expose-headers"] == "X-Grievance-ID"
+
+
+def test_preflight_answered_and_cacheable(client):
+    response = client.options("/api/grievances/", headers={"Origin": "null", **PREFLIGHT})
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == "*"
+    assert "POST" in response.headers["access-control-allow-methods"]
+    assert int(response.headers["access-control-max-age"]) > 0
+
+
+def test_allowlist_reflects_allowed_origins():
+    client = _client(allow_origins=["https://forms.example.org", "null"], max_age=600)
+
+    response = client.get("/thing", headers={"Origin": "https://forms.example.org"})
+    assert response.headers["access-control-allow-origin"] == "https://forms.example.org"
+    assert response.headers["vary"] == "Origin"
+
+    # Pages opened from file:// send the opaque "null" origin
+    response = client.options("/thing", headers={"Origin": "null", **PREFLIGHT})
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == "null"
+    assert response.headers["access-control-max-age"] == "600"
+    assert response.headers["vary"] == "Origin"
+
+
+def test_allowlist_rejects_other_origins():
+    client = _client(allow_origins=["https://forms.example.org"])
+
+    response = client.options("/thing", headers={"Origin": "https://evil.example.com", **PREFLIGHT})
+    assert response.status_code == 400
+    assert "access-control-allow-origin" not in response.headers
+
+    response = client.get("/thing", headers={"Origin": "null"})
+    assert response.status_code == 200
+    assert "access-control-allow-origin" not in response.headers
+    assert response.headers["vary"] == "Origin"
+
+
+def test_requests_without_origin_untouched():
+    client = _client(allow_origins=["https://forms.example.org"])
+    response = client.get("/thing")
+    assert response.json() == {"ok": True}
+    assert "access-control-allow-origin" not in response.headers
+
+
+def test_plain_options_passes_through():
+    """OPTIONS without Access-Control-Request-Method is not a preflight"""
+    client = _client(allow_origins=["*"])
+    response = client.options("/thing", headers={"Origin": "null"})
+    assert response.status_code == 405
+
+
+@pytest.mark.parametrize("origins,expected", [("null", "null"), ("*", "*")])
+def test_origins_from_env(monkeypatch, origins, expected):
+    monkeypatch.setenv("CORS_ALLOWED_ORIGINS", origins)
+    response = _client().get("/thing", headers={"Origin": "null"})
+    assert response.headers["access-control-allow-origin"] == expected
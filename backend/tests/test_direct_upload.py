@@ -0,0 +1,104 @@
+"""
+Tests for pre-signed direct-to-storage uploads.
+"""
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from app.services import direct_upload
+from app.utils.minio import minio_client
+
+
+def _ticket(client, content=b"jpeg-bytes", content_type="image/jpeg", name="photo.jpg"):
+    response = client.post(
+        "/api/grievances/upload-url", json={"filename": name, "content_type": content_type, "size": len(content)}
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_presigned_upload_round_trip(client, fake_s3):
+    ticket = _ticket(client)
+    url = urlsplit(ticket["upload_url"])
+    assert f"{url.scheme}://{url.netloc}" == fake_s3.endpoint
+    assert url.path == f"/{minio_client.bucket_name}/{ticket['key']}"
+    assert "X-Amz-Signature" in parse_qs(url.query)
+    assert ticket["method"] == "PUT"
+    assert ticket["expires_at"] > time.time()
+
+    put = requests.put(ticket["upload_url"], data=b"jpeg-bytes", headers=ticket["headers"])
+    assert put.status_code == 200
+
+    response = client.post("/api/grievances/upload-complete", json={"ticket": ticket["ticket"]})
+    assert response.status_code == 201
+    assert response.json() == {
+        "name": "photo.jpg",
+        "url": f"{fake_s3.endpoint}/{minio_client.bucket_name}/{ticket['key']}",
+        "size": 10,
+        "type": "image/jpeg",
+        "key": ticket["key"],
+    }
+
+
+def test_request_validated_before_signing(client, fake_s3):
+    response = client.post("/api/grievances/upload-url", json={"filename": "a.sh", "content_type": "text/x-sh", "size": 1})
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/grievances/upload-url", json={"filename": "a.pdf", "content_type": "application/pdf", "size": 11 * 1024 * 1024}
+    )
+    assert response.status_code == 413
+
+
+def test_mismatched_upload_is_deleted(client, fake_s3):
+    ticket = _ticket(client, content=b"small")
+    requests.put(ticket["upload_url"], data=b"a much larger body", headers=ticket["headers"])
+
+    response = client.post("/api/grievances/upload-complete", json={"ticket": ticket["ticket"]})
+    assert response.status_code == 400
+    assert "size" in response.json()["detail"]
+    assert ticket["key"] not in fake_s3.objects
+
+    ticket = _ticket(client)
+    requests.put(ticket["upload_url"], data=b"jpeg-bytes", headers={"Content-Type": "text/html"})
+    response = client.post("/api/grievances/upload-complete", json={"ticket": ticket["ticket"]})
+    assert response.status_code == 400
+    assert ticket["key"] not in fake_s3.objects
+
+
+def test_oversized_upload_is_deleted(client, fake_s3, monkeypatch):
+    from app.routers import grievances
+    ticket = _ticket(client, content=b"x" * 100)
+    requests.put(ticket["upload_url"], data=b"x" * 100, headers=ticket["headers"])
+    monkeypatch.setattr(grievances, "MAX_UPLOAD_SIZE", 50)
+
+    response = client.post("/api/grievances/upload-complete", json={"ticket": ticket["ticket"]})
+    assert response.status_code == 413
+    assert fake_s3.objects == {}
+
+
+def test_missing_object_and_bad_tickets(client, fake_s3, monkeypatch):
+    ticket = _ticket(client)
+    response = client.post("/api/grievances/upload-complete", json={"ticket": ticket["ticket"]})
+    assert response.status_code == 404
+
+    payload, _, signature = ticket["ticket"].partition(".")
+    forged = f"{payload}.{'0' * len(signature)}"
+    assert client.post("/api/grievances/upload-complete", json={"ticket": forged}).status_code == 400
+    assert client.post("/api/grievances/upload-complete", json={"ticket": "garbage"}).status_code == 400
+
+    monkeypatch.setattr(direct_upload, "COMPLETE_GRACE_SECONDS", -direct_upload.UPLOAD_URL_EXPIRY_SECONDS - 1)
+    response = client.post("/api/grievances/upload-complete", json={"ticket": ticket["ticket"]})
+    assert response.status_code == 400
+    assert "expired" in response.json()["detail"]
+
+
+def test_unconfigured_credentials(client, monkeypatch):
+    monkeypatch.setattr(minio_client, "access_key", "")
+    monkeypatch.setattr(minio_client, "secret_key", "")
+    monkeypatch.delenv("UPLOAD_TOKEN_SECRET", raising=False)
+
+    response = client.post("/api/grievances/upload-url", json={"filename": "a.jpg", "content_type": "image/jpeg", "size": 1})
+    assert response.status_code == 503
+    assert client.post("/api/grievances/upload-complete", json={"ticket": "a.b"}).status_code == 503
@@ -9,7 +9,7 @@ from app.utils.email import send_grievance_confirmation_email, get_smtp_config
 
 def test_email_sent_for_non_anonymous_grievance(client):
     """Test that email is sent when a non-anonymous grievance is created"""
-    with patch("app.routers.grievances.send_grievance_confirmation_email") as mock_email:
+    with patch("app.routers.grievances.queue_grievance_confirmation_email") as mock_email:
         mock_email.return_value = True
         
         payload = {
@@ -36,7 +36,7 @@ def test_email_sent_for_non_anonymous_grievance(client):
 
 def test_no_email_sent_for_anonymous_grievance(client):
     """Test that no email is sent for anonymous grievances"""
-    with patch("app.routers.grievances.send_grievance_confirmation_email") as mock_email:
+    with patch("app.routers.grievances.queue_grievance_confirmation_email") as mock_email:
         payload = {
             "is_anonymous": True,
             "grievance_details": "Anonymous grievance - no email should be sent"
@@ -51,7 +51,7 @@ def test_no_email_sent_for_anonymous_grievance(client):
 
 def test_no_email_sent_when_email_not_provided(client):
     """Test that no email is sent when complainant email is not provided"""
-    with patch("app.routers.grievances.send_grievance_confirmation_email") as mock_email:
+    with patch("app.routers.grievances.queue_grievance_confirmation_email") as mock_email:
         payload = {
             "is_anonymous": False,
             "complainant_name": "Jane Smith",
@@ -151,7 +151,7 @@ def test_get_smtp_config_from_env():
 
 def test_email_continues_after_failure(client):
     """Test that grievance creation succeeds even if email fails"""
-    with patch("app.routers.grievances.send_grievance_confirmation_email") as mock_email:
+    with patch("app.routers.grievances.queue_grievance_confirmation_email") as mock_email:
         # Simulate email sending failure
         mock_email.return_value = False
         
@@ -223,7 +223,7 @@ def test_email_includes_complainant_name_in_greeting():
 
 def test_multiple_non_anonymous_submissions_send_separate_emails(client):
     """Test that multiple non-anonymous grievances each trigger separate emails"""
-    with patch("app.routers.grievances.send_grievance_confirmation_email") as mock_email:
+    with patch("app.routers.grievances.queue_grievance_confirmation_email") as mock_email:
         mock_email.return_value = True
         
         # First grievance
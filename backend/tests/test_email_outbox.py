@@ -0,0 +1,211 @@
+"""
+Tests for the email outbox and its background sender.
+
+A minimal in-process SMTP server records connections and messages so the
+sender is exercised over real sockets without an external mail server.
+"""
+import socketserver
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import models
+from app.services.email_outbox import (
+    EmailOutboxSender,
+    EMAIL_PENDING,
+    EMAIL_SENT,
+    EMAIL_FAILED,
+    queue_grievance_confirmation_email,
+)
+from tests.conftest import TestingSessionLocal
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self._reply("220 stub ESMTP")
+        rcpt = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 stub")
+            elif verb == "MAIL":
+                rcpt = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address in server.reject:
+                    self._reply("550 No such user")
+                else:
+                    rcpt.append(address)
+                    self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with server.lock:
+                    server.messages.extend(rcpt)
+                self._reply("250 Queued")
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Not implemented")
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.reject = set()
+
+
+@pytest.fixture
+def smtp_server():
+    server = StubSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _config(port):
+    return {
+        "host": "127.0.0.1",
+        "port": port,
+        "username": "",
+        "password": "",
+        "from_email": "noreply@grievance.local",
+        "use_tls": False,
+        "timeout": 5.0,
+    }
+
+
+def _sender(port, **kwargs):
+    kwargs.setdefault("backoff_base", 0)
+    return EmailOutboxSender(
+        enabled=True, session_factory=TestingSessionLocal, smtp_config=lambda: _config(port), **kwargs
+    )
+
+
+def _queue(db, count, prefix="user"):
+    for i in range(count):
+        queue_grievance_confirmation_email(
+            db, to_email=f"{prefix}{i}@example.com", grievance_id=f"GRV-{i:026d}", complainant_name="Jane"
+        )
+    db.commit()
+
+
+def test_submission_queues_email_in_outbox(client, test_db):
+    response = client.post("/api/grievances/", json={
+        "is_anonymous": False,
+        "complainant_name": "Jane Doe",
+        "complainant_email": "jane@example.com",
+        "grievance_details": "Test grievance",
+        "category_type": "",
+    })
+    assert response.status_code == 201
+    gid = response.json()["id"]
+
+    rows = test_db.query(models.EmailOutbox).all()
+    assert len(rows) == 1
+    assert rows[0].grievance_id == gid
+    assert rows[0].to_email == "jane@example.com"
+    assert rows[0].status == EMAIL_PENDING
+    assert gid in rows[0].subject
+    assert "Dear Jane Doe," in rows[0].text_body
+
+
+def test_batch_sent_over_one_connection(test_db, smtp_server):
+    _queue(test_db, 5)
+    sender = _sender(smtp_server.server_address[1])
+    try:
+        assert sender.send_pending() == 5
+        assert sender.send_pending() == 0
+    finally:
+        sender.stop()
+
+    assert smtp_server.connections == 1
+    assert sorted(smtp_server.messages) == sorted(f"user{i}@example.com" for i in range(5))
+
+    test_db.expire_all()
+    rows = test_db.query(models.EmailOutbox).all()
+    assert all(row.status == EMAIL_SENT and row.sent_at is not None for row in rows)
+    assert all(row.attempts == 1 for row in rows)
+    assert sender.stats()["sent"] == 5
+
+
+def test_connection_reused_across_batches(test_db, smtp_server):
+    sender = _sender(smtp_server.server_address[1], batch_size=2)
+    _queue(test_db, 3)
+    assert sender.send_pending() == 2
+    assert sender.send_pending() == 1
+    _queue(test_db, 1, prefix="later")
+    assert sender.send_pending() == 1
+    sender._disconnect()
+
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == 4
+
+
+def test_rejected_recipient_retried_then_failed(test_db, smtp_server):
+    smtp_server.reject.add("user0@example.com")
+    _queue(test_db, 2)
+    sender = _sender(smtp_server.server_address[1], max_attempts=2)
+
+    assert sender.send_pending() == 2
+    test_db.expire_all()
+    rejected = test_db.query(models.EmailOutbox).filter_by(to_email="user0@example.com").one()
+    assert rejected.status == EMAIL_PENDING
+    assert rejected.attempts == 1
+    assert "No such user" in rejected.last_error
+
+    assert sender.send_pending() == 1
+    sender._disconnect()
+    test_db.expire_all()
+    rejected = test_db.query(models.EmailOutbox).filter_by(to_email="user0@example.com").one()
+    assert rejected.status == EMAIL_FAILED
+    assert rejected.attempts == 2
+    # The other recipient went out on the first pass over the same connection
+    assert smtp_server.messages == ["user1@example.com"]
+    assert smtp_server.connections == 1
+
+
+def test_unreachable_server_backs_off(test_db, smtp_server):
+    port = smtp_server.server_address[1]
+    smtp_server.shutdown()
+    smtp_server.server_close()
+    _queue(test_db, 3)
+    sender = _sender(port, backoff_base=60)
+
+    before = datetime.now(timezone.utc)
+    assert sender.send_pending() == 3
+    # Nothing is due until the backoff expires
+    assert sender.send_pending() == 0
+
+    test_db.expire_all()
+    rows = test_db.query(models.EmailOutbox).all()
+    assert all(row.status == EMAIL_PENDING and row.attempts == 1 for row in rows)
+    assert all("connection failed" in row.last_error for row in rows)
+    for row in rows:
+        retry_at = row.next_attempt_at.replace(tzinfo=row.next_attempt_at.tzinfo or timezone.utc)
+        assert retry_at >= before + timedelta(seconds=59)
+    assert sender.stats()["retried"] == 3
@@ -0,0 +1,104 @@
+"""
+Tests for the streaming, keyset-paginated export.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from app import models
+
+
+def _seed(db, count=7):
+    """Rows newest first by id; pairs share a created_at so the id tie-breaker is exercised"""
+    base = datetime.now(timezone.utc) - timedelta(hours=1)
+    for i in range(count):
+        db.add(models.Grievance(
+            id=f"GRV-{i:026d}",
+            created_at=base + timedelta(seconds=i // 2),
+            details=f"Grievance {i}",
+            attachments=[{"url": f"https://files.example.org/{i}.jpg"}] if i == 0 else None,
+        ))
+    db.commit()
+    return [f"GRV-{i:026d}" for i in reversed(range(count))]
+
+
+def test_export_json_is_streamed_array(client, test_db):
+    expected = _seed(test_db)
+    response = client.get("/api/grievances/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/json")
+    assert [item["id"] for item in response.json()] == expected
+    assert "x-next-cursor" not in response.headers
+
+
+def test_export_empty_window(client):
+    assert client.get("/api/grievances/export").json() == []
+
+
+def test_keyset_pages_cover_every_row_once(client, test_db):
+    expected = _seed(test_db)
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/grievances/export", params=params)
+        assert response.status_code == 200
+        seen.extend(item["id"] for item in response.json())
+        pages += 1
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert seen == expected
+    assert pages == 4
+
+
+def test_exact_page_has_no_next_cursor(client, test_db):
+    _seed(test_db, count=4)
+    response = client.get("/api/grievances/export", params={"limit": 4})
+    assert len(response.json()) == 4
+    assert "x-next-cursor" not in response.headers
+
+
+def test_export_ndjson(client, test_db):
+    expected = _seed(test_db, count=3)
+    response = client.get("/api/grievances/export", params={"format": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == expected
+
+
+def test_export_csv(client, test_db):
+    expected = _seed(test_db, count=3)
+    response = client.get("/api/grievances/export", params={"format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["id"] for row in rows] == expected
+    assert json.loads(rows[-1]["attachments"])[0]["url"] == "https://files.example.org/0.jpg"
+
+
+def test_invalid_cursor_rejected(client):
+    response = client.get("/api/grievances/export", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_invalid_format_rejected(client):
+    response = client.get("/api/grievances/export", params={"format": "xml"})
+    assert response.status_code == 422
+
+
+def test_export_spanning_several_chunks(client, test_db, monkeypatch):
+    from app.routers import grievances
+
+    monkeypatch.setattr(grievances, "EXPORT_BATCH_SIZE", 2)
+    expected = _seed(test_db, count=5)
+
+    assert [item["id"] for item in client.get("/api/grievances/export").json()] == expected
+    ndjson = client.get("/api/grievances/export", params={"format": "ndjson"}).text
+    assert [json.loads(line)["id"] for line in ndjson.splitlines()] == expected
+    rows = csv.DictReader(io.StringIO(client.get("/api/grievances/export", params={"format": "csv"}).text))
+    assert [row["id"] for row in rows] == expected
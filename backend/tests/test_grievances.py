@@ -541,3 +541,25 @@ def test_update_grievance_multiple_fields(client):
     assert data["district"] == "West"
     assert data["village"] == "Kariatebike"
 
+
+
+def test_create_grievance_single_round_trip(client):
+    """The insert returns the stored row; no refresh or verification SELECT follows"""
+    from sqlalchemy import event
+    from tests.conftest import engine
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/api/grievances/", json={"details": "Round trips", "category_type": ""})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created_at"] and data["updated_at"]
+    assert statements == ["INSERT"]
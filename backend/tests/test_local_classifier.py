@@ -0,0 +1,169 @@
+"""
+Tests for the local first-pass classifier in front of the LLM.
+"""
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from openai import OpenAIError
+
+from app import models
+from app.services.local_classifier import LocalClassifier, evaluate, load_labeled_examples, local_classifier
+from app.services.llm_categorizer import categorize_grievance
+from tests.conftest import TestingSessionLocal
+
+
+REGISTRATION = "2.3 HH member not registered"
+DISCOURTESY = "5.3 Discourtesy or poor service"
+INQUIRY = "1.1 Inquiries"
+
+TRAINING = (
+    [(f"my {who} was not registered in the household list", REGISTRATION)
+     for who in ("son", "daughter", "wife", "husband", "mother", "father", "grandson", "niece")]
+    + [(f"the {who} officer was rude and shouted at me", DISCOURTESY)
+       for who in ("registration", "payment", "district", "island", "field", "village", "office", "program")]
+    + [(f"when will the {what} be paid question", INQUIRY)
+       for what in ("benefit", "allowance", "grant", "money", "cash", "support", "pension", "transfer")]
+)
+
+
+@pytest.fixture
+def trained_classifier():
+    """Train the global classifier for a test and reset it afterwards"""
+    original = (local_classifier.min_examples, local_classifier.enabled)
+    local_classifier.min_examples, local_classifier.enabled = 10, True
+    local_classifier.train(TRAINING)
+    yield local_classifier
+    local_classifier.train([])
+    local_classifier.min_examples, local_classifier.enabled = original
+    local_classifier.local_answers = local_classifier.escalations = local_classifier.fallbacks = 0
+
+
+def test_untrained_classifier_defers_to_llm():
+    classifier = LocalClassifier(min_examples=50, enabled=True)
+    assert classifier.train(TRAINING) == 0  # Too few examples to trust
+    assert classifier.classify("my son was not registered") is None
+
+
+def test_confident_prediction():
+    classifier = LocalClassifier(threshold=0.9, min_examples=10, enabled=True)
+    classifier.train(TRAINING)
+
+    result = classifier.classify("My nephew was not registered in our household")
+    assert result["subcategory"] == "2.3"
+    assert result["subcategory_name"] == "HH member not registered"
+    assert result["confidence"] == "high"
+
+
+def test_unknown_labels_ignored():
+    classifier = LocalClassifier(min_examples=1, min_class_examples=1, enabled=True)
+    assert classifier.train([("some text", "Service Delivery")]) == 0
+
+
+def test_local_answer_skips_llm(trained_classifier):
+    with patch("app.services.llm_categorizer.OpenAI") as mock_openai, \
+         patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        result = categorize_grievance("The payment officer was rude and shouted at my mother")
+
+    mock_openai.assert_not_called()
+    assert result["subcategory"] == "5.3"
+    assert trained_classifier.stats()["local_answers"] == 1
+
+
+def test_low_confidence_escalates_to_llm(trained_classifier):
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = json.dumps({
+        "category": "6", "subcategory": "6.2", "confidence": "high", "reasoning": "r"
+    })
+
+    with patch("app.services.llm_categorizer.OpenAI") as mock_openai, \
+         patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = mock_response
+
+        result = categorize_grievance("Someone made unwanted comments")
+
+    assert result["subcategory"] == "6.2"
+    assert trained_classifier.stats()["escalations"] == 1
+
+
+def test_falls_back_to_local_guess_when_llm_unreachable(trained_classifier):
+    with patch("app.services.llm_categorizer.OpenAI") as mock_openai, \
+         patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = OpenAIError("Connection error")
+
+        result = categorize_grievance("question about the registration officer")
+
+    assert result["category"] in ("1", "2", "5")
+    assert trained_classifier.stats()["fallbacks"] == 1
+
+
+def test_retrain_endpoint_uses_categorized_rows(client, test_db):
+    test_db.add_all([
+        models.Grievance(id=f"GRV-{i:026d}", details=text, category_type=label)
+        for i, (text, label) in enumerate(TRAINING)
+    ])
+    test_db.commit()
+
+    original = local_classifier.min_examples
+    local_classifier.min_examples = 10
+    try:
+        response = client.post("/api/grievances/categorize/local-model/train")
+    finally:
+        local_classifier.min_examples = original
+        local_classifier.train([])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["trained"] is True
+    assert data["training_examples"] == len(TRAINING)
+    assert data["classes"] == 3
+
+
+def test_training_uses_trusted_labels_only(test_db):
+    sources = [models.CATEGORY_SOURCE_STAFF, models.CATEGORY_SOURCE_LLM, None,
+               models.CATEGORY_SOURCE_LOCAL, models.CATEGORY_SOURCE_FALLBACK, models.CATEGORY_SOURCE_SUBMITTER]
+    test_db.add_all([
+        models.Grievance(id=f"GRV-{i:026d}", details=f"Text {i}", category_type=REGISTRATION, category_source=source)
+        for i, source in enumerate(sources)
+    ])
+    # Auto-categorized before the source was recorded: possibly the classifier's own answer
+    test_db.add(models.Grievance(
+        id=f"GRV-{99:026d}", details="Text 99", category_type=REGISTRATION, category_version="v1"
+    ))
+    test_db.commit()
+
+    examples = load_labeled_examples(test_db)
+
+    assert sorted(text for text, _ in examples) == ["Text 0", "Text 1", "Text 2"]
+
+
+def test_local_results_are_marked_as_local(trained_classifier):
+    result = trained_classifier.fallback("my son was not registered")
+    assert result["source"] == models.CATEGORY_SOURCE_LOCAL
+
+
+def test_background_training(test_db):
+    test_db.add_all([
+        models.Grievance(id=f"GRV-{i:026d}", details=text, category_type=label, category_source="staff")
+        for i, (text, label) in enumerate(TRAINING)
+    ])
+    test_db.commit()
+
+    classifier = LocalClassifier(min_examples=10, enabled=True)
+    thread = classifier.train_in_background(TestingSessionLocal)
+    thread.join(5)
+
+    assert classifier.trained
+    assert classifier.stats()["training_examples"] == len(TRAINING)
+
+
+def test_evaluation_harness_reports_accuracy_and_escalation():
+    report = evaluate(TRAINING * 3, threshold=0.9, test_fraction=0.25)
+
+    assert report["test_examples"] == 18
+    assert 0.0 <= report["escalation_rate"] <= 1.0
+    assert report["accuracy_best_guess"] > 0.9
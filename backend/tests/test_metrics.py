@@ -0,0 +1,124 @@
+"""
+Tests for the Prometheus-style metrics registry, middleware and /metrics endpoint.
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.middleware.metrics import UNMATCHED_ROUTE, MetricsMiddleware
+from app.services import metrics
+from app.services.metrics import Counter, Histogram, Registry
+from app.utils.email import send_smtp_message
+from app.utils.minio import MinIOClient
+from tests.conftest import engine as test_engine
+
+
+@pytest.fixture
+def query_metrics():
+    """Attribute queries on the test engine to requests, like the app engine"""
+    metrics.install_query_metrics(test_engine)
+    yield
+    event.remove(test_engine, "before_cursor_execute", metrics._before_cursor_execute)
+    event.remove(test_engine, "after_cursor_execute", metrics._after_cursor_execute)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.register(Histogram("op_seconds", "Op latency", ("outcome",), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, "ok")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP op_seconds Op latency", "# TYPE op_seconds histogram"]
+    assert 'op_seconds_bucket{outcome="ok",le="0.1"} 1' in lines
+    assert 'op_seconds_bucket{outcome="ok",le="1"} 3' in lines
+    assert 'op_seconds_bucket{outcome="ok",le="+Inf"} 4' in lines
+    assert 'op_seconds_sum{outcome="ok"} 4.05' in lines
+    assert 'op_seconds_count{outcome="ok"} 4' in lines
+
+
+def test_label_values_are_escaped_and_checked():
+    registry = Registry()
+    counter = registry.register(Counter("things_total", "Things", ("name",)))
+    counter.inc(2, 'say "hi"\n')
+    assert 'things_total{name="say \\"hi\\"\\n"} 2' in registry.render()
+
+    with pytest.raises(ValueError):
+        counter.inc(1, "a", "b")
+
+
+def test_requests_recorded_per_route_template(client, query_metrics):
+    gid = client.post("/api/grievances/", json={"category_type": "Test", "details": "Metrics"}).json()["id"]
+    route = "/api/grievances/{gid}"
+    before = metrics.http_request_duration.count("GET", route, "200")
+    queries_before = metrics.http_request_db_queries.sum(route)
+
+    assert client.get(f"/api/grievances/{gid}").status_code == 200
+    assert client.get(f"/api/grievances/{gid}").status_code == 200
+
+    assert metrics.http_request_duration.count("GET", route, "200") == before + 2
+    assert metrics.http_request_db_queries.sum(route) >= queries_before + 2
+
+    body = client.get("/metrics")
+    assert body.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/grievances/{gid}",status="200"}' in body.text
+    assert gid not in body.text  # Raw paths never become label values
+    assert "http_requests_in_flight 1" in body.text  # The /metrics request itself
+
+
+def test_in_flight_and_unmatched_routes():
+    app = FastAPI()
+
+    @app.get("/busy")
+    def busy():
+        return {"in_flight": metrics.http_requests_in_flight.value()}
+
+    client = TestClient(MetricsMiddleware(app, enabled=True))
+    baseline = metrics.http_requests_in_flight.value()
+    assert client.get("/busy").json() == {"in_flight": baseline + 1}
+    assert metrics.http_requests_in_flight.value() == baseline
+
+    before = metrics.http_request_duration.count("GET", UNMATCHED_ROUTE, "404")
+    client.get("/no/such/path/123")
+    assert metrics.http_request_duration.count("GET", UNMATCHED_ROUTE, "404") == before + 1
+
+
+def test_llm_outcomes_recorded(client, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "Invalid JSON{{{}"
+    before = metrics.llm_request_duration.count("invalid_response")
+
+    with patch("app.services.llm_categorizer.OpenAI") as mock_openai:
+        mock_openai.return_value.chat.completions.create.return_value = response
+        client.post("/api/grievances/categorize/", json={"details": "Metrics for the LLM call"})
+
+    assert metrics.llm_request_duration.count("invalid_response") == before + 1
+
+
+def test_smtp_send_latency_recorded():
+    ok_before = metrics.smtp_send_duration.count("ok")
+    error_before = metrics.smtp_send_duration.count("error")
+
+    send_smtp_message(MagicMock(), MagicMock())
+    failing = MagicMock()
+    failing.send_message.side_effect = OSError("connection reset")
+    with pytest.raises(OSError):
+        send_smtp_message(failing, MagicMock())
+
+    assert metrics.smtp_send_duration.count("ok") == ok_before + 1
+    assert metrics.smtp_send_duration.count("error") == error_before + 1
+
+
+def test_minio_upload_latency_recorded():
+    before = metrics.minio_upload_duration.count("ok")
+    requests_before = metrics.minio_request_duration.count("put_object", "ok")
+    with patch("app.utils.minio.requests.Session.request") as request:
+        request.return_value.status_code = 200
+        MinIOClient().upload_file(b"data", "photo.jpg", "image/jpeg")
+    assert metrics.minio_upload_duration.count("ok") == before + 1
+    assert metrics.minio_request_duration.count("put_object", "ok") == requests_before + 1
@@ -0,0 +1,143 @@
+"""
+Tests for MinIOClient's pooled connections, timeouts, retries and request metrics.
+"""
+import asyncio
+import os
+
+import httpx
+import pytest
+import requests
+from fastapi import HTTPException
+
+from app.services.metrics import minio_request_duration, minio_request_retries
+from app.utils.minio import minio_client
+
+
+@pytest.fixture(autouse=True)
+def reset_minio_metrics():
+    minio_request_duration.reset()
+    minio_request_retries.reset()
+
+
+def test_requests_share_one_keepalive_connection(fake_s3):
+    keys = [minio_client.upload_file(f"data{i}".encode(), "f.jpg", "image/jpeg")["key"] for i in range(3)]
+    assert minio_client.stat_object(keys[0])["size"] == 5
+    assert minio_client.delete_file(keys[1])
+
+    assert len(fake_s3.requests) == 8  # HEAD+PUT per upload, HEAD, DELETE
+    assert len(fake_s3.connections) == 1
+    assert minio_request_duration.count("put_object", "ok") == 3
+    assert minio_request_duration.count("head_object", "ok") == 1
+    assert minio_request_duration.count("delete_object", "ok") == 1
+
+
+def test_5xx_is_retried_with_backoff(fake_s3):
+    fake_s3.fail(503, times=2, method="PUT")
+
+    info = minio_client.upload_file(b"jpeg", "photo.jpg", "image/jpeg")
+
+    assert fake_s3.objects[info["key"]]["body"] == b"jpeg"
+    assert [method for method, _ in fake_s3.requests] == ["HEAD", "PUT", "PUT", "PUT"]
+    assert minio_request_retries.value("put_object") == 2
+    assert minio_request_duration.count("put_object", "server_error") == 2
+    assert minio_request_duration.count("put_object", "ok") == 1
+
+
+def test_retries_give_up_after_max_retries(fake_s3):
+    fake_s3.fail(500, times=minio_client.max_retries + 1, method="PUT")
+
+    with pytest.raises(HTTPException) as exc:
+        minio_client.upload_file(b"jpeg", "photo.jpg", "image/jpeg")
+
+    assert exc.value.status_code == 500
+    assert [method for method, _ in fake_s3.requests].count("PUT") == minio_client.max_retries + 1
+    assert fake_s3.objects == {}
+
+
+def test_4xx_is_not_retried(fake_s3):
+    fake_s3.fail(403, method="PUT")
+    with pytest.raises(HTTPException):
+        minio_client.upload_file(b"jpeg", "photo.jpg", "image/jpeg")
+    assert [method for method, _ in fake_s3.requests] == ["HEAD", "PUT"]
+    assert minio_request_retries.value("put_object") == 0
+
+
+def test_retried_part_is_resent_from_the_start(fake_s3, monkeypatch):
+    monkeypatch.setattr(minio_client, "part_size", 64 * 1024)
+    content = os.urandom(200 * 1024)
+    fake_s3.fail(502, method="PUT")  # The first part
+
+    info = minio_client.upload_stream([content], "scan.pdf", "application/pdf")
+
+    assert fake_s3.objects[info["key"]]["body"] == content
+    assert minio_request_retries.value("upload_part") == 1
+
+
+def test_read_timeout(fake_s3, monkeypatch):
+    monkeypatch.setattr(minio_client, "read_timeout", 0.05)
+    monkeypatch.setattr(minio_client, "max_retries", 0)
+    fake_s3.delay = 0.5
+
+    with pytest.raises(requests.Timeout):
+        minio_client.stat_object("slow.jpg")
+    assert minio_request_duration.count("head_object", "connection_error") == 1
+
+
+def test_async_client_retries_and_reuses_connections(fake_s3):
+    key = minio_client.upload_file(b"pdf", "a.pdf", "application/pdf")["key"]
+    minio_request_duration.reset()
+    fake_s3.fail(503, method="HEAD")
+
+    async def run():
+        try:
+            found = await minio_client.stat_object_async(key)
+            missing = await minio_client.stat_object_async("missing.pdf")
+            deleted = await minio_client.delete_file_async(key)
+            return found, missing, deleted
+        finally:
+            await minio_client.aclose()
+
+    found, missing, deleted = asyncio.run(run())
+
+    assert (found["size"], found["type"]) == (3, "application/pdf")
+    assert found["last_modified"] is not None
+    assert missing is None
+    assert deleted and key not in fake_s3.objects
+    assert minio_request_retries.value("head_object") == 1
+    assert minio_request_duration.count("head_object", "not_found") == 1
+    assert len(fake_s3.connections) == 2  # One for the sync session, one for the event loop's client
+
+
+def test_async_connection_failure(monkeypatch):
+    monkeypatch.setattr(minio_client, "endpoint", "http://127.0.0.1:9")  # Nothing listens here
+    monkeypatch.setattr(minio_client, "retry_backoff", 0.01)
+
+    async def run():
+        try:
+            with pytest.raises(httpx.ConnectError):
+                await minio_client.stat_object_async("a.jpg")
+            return await minio_client.delete_file_async("a.jpg")
+        finally:
+            await minio_client.aclose()
+
+    assert asyncio.run(run()) is False
+    assert minio_request_retries.value("head_object") == minio_client.max_retries
+    assert minio_request_duration.count("head_object", "connection_error") == minio_client.max_retries + 1
+
+
+def test_listing_pages_and_bulk_delete(fake_s3):
+    keys = [f"k{i:04d}&.jpg" for i in range(1205)]
+    for key in keys:
+        fake_s3.objects[key] = {"body": b"x", "content_type": "image/jpeg"}
+
+    listed = list(minio_client.list_objects(page_size=500))
+    assert [obj["key"] for obj in listed] == keys
+    assert listed[0]["size"] == 1 and listed[0]["last_modified"] is not None
+    assert minio_request_duration.count("list_objects", "ok") == 3
+
+    fake_s3.undeletable.add(keys[7])
+    failed = minio_client.delete_objects(keys)
+
+    assert failed == {keys[7]: "AccessDenied"}
+    assert fake_s3.bulk_deletes == [1000, 205]
+    assert list(fake_s3.objects) == [keys[7]]
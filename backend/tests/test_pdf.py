@@ -0,0 +1,73 @@
+"""
+Tests for receipt PDF rendering with the shared, pre-encoded static assets.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from reportlab import rl_config
+
+from app.utils import pdf
+
+RECEIPT = {
+    "id": "GRV-PDF-1",
+    "created_at": "2024-01-01T10:00:00",
+    "complainant_name": "Test User",
+    "details": "Receipt rendering " * 40,
+    "attachments": [{"file_name": f"photo-{i}.jpg", "file_url": f"http://files/{i}"} for i in range(10)],
+}
+
+
+@pytest.fixture
+def invariant(monkeypatch):
+    """Fixed document ids and dates, so identical receipts are byte-identical"""
+    monkeypatch.setattr(rl_config, "invariant", 1)
+
+
+def test_logo_is_encoded_once_and_embedded_with_soft_mask(invariant):
+    assert pdf._LOGO is not None
+    smask = pdf._LOGO._smask
+
+    first = pdf.build_receipt_pdf(RECEIPT)
+    second = pdf.build_receipt_pdf(RECEIPT)
+
+    assert first == second
+    assert first.startswith(b"%PDF")
+    assert len(re.findall(rb"/Subtype /Image", first)) == 2  # Logo and its soft mask
+    assert b"/SMask" in first
+    # Rendering must not consume the shared template
+    assert pdf._LOGO._smask is smask
+
+
+def test_logo_matches_drawimage_from_file(invariant, monkeypatch):
+    assert pdf._LOGO_REUSABLE
+    shared = pdf.build_receipt_pdf(RECEIPT)
+    monkeypatch.setattr(pdf, "_LOGO_REUSABLE", False)  # drawImage encodes the file itself
+    assert pdf.build_receipt_pdf(RECEIPT) == shared
+
+
+def test_broken_logo_reuse_falls_back_to_drawimage(monkeypatch):
+    def broken_register(c):
+        raise AttributeError("'Canvas' object has no attribute '_doc'")
+
+    monkeypatch.setattr(pdf, "_register_logo", broken_register)
+    assert pdf._prepared_logo_matches() is False
+
+    monkeypatch.setattr(pdf, "_LOGO_REUSABLE", False)
+    body = pdf.build_receipt_pdf(RECEIPT)
+    assert len(re.findall(rb"/Subtype /Image", body)) == 2  # Logo and its soft mask
+    assert b"/SMask" in body
+
+
+def test_receipt_without_logo(monkeypatch):
+    monkeypatch.setattr(pdf, "_LOGO", None)
+    body = pdf.build_receipt_pdf({"id": "GRV-PDF-2"})
+    assert body.startswith(b"%PDF")
+    assert b"/Subtype /Image" not in body
+
+
+def test_concurrent_builds_share_assets_safely(invariant):
+    expected = pdf.build_receipt_pdf(RECEIPT)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: pdf.build_receipt_pdf(RECEIPT), range(32)))
+    assert all(result == expected for result in results)
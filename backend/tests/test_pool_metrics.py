@@ -0,0 +1,130 @@
+"""
+Tests for the configurable, instrumented connection pool.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app import database
+from app.database import server_pool_options, statement_timeout_connect_args
+from app.services.pool_metrics import InstrumentedQueuePool, PoolMetrics
+
+
+@pytest.fixture
+def small_pool(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        connect_args={"check_same_thread": False},
+        poolclass=InstrumentedQueuePool,
+        pool_size=2,
+        max_overflow=1,
+        pool_timeout=0.1,
+    )
+    metrics = PoolMetrics(pool=f"test-{tmp_path.name}")  # Own series in the shared registry
+    metrics.install(engine)
+    yield engine, metrics
+    engine.dispose()
+
+
+def test_checkouts_are_counted_and_timed(small_pool):
+    engine, metrics = small_pool
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            assert metrics.stats(engine.pool)["checked_out"] == 1
+
+    stats = metrics.stats(engine.pool)
+    assert stats["pool_class"] == "InstrumentedQueuePool"
+    assert stats["pool_size"] == 2
+    assert stats["max_overflow"] == 1
+    assert stats["checked_out"] == 0
+    assert stats["checked_in"] == 1
+    assert stats["checkouts"] == 3
+    assert stats["connects"] == 1  # The one connection is reused
+    assert stats["checkout_latency_ms"]["+Inf"] == 3
+    assert stats["timeouts"] == 0
+
+
+def test_exhaustion_reports_overflow_and_timeouts(small_pool):
+    engine, metrics = small_pool
+    held = [engine.connect() for _ in range(3)]
+    stats = metrics.stats(engine.pool)
+    assert stats["checked_out"] == 3
+    assert stats["overflow"] == 1
+
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+
+    stats = metrics.stats(engine.pool)
+    assert stats["timeouts"] == 1
+    assert stats["wait_seconds_max"] >= 0.1
+    for conn in held:
+        conn.close()
+
+
+def test_histogram_is_cumulative():
+    metrics = PoolMetrics(pool="test-histogram")
+    for seconds in (0.0005, 0.005, 0.005, 0.05, 20.0):
+        metrics.observe_wait(seconds)
+    metrics.observe_timeout(30.0)
+
+    stats = metrics.stats()
+    latency = stats["checkout_latency_ms"]
+    assert list(latency)[:3] == ["1", "5", "10"]
+    assert (latency["1"], latency["5"], latency["10"], latency["100"], latency["10000"], latency["+Inf"]) == (1, 3, 3, 4, 4, 5)
+    assert stats["timeouts"] == 1
+    assert stats["wait_seconds_max"] == 30.0
+    assert stats["wait_seconds_avg"] == pytest.approx((0.0605 + 20.0 + 30.0) / 6)
+    assert stats["pool_size"] is None
+
+
+def test_metrics_survive_dispose(small_pool):
+    engine, metrics = small_pool
+    engine.connect().close()
+    engine.dispose()
+    engine.connect().close()
+    assert metrics.stats(engine.pool)["checkouts"] == 2
+    assert metrics.stats(engine.pool)["checkout_latency_ms"]["+Inf"] == 2
+
+
+def test_pool_options_follow_configuration(monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(database, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(database, "DB_POOL_PRE_PING", False)
+    options = server_pool_options()
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 0
+    assert options["pool_pre_ping"] is False
+
+
+@pytest.mark.parametrize("url,timeout_ms,expected", [
+    ("postgresql://u:p@db/grievance", 5000, {"options": "-c statement_timeout=5000"}),
+    ("postgresql+psycopg2://u:p@db/grievance", 250, {"options": "-c statement_timeout=250"}),
+    ("postgresql+asyncpg://u:p@db/grievance", 5000, {"server_settings": {"statement_timeout": "5000"}}),
+    ("postgresql://u:p@db/grievance", 0, {}),
+    ("sqlite:///./grievance.db", 5000, {}),
+])
+def test_statement_timeout_connect_args(url, timeout_ms, expected):
+    assert statement_timeout_connect_args(url, timeout_ms) == expected
+
+
+def test_pool_stats_endpoint(client):
+    response = client.get("/health/db-pool")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["pool_class"]
+    assert "+Inf" in data["checkout_latency_ms"]
+    assert data["timeouts"] >= 0
+
+
+def test_pool_metrics_are_exported(client, small_pool):
+    engine, metrics = small_pool
+    with engine.connect():
+        metrics.collect(engine.pool)
+        text_format = client.get("/metrics").text
+
+    label = f'pool="{metrics.pool}"'
+    assert f'db_pool_checkouts_total{{{label}}} 1' in text_format
+    assert f'db_pool_checkout_wait_seconds_count{{{label},outcome="ok"}} 1' in text_format
+    assert f'db_pool_connections{{{label},state="checked_out"}} 1' in text_format
+    assert f'db_pool_connections{{{label},state="size"}} 2' in text_format
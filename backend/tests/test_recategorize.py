@@ -0,0 +1,168 @@
+"""
+Tests for batch categorization and the bulk re-categorization job.
+"""
+import json
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from openai import OpenAIError
+
+from app import models
+from app.services import recategorize
+from app.services.categorization_queue import CATEGORY_DONE, CATEGORY_FAILED, CATEGORY_PENDING
+from app.services.llm_categorizer import CATEGORY_TAXONOMY_VERSION
+from tests.conftest import TestingSessionLocal
+
+
+def _fake_categorizer(calls, fail_on=()):
+    async def fake(details):
+        calls.append(details)
+        if details in fail_on:
+            raise OpenAIError("Service unavailable")
+        return {"category": "5", "subcategory": "5.3"}
+    return fake
+
+
+def _seed(db):
+    """Three rows needing work plus two that must be left alone"""
+    rows = [
+        models.Grievance(id="GRV-00000000000000000000000001", details="uncategorized one",
+                         category_status=CATEGORY_PENDING),
+        models.Grievance(id="GRV-00000000000000000000000002", details="uncategorized two",
+                         category_status=CATEGORY_FAILED),
+        models.Grievance(id="GRV-00000000000000000000000003", details="old taxonomy",
+                         category_type="9.9 Removed", category_status=CATEGORY_DONE, category_version="old"),
+        models.Grievance(id="GRV-00000000000000000000000004", details="manual",
+                         category_type="Service Delivery"),
+        models.Grievance(id="GRV-00000000000000000000000005", details="current taxonomy",
+                         category_type="1.1 Inquiries", category_status=CATEGORY_DONE,
+                         category_version=CATEGORY_TAXONOMY_VERSION),
+    ]
+    db.add_all(rows)
+    db.commit()
+
+
+def test_batch_endpoint(client):
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = json.dumps({
+        "category": "2", "subcategory": "2.3", "confidence": "high", "reasoning": "r"
+    })
+
+    with patch("app.services.llm_categorizer.AsyncOpenAI") as mock_openai, \
+         patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        mock_client.chat.completions.create = AsyncMock(side_effect=[mock_response, OpenAIError("Rate limited")])
+
+        response = client.post("/api/grievances/categorize/batch", json={
+            "details": ["My son was not registered", "Second grievance"]
+        })
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1]
+    assert results[0]["ok"] is True
+    assert results[0]["result"]["display"] == "2.3 HH member not registered"
+    assert results[1]["ok"] is False
+    assert "LLM service error" in results[1]["error"]
+
+
+def test_batch_endpoint_rejects_empty_list(client):
+    response = client.post("/api/grievances/categorize/batch", json={"details": []})
+    assert response.status_code == 422
+
+
+def test_recategorization_updates_only_stale_rows(test_db, tmp_path):
+    _seed(test_db)
+    calls = []
+
+    with patch.object(recategorize, "categorize_grievance_async", _fake_categorizer(calls)):
+        summary = recategorize.run_recategorization(
+            session_factory=TestingSessionLocal, batch_size=2, checkpoint_path=str(tmp_path / "ckpt.json")
+        )
+
+    assert sorted(calls) == ["old taxonomy", "uncategorized one", "uncategorized two"]
+    assert summary["processed"] == 3
+    assert summary["updated"] == 3
+
+    test_db.expire_all()
+    by_id = {g.id: g for g in test_db.query(models.Grievance).all()}
+    assert by_id["GRV-00000000000000000000000001"].category_type == "5.3 Discourtesy or poor service"
+    assert by_id["GRV-00000000000000000000000003"].category_type == "5.3 Discourtesy or poor service"
+    assert by_id["GRV-00000000000000000000000003"].category_version == CATEGORY_TAXONOMY_VERSION
+    assert by_id["GRV-00000000000000000000000004"].category_type == "Service Delivery"
+    assert by_id["GRV-00000000000000000000000005"].category_type == "1.1 Inquiries"
+
+
+def test_recategorization_resumes_from_checkpoint(test_db, tmp_path):
+    _seed(test_db)
+    checkpoint_path = str(tmp_path / "ckpt.json")
+    calls = []
+
+    with patch.object(recategorize, "categorize_grievance_async", _fake_categorizer(calls, fail_on={"uncategorized two"})):
+        first = recategorize.run_recategorization(
+            session_factory=TestingSessionLocal, batch_size=10, checkpoint_path=checkpoint_path, limit=2
+        )
+        assert first["last_id"] == "GRV-00000000000000000000000002"
+        assert first["failed"] == 1
+
+        second = recategorize.run_recategorization(
+            session_factory=TestingSessionLocal, batch_size=10, checkpoint_path=checkpoint_path
+        )
+
+    # The resumed run only picked up the remaining row
+    assert calls == ["uncategorized one", "uncategorized two", "old taxonomy"]
+    assert second["processed"] == 3
+    assert second["updated"] == 2
+
+    with open(checkpoint_path) as f:
+        assert json.load(f)["taxonomy_version"] == CATEGORY_TAXONOMY_VERSION
+
+
+def test_manual_category_clears_auto_status(client):
+    with patch("app.routers.grievances.categorization_queue", **{"claim_until.return_value": None}):
+        gid = client.post("/api/grievances/", json={"details": "Something happened"}).json()["id"]
+
+    response = client.put(f"/api/grievances/{gid}/status", json={"category_type": "Housing"})
+    assert response.status_code == 200
+    assert response.json()["category_type"] == "Housing"
+    assert response.json()["category_status"] is None
+
+
+def test_recategorization_leaves_deliberately_empty_categories(client, tmp_path):
+    with patch("app.routers.grievances.categorization_queue", **{"claim_until.return_value": None}):
+        explicit = client.post("/api/grievances/", json={"details": "Explicitly empty", "category_type": ""}).json()["id"]
+        cleared = client.post("/api/grievances/", json={"details": "Cleared by staff"}).json()["id"]
+        pending = client.post("/api/grievances/", json={"details": "Waiting for the queue"}).json()["id"]
+    assert client.put(f"/api/grievances/{cleared}/status", json={"category_type": ""}).status_code == 200
+
+    calls = []
+    with patch.object(recategorize, "categorize_grievance_async", _fake_categorizer(calls)):
+        summary = recategorize.run_recategorization(session_factory=TestingSessionLocal, checkpoint_path=None)
+
+    assert calls == ["Waiting for the queue"]
+    assert summary["updated"] == 1
+    for gid in (explicit, cleared):
+        data = client.get(f"/api/grievances/{gid}").json()
+        assert data["category_type"] is None
+        assert data["category_status"] is None
+    assert client.get(f"/api/grievances/{pending}").json()["category_status"] == CATEGORY_DONE
+
+
+def test_legacy_rows_only_with_include_legacy(test_db):
+    test_db.add(models.Grievance(id="GRV-00000000000000000000000009", details="pre-migration row"))
+    test_db.commit()
+    calls = []
+
+    with patch.object(recategorize, "categorize_grievance_async", _fake_categorizer(calls)):
+        skipped = recategorize.run_recategorization(session_factory=TestingSessionLocal, checkpoint_path=None)
+        included = recategorize.run_recategorization(
+            session_factory=TestingSessionLocal, checkpoint_path=None, include_legacy=True
+        )
+
+    assert skipped["processed"] == 0
+    assert included["updated"] == 1
+    assert calls == ["pre-migration row"]
+    test_db.expire_all()
+    row = test_db.get(models.Grievance, "GRV-00000000000000000000000009")
+    assert row.category_status == CATEGORY_DONE
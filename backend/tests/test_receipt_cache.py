@@ -0,0 +1,124 @@
+"""
+Tests for receipt caching and conditional receipt downloads.
+"""
+from unittest.mock import patch
+
+import pytest
+
+from app.services.receipt_cache import ReceiptCache, receipt_cache
+from app.services.receipt_renderer import receipt_renderer
+
+
+def _create(client, **extra):
+    payload = {"category_type": "Test", "details": "Receipt caching", **extra}
+    return client.post("/api/grievances/", json=payload).json()["id"]
+
+
+@pytest.fixture
+def render_count():
+    calls = []
+    real = receipt_renderer._render
+
+    def counting(data):
+        calls.append(data["id"])
+        return real(data)
+
+    with patch.object(receipt_renderer, "_render", side_effect=counting):
+        yield calls
+
+
+def test_receipt_rendered_once_per_version(client, render_count):
+    gid = _create(client)
+
+    first = client.get(f"/api/grievances/{gid}/receipt.pdf")
+    second = client.get(f"/api/grievances/{gid}/receipt.pdf")
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.headers["last-modified"].endswith("GMT")
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert render_count == [gid]
+    assert receipt_cache.stats()["hits"] == 1
+
+
+def test_if_none_match_returns_304(client, render_count):
+    gid = _create(client)
+    etag = client.get(f"/api/grievances/{gid}/receipt.pdf").headers["etag"]
+
+    response = client.get(f"/api/grievances/{gid}/receipt.pdf", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = client.get(f"/api/grievances/{gid}/receipt.pdf", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+    assert render_count == [gid]
+
+
+def test_if_modified_since(client):
+    gid = _create(client)
+    last_modified = client.get(f"/api/grievances/{gid}/receipt.pdf").headers["last-modified"]
+
+    response = client.get(f"/api/grievances/{gid}/receipt.pdf", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    earlier = "Mon, 01 Jan 2024 00:00:00 GMT"
+    response = client.get(f"/api/grievances/{gid}/receipt.pdf", headers={"If-Modified-Since": earlier})
+    assert response.status_code == 200
+
+    response = client.get(f"/api/grievances/{gid}/receipt.pdf", headers={"If-Modified-Since": "garbage"})
+    assert response.status_code == 200
+
+
+def test_status_update_changes_version_and_invalidates(client, render_count):
+    gid = _create(client)
+    etag = client.get(f"/api/grievances/{gid}/receipt.pdf").headers["etag"]
+    assert receipt_cache.stats()["entries"] == 1
+
+    client.put(f"/api/grievances/{gid}/status", json={"category_type": "2.1 Infrastructure"})
+    assert receipt_cache.stats()["entries"] == 0
+
+    response = client.get(f"/api/grievances/{gid}/receipt.pdf", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert render_count == [gid, gid]
+
+
+def test_batch_update_invalidates(client):
+    gid = _create(client)
+    client.get(f"/api/grievances/{gid}/receipt.pdf")
+
+    client.put("/api/grievances/status-batch", json={"updates": [{"gid": gid, "external_status": "Closed"}]})
+    assert receipt_cache.stats()["entries"] == 0
+
+
+def test_memory_tier_is_bounded_by_bytes():
+    cache = ReceiptCache(max_bytes=10, directory="")
+    cache.set("GRV-A", "1", b"aaaa")
+    cache.set("GRV-B", "1", b"bbbb")
+    cache.set("GRV-C", "1", b"cccc")  # Evicts GRV-A
+
+    assert cache.get("GRV-A", "1") is None
+    assert cache.get("GRV-C", "1") == b"cccc"
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+
+    cache.set("GRV-B", "2", b"bb")  # Replaces the older version
+    assert cache.get("GRV-B", "1") is None
+    assert cache.stats()["bytes"] == 6
+
+
+def test_disk_tier_shared_between_instances(tmp_path):
+    writer = ReceiptCache(max_bytes=1024, directory=str(tmp_path))
+    writer.set("GRV-A", "1", b"%PDF-1")
+    writer.set("GRV-A", "2", b"%PDF-2")  # The old version's file is removed
+    assert len(list(tmp_path.glob("GRV-A-*.pdf"))) == 1
+
+    reader = ReceiptCache(max_bytes=1024, directory=str(tmp_path))
+    assert reader.get("GRV-A", "2") == b"%PDF-2"
+    assert reader.get("GRV-A", "1") is None
+    assert reader.stats()["disk_hits"] == 1
+
+    reader.invalidate("GRV-A")
+    assert list(tmp_path.glob("GRV-A-*.pdf")) == []
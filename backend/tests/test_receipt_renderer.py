@@ -0,0 +1,164 @@
+"""
+Tests for the receipt render pool, its backpressure and the bulk receipt ZIP endpoint.
+"""
+import io
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.routers import grievances
+from app.services.receipt_cache import receipt_cache
+from app.services.receipt_renderer import ReceiptRenderer, RendererBusy, RendererUnavailable
+from app.utils.pdf import build_receipt_pdf
+
+
+def _create(client, details="Receipt batch"):
+    return client.post("/api/grievances/", json={"category_type": "Test", "details": details}).json()["id"]
+
+
+def test_receipts_zip_in_request_order(client):
+    first, second = _create(client, "First"), _create(client, "Second")
+    client.get(f"/api/grievances/{second}/receipt.pdf")  # Cached before the batch
+
+    response = client.post("/api/grievances/receipts.zip", json={"ids": [second, first, second]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == [f"{second}.pdf", f"{first}.pdf"]
+    assert all(archive.read(name).startswith(b"%PDF") for name in archive.namelist())
+    assert archive.read(f"{second}.pdf") == client.get(f"/api/grievances/{second}/receipt.pdf").content
+    assert receipt_cache.stats()["entries"] == 2
+
+
+def test_receipts_zip_rejects_unknown_and_invalid_ids(client):
+    gid = _create(client)
+    missing = "GRV-" + "0" * 26
+
+    response = client.post("/api/grievances/receipts.zip", json={"ids": [gid, missing]})
+    assert response.status_code == 404
+    assert missing in response.json()["detail"]
+
+    assert client.post("/api/grievances/receipts.zip", json={"ids": ["nope"]}).status_code == 400
+    assert client.post("/api/grievances/receipts.zip", json={"ids": []}).status_code == 422
+
+
+def test_full_queue_rejects_after_waiting():
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_render(data):
+        started.set()
+        release.wait(5)
+        return b"%PDF"
+
+    renderer = ReceiptRenderer(workers=0, max_pending=1, queue_wait=0.05, render=slow_render)
+    holder = threading.Thread(target=renderer.render, args=({"id": "A"},))
+    holder.start()
+    started.wait(5)
+
+    with pytest.raises(RendererBusy):
+        renderer.render({"id": "B"})
+    release.set()
+    holder.join()
+
+    assert renderer.render({"id": "C"}) == b"%PDF"
+    stats = renderer.stats()
+    assert stats["rejected"] == 1
+    assert stats["rendered"] == 2
+    assert stats["pending"] == 0
+
+
+def test_busy_renderer_returns_503(client, monkeypatch):
+    gid = _create(client)
+    renderer = ReceiptRenderer(workers=0, max_pending=1, queue_wait=0)
+    renderer._slots.acquire()  # Queue already full
+    monkeypatch.setattr(grievances, "receipt_renderer", renderer)
+
+    response = client.get(f"/api/grievances/{gid}/receipt.pdf")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(grievances.RECEIPT_RETRY_AFTER_SECONDS)
+
+    response = client.post("/api/grievances/receipts.zip", json={"ids": [gid]})
+    assert response.status_code == 503
+
+
+def test_render_timeout_returns_503(client, monkeypatch):
+    gid = _create(client)
+    release = threading.Event()
+
+    def hung_render(data):
+        release.wait(5)
+        return b"%PDF"
+
+    renderer = ReceiptRenderer(workers=1, max_pending=4, queue_wait=0, timeout=0.05, render=hung_render)
+    renderer._executor = ThreadPoolExecutor(max_workers=1)  # Stands in for the process pool
+    monkeypatch.setattr(grievances, "receipt_renderer", renderer)
+    try:
+        response = client.get(f"/api/grievances/{gid}/receipt.pdf")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == str(grievances.RECEIPT_RETRY_AFTER_SECONDS)
+
+        response = client.post("/api/grievances/receipts.zip", json={"ids": [gid]})
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == str(grievances.RECEIPT_RETRY_AFTER_SECONDS)
+    finally:
+        release.set()
+        renderer.stop()
+    assert renderer.stats()["pending"] == 0
+
+
+def _crash(data):
+    os._exit(1)
+
+
+def test_broken_pool_is_replaced():
+    renderer = ReceiptRenderer(workers=1, max_pending=2, render=_crash)
+    renderer.start()
+    try:
+        with pytest.raises(RendererUnavailable):
+            renderer.render({"id": "GRV-crash"})
+
+        renderer._render = build_receipt_pdf
+        assert renderer.render({"id": "GRV-after"}).startswith(b"%PDF")
+    finally:
+        renderer.stop()
+    assert renderer.stats()["pending"] == 0
+
+
+def test_render_failure_is_counted_and_releases_slot():
+    def broken(data):
+        raise ValueError("bad data")
+
+    renderer = ReceiptRenderer(workers=0, max_pending=1, queue_wait=0, render=broken)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            renderer.render({"id": "A"})
+    assert renderer.stats()["failed"] == 2
+    assert renderer.stats()["pending"] == 0
+
+
+def test_process_pool_renders_in_order():
+    renderer = ReceiptRenderer(workers=2, max_pending=4)
+    renderer.start()
+    try:
+        items = [{"id": f"GRV-{i}", "details": f"Receipt {i}"} for i in range(5)]
+        pdfs = list(renderer.render_many(items))
+        single = renderer.render({"id": "GRV-single"})
+    finally:
+        renderer.stop()
+
+    assert len(pdfs) == 5
+    assert all(pdf.startswith(b"%PDF") for pdf in pdfs + [single])
+    assert b"GRV-3" in pdfs[3]
+    assert renderer.stats()["rendered"] == 6
+    assert not renderer.running
+
+
+def test_renderer_stats_endpoint(client):
+    data = client.get("/health/receipt-renderer").json()
+    assert data["running"] is False  # RECEIPT_RENDER_WORKERS=0 in tests
+    assert data["pending"] == 0
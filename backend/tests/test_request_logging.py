@@ -0,0 +1,103 @@
+"""
+Tests for the sampled request logging middleware.
+"""
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.middleware.request_logging import RequestLoggingMiddleware, REDACTED, redact, request_logger
+
+
+def _app(**kwargs):
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return await request.json()
+
+    @app.get("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    app.add_middleware(RequestLoggingMiddleware, logger=request_logger, **kwargs)
+    return app
+
+
+def _records(caplog):
+    return [json.loads(r.getMessage()) for r in caplog.records if r.name == request_logger.name]
+
+
+@pytest.fixture
+def caplog(caplog):
+    caplog.set_level(logging.INFO, logger=request_logger.name)
+    return caplog
+
+
+def test_bodies_not_logged_by_default(caplog):
+    client = TestClient(_app(sample_rate=1.0, slow_ms=10000))
+    payload = {"complainant_email": "jane@example.com", "island": "Tongatapu"}
+
+    response = client.post("/echo", json=payload)
+
+    # The application still receives the body untouched
+    assert response.json() == payload
+    [record] = _records(caplog)
+    assert record["method"] == "POST"
+    assert record["path"] == "/echo"
+    assert record["status"] == 200
+    assert "body" not in record
+
+
+def test_logged_bodies_are_redacted(caplog):
+    client = TestClient(_app(sample_rate=1.0, slow_ms=10000, log_bodies=True, max_body_bytes=4096))
+    payload = {
+        "complainant_name": "Jane Doe",
+        "complainant_email": "jane@example.com",
+        "island": "Tongatapu",
+        "attachments": [{"note": "call me on +676 771 2345 or jane@example.com"}],
+    }
+
+    assert client.post("/echo", json=payload).json() == payload
+
+    [record] = _records(caplog)
+    body = record["body"]
+    assert body["complainant_name"] == REDACTED
+    assert body["complainant_email"] == REDACTED
+    assert body["island"] == "Tongatapu"
+    assert body["attachments"][0]["note"] == f"call me on {REDACTED} or {REDACTED}"
+    assert "jane@example.com" not in caplog.text
+
+
+def test_truncated_body_is_scrubbed_text(caplog):
+    client = TestClient(_app(sample_rate=1.0, slow_ms=10000, log_bodies=True, max_body_bytes=40))
+    client.post("/echo", json={"complainant_email": "jane@example.com", "details": "x" * 200})
+
+    [record] = _records(caplog)
+    assert record["body"].endswith("...")
+    assert "jane@example.com" not in record["body"]
+
+
+def test_unsampled_requests_not_logged_unless_failed(caplog):
+    client = TestClient(_app(sample_rate=0.0, slow_ms=10000), raise_server_exceptions=False)
+
+    client.post("/echo", json={"a": 1})
+    assert _records(caplog) == []
+
+    assert client.get("/boom").status_code == 500
+    [record] = _records(caplog)
+    assert record["status"] == 500
+
+
+def test_slow_requests_always_logged(caplog):
+    client = TestClient(_app(sample_rate=0.0, slow_ms=0))
+    client.post("/echo", json={"a": 1})
+    assert len(_records(caplog)) == 1
+
+
+def test_redact_leaves_non_pii_fields():
+    assert redact({"island": "Vava'u", "details": "", "hh_id": None}) == {
+        "island": "Vava'u", "details": "", "hh_id": None,
+    }
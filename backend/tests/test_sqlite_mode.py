@@ -0,0 +1,127 @@
+"""
+Tests for the pooled SQLite engine: pragmas, bounded pool and the single-writer gate.
+"""
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app import models
+from app.database import Base, SQLiteWriteGate, create_async_db_engine, create_sqlite_engine, is_sqlite_memory
+
+
+@pytest.fixture
+def gate():
+    return SQLiteWriteGate()
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path, gate):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'field.db'}", pool_size=4, write_gate=gate)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def test_file_database_is_pooled_with_pragmas(sqlite_engine):
+    assert isinstance(sqlite_engine.pool, QueuePool)
+    assert sqlite_engine.pool.size() == 4
+
+    with sqlite_engine.connect() as conn:
+        pragma = lambda name: conn.execute(text(f"PRAGMA {name}")).scalar()  # noqa: E731
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("busy_timeout") > 0
+        assert pragma("mmap_size") > 0
+        assert pragma("cache_size") != -2000  # Not SQLite's default
+
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:", "sqlite:///file:db?mode=memory&uri=true"])
+def test_memory_databases_keep_null_pool(url):
+    assert is_sqlite_memory(url)
+    assert isinstance(create_sqlite_engine(url).pool, NullPool)
+
+
+def test_connections_are_reused(sqlite_engine):
+    with sqlite_engine.connect() as conn:
+        first = conn.connection.dbapi_connection
+    with sqlite_engine.connect() as conn:
+        assert conn.connection.dbapi_connection is first
+
+
+def test_write_gate_held_until_transaction_ends(sqlite_engine, gate):
+    sessions = sessionmaker(bind=sqlite_engine)
+
+    with sessions() as db:
+        db.get(models.Grievance, "GRV-MISSING")
+        assert not gate.locked()  # Reads don't queue
+        db.add(models.Grievance(id="GRV-" + "1" * 26, details="Gate test"))
+        db.flush()
+        assert gate.locked()
+        db.commit()
+        assert not gate.locked()
+
+    with sessions() as db:
+        db.add(models.Grievance(id="GRV-" + "2" * 26, details="Rolled back"))
+        db.flush()
+        assert gate.locked()
+    assert not gate.locked()  # Released by the rollback on close
+
+
+def test_concurrent_writers_do_not_hit_database_is_locked(sqlite_engine):
+    sessions = sessionmaker(bind=sqlite_engine)
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(25):
+                with sessions() as db:
+                    db.add(models.Grievance(id=f"GRV-{n:02d}{i:024d}", details=f"Writer {n}"))
+                    db.commit()
+                    db.get(models.Grievance, f"GRV-{n:02d}{i:024d}")
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with sessions() as db:
+        assert db.query(models.Grievance).count() == 200
+
+
+def test_async_engine_shares_the_write_gate(tmp_path, sqlite_engine, gate):
+    async_engine = create_async_db_engine(f"sqlite:///{tmp_path / 'field.db'}", write_gate=gate)
+    sessions = sessionmaker(bind=sqlite_engine)
+
+    async def insert(gid):
+        async with async_engine.begin() as conn:
+            await conn.execute(models.Grievance.__table__.insert().values(id=gid, is_anonymous=True))
+            assert gate.locked()
+
+    async def run():
+        try:
+            with sessions() as db:
+                db.add(models.Grievance(id="GRV-" + "1" * 26, details="Sync writer"))
+                db.flush()
+                assert gate.locked()
+                waiting = asyncio.ensure_future(insert("GRV-" + "2" * 26))
+                await asyncio.sleep(0.1)  # The loop keeps running while the async writer waits
+                assert not waiting.done()
+                db.commit()
+            await waiting
+            await asyncio.gather(*(insert(f"GRV-A{i:025d}") for i in range(20)))
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+    assert not gate.locked()
+    with sessions() as db:
+        assert db.query(models.Grievance).count() == 22
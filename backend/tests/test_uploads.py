@@ -0,0 +1,196 @@
+"""
+Tests for streaming attachment uploads to MinIO.
+"""
+import hashlib
+import os
+import time
+
+import pytest
+
+from app.routers import grievances
+from app.utils.minio import UploadTooLarge, minio_client
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    """Multipart uploads with 64KB parts instead of S3's 5MB minimum"""
+    monkeypatch.setattr(minio_client, "part_size", 64 * 1024)
+
+
+def test_small_file_single_put(client, fake_s3):
+    response = client.post("/api/grievances/upload-file", files={"file": ("photo.jpg", b"jpeg-bytes", "image/jpeg")})
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["name"] == "photo.jpg"
+    assert data["size"] == 10
+    assert data["type"] == "image/jpeg"
+    assert data["sha256"] == hashlib.sha256(b"jpeg-bytes").hexdigest()
+    assert data["key"] == data["sha256"] + ".jpg"
+    assert data["url"] == f"{fake_s3.endpoint}/{minio_client.bucket_name}/{data['key']}"
+    assert fake_s3.objects[data["key"]] == {"body": b"jpeg-bytes", "content_type": "image/jpeg"}
+    assert [method for method, _ in fake_s3.requests] == ["HEAD", "PUT"]  # Content lookup, then store
+
+
+def test_large_file_multipart_in_parts(client, fake_s3, small_parts):
+    content = os.urandom(300 * 1024)
+    response = client.post(
+        "/api/grievances/upload-file",
+        files={"file": ("scan.pdf", content, "application/pdf")},
+        data={"note": "extra form fields are ignored"},
+    )
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["key"] == hashlib.sha256(content).hexdigest() + ".pdf"
+    stored = fake_s3.objects[data["key"]]
+    assert stored["body"] == content
+    assert stored["parts"] >= 4
+    assert fake_s3.completed == 1
+    # Completed under a temporary key, then moved to the content key
+    assert fake_s3.copied == 1
+    assert list(fake_s3.objects) == [data["key"]]
+    # No request carried much more than one part
+    assert fake_s3.largest_body <= minio_client.part_size
+
+
+def _chunked_multipart(content: bytes, content_type: str, chunk_size: int = 16 * 1024):
+    """A multipart body sent in chunks without Content-Length, like a slow mobile client"""
+    head = (
+        b"--bnd\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.pdf\"\r\n"
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n"
+    )
+    body = head + content + b"\r\n--bnd--\r\n"
+    return (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+
+
+def test_oversized_upload_rejected_while_streaming(client, fake_s3, small_parts, monkeypatch):
+    monkeypatch.setattr(grievances, "MAX_UPLOAD_SIZE", 200 * 1024)
+    response = client.post(
+        "/api/grievances/upload-file",
+        content=_chunked_multipart(b"x" * 400 * 1024, "application/pdf"),
+        headers={"Content-Type": "multipart/form-data; boundary=bnd"},
+    )
+
+    assert response.status_code == 413
+    assert fake_s3.objects == {}
+    assert fake_s3.uploads == {}
+
+
+def test_size_limit_aborts_multipart_upload(fake_s3, small_parts):
+    chunks = (b"y" * 16 * 1024 for _ in range(25))  # 400KB
+
+    with pytest.raises(UploadTooLarge):
+        minio_client.upload_stream(chunks, "big.pdf", "application/pdf", max_size=200 * 1024)
+
+    # Parts were already sent when the limit was crossed; the upload is aborted, not completed
+    assert [method for method, _ in fake_s3.requests].count("PUT") == 3
+    assert fake_s3.aborted == 1
+    assert fake_s3.uploads == {}
+    assert fake_s3.objects == {}
+
+
+def test_truncated_body_aborts_upload(client, fake_s3, small_parts):
+    chunks = list(_chunked_multipart(os.urandom(200 * 1024), "application/pdf"))[:-2]  # No closing boundary
+    response = client.post(
+        "/api/grievances/upload-file", content=iter(chunks),
+        headers={"Content-Type": "multipart/form-data; boundary=bnd"},
+    )
+
+    assert response.status_code == 400
+    assert fake_s3.objects == {}
+    assert fake_s3.aborted == 1
+
+
+def test_content_length_rejected_before_reading(client, fake_s3):
+    response = client.post(
+        "/api/grievances/upload-file", content=b"x",
+        headers={"Content-Type": "multipart/form-data; boundary=abc", "Content-Length": str(11 * 1024 * 1024)},
+    )
+    assert response.status_code == 413
+    assert fake_s3.requests == []
+
+
+def test_disallowed_type_rejected_before_storage(client, fake_s3):
+    response = client.post("/api/grievances/upload-file", files={"file": ("run.sh", b"#!/bin/sh", "text/x-sh")})
+    assert response.status_code == 400
+    assert "not allowed" in response.json()["detail"]
+    assert fake_s3.requests == []
+
+
+def test_missing_or_malformed_body(client, fake_s3):
+    response = client.post("/api/grievances/upload-file", data={"other": "field"}, files={"x": ("a.jpg", b"1", "image/jpeg")})
+    assert response.status_code == 422
+
+    response = client.post("/api/grievances/upload-file", json={"file": "not multipart"})
+    assert response.status_code == 400
+    assert fake_s3.requests == []
+
+
+def test_storage_failure_is_500(client, monkeypatch):
+    monkeypatch.setattr(minio_client, "endpoint", "http://127.0.0.1:9")  # Nothing listens here
+    response = client.post("/api/grievances/upload-file", files={"file": ("photo.jpg", b"jpeg", "image/jpeg")})
+    assert response.status_code == 500
+
+
+def test_duplicate_small_file_is_not_sent_again(client, fake_s3):
+    first = client.post("/api/grievances/upload-file", files={"file": ("id.jpg", b"id-card", "image/jpeg")}).json()
+    fake_s3.requests.clear()
+    second = client.post("/api/grievances/upload-file", files={"file": ("copy.jpg", b"id-card", "image/jpeg")}).json()
+
+    assert second["key"] == first["key"]
+    assert second["url"] == first["url"]
+    assert second["name"] == "copy.jpg"
+    assert [method for method, _ in fake_s3.requests] == ["HEAD"]
+    assert len(fake_s3.objects) == 1
+
+
+def test_duplicate_large_file_aborts_multipart_upload(client, fake_s3, small_parts):
+    content = os.urandom(300 * 1024)
+    files = {"file": ("scan.pdf", content, "application/pdf")}
+    first = client.post("/api/grievances/upload-file", files=files).json()
+    second = client.post("/api/grievances/upload-file", files=files).json()
+
+    assert second["key"] == first["key"]
+    assert list(fake_s3.objects) == [first["key"]]
+    assert fake_s3.completed == 1
+    assert fake_s3.copied == 1
+    assert fake_s3.aborted == 1
+    assert fake_s3.uploads == {}
+
+
+def test_truncated_object_under_content_key_is_replaced(fake_s3):
+    key = minio_client.content_key(hashlib.sha256(b"full content").hexdigest(), "a.pdf")
+    fake_s3.objects[key] = {"body": b"full", "content_type": "application/pdf"}
+
+    info = minio_client.upload_file(b"full content", "a.pdf", "application/pdf")
+
+    assert info["key"] == key
+    assert fake_s3.objects[key]["body"] == b"full content"
+
+
+def test_digest_recorded_with_grievance_attachments(client, fake_s3):
+    attachment = client.post("/api/grievances/upload-file", files={"file": ("id.jpg", b"id-card", "image/jpeg")}).json()
+    gid = client.post(
+        "/api/grievances/", json={"details": "With attachment", "attachments": [attachment]}
+    ).json()["id"]
+
+    stored = client.get(f"/api/grievances/{gid}").json()["attachments"]
+    assert stored[0]["sha256"] == attachment["sha256"]
+    assert stored[0]["url"] == attachment["url"]
+
+
+def test_deduplicated_upload_refreshes_old_object(fake_s3):
+    """Attachment GC spares recently modified objects, so a reused old one is re-stamped"""
+    content = b"reused id card"
+    key = minio_client.content_key(hashlib.sha256(content).hexdigest(), "id.jpg")
+    fake_s3.objects[key] = {"body": content, "content_type": "image/jpeg"}
+    fake_s3.modified[key] = time.time() - 3 * 24 * 3600
+
+    minio_client.upload_file(content, "id.jpg", "image/jpeg")
+    assert fake_s3.copied == 1
+    assert fake_s3.modified[key] > time.time() - 60
+    assert fake_s3.objects[key] == {"body": content, "content_type": "image/jpeg"}
+
+    minio_client.upload_file(content, "id.jpg", "image/jpeg")
+    assert fake_s3.copied == 1  # Recent enough now